@@ -1,5 +1,20 @@
-from ._setup import setup
-from ._trigger import trigger
+from .runtime import (
+    flush,
+    get_params,
+    get_plugin_vars,
+    get_profile,
+    get_triggers,
+    setup,
+    trigger,
+)
 
-__all__ = ["setup", "trigger"]
+__all__ = [
+    "flush",
+    "get_params",
+    "get_plugin_vars",
+    "get_profile",
+    "get_triggers",
+    "setup",
+    "trigger",
+]
 __version__ = "0.9.2"
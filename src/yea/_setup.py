@@ -1,11 +1,49 @@
+import functools
 import importlib
 import json
-import multiprocessing as mp
 import os
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@functools.lru_cache(maxsize=None)
+def _load_context() -> Dict[str, Any]:
+    """Load the context file yea wrote for this test, once per process."""
+    fname = os.environ.get("YEA_CONTEXT_FILE")
+    if not fname:
+        return {}
+    try:
+        with open(fname, encoding="utf8") as f:
+            ctx: Dict[str, Any] = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return ctx
+
+
+def get_params() -> Dict[str, Any]:
+    """Return the parameters of this permutation, with their yaml types."""
+    ctx = _load_context()
+    if ctx:
+        return dict(ctx.get("params", {}))
+    return dict(_setup_params())
+
+
+def get_plugin_vars(plugin: str) -> Dict[str, Any]:
+    """Return the vars of a plugin, by name without the plugin prefix."""
+    ctx = _load_context()
+    if ctx:
+        return dict(ctx.get("plugin_vars", {}).get(plugin, {}))
+    penv = plugin.upper()
+    names = os.environ.get(f"YEA_PLUGIN_{penv}_NAMES")
+    values = os.environ.get(f"YEA_PLUGIN_{penv}_VALUES")
+    if not names or not values:
+        return {}
+    return dict(zip(names.split(","), json.loads(values)))
 
 
 def _setup_params() -> Dict[str, str]:
+    ctx = _load_context()
+    if ctx:
+        return {k: str(v) for k, v in ctx.get("params", {}).items()}
     env_names = os.environ.get("YEA_PARAM_NAMES")
     env_values = os.environ.get("YEA_PARAM_VALUES")
     if env_names is None or env_values is None:
@@ -17,6 +55,12 @@ def _setup_params() -> Dict[str, str]:
 
 
 def _setup_profile() -> Optional[Tuple[str, Dict[str, str]]]:
+    ctx = _load_context()
+    if ctx:
+        profile = ctx.get("profile")
+        if not profile:
+            return None
+        return (profile["file"], profile["vars"])
     prof_file = os.environ.get("YEA_PROFILE_FILE")
     prof_vars = os.environ.get("YEA_PROFILE_VARS")
     prof_vals = os.environ.get("YEA_PROFILE_VALS")
@@ -32,6 +76,9 @@ def _setup_profile() -> Optional[Tuple[str, Dict[str, str]]]:
 
 
 def _setup_trigger() -> Optional[List[str]]:
+    ctx = _load_context()
+    if ctx:
+        return ctx.get("trigger") or None
     trig_vars = os.environ.get("YEA_TRIGGER_VARS")
     if not trig_vars:
         return None
@@ -44,15 +91,22 @@ def setup_mp(params: Dict[str, str]) -> None:
     if not start_method:
         return
     print(f"INFO: start_method= {start_method}")
+    # multiprocessing is slow to import, most tests do not ask for a start method
+    import multiprocessing as mp
+
     mp.set_start_method(start_method)
     # TODO: check mp setup?
 
 
 def setup_plugins() -> None:
-    env_plugins = os.environ.get("YEA_PLUGINS")
-    if env_plugins is None:
-        return
-    plugins = env_plugins.split(",")
+    ctx = _load_context()
+    if ctx:
+        plugins = ctx.get("plugins", [])
+    else:
+        env_plugins = os.environ.get("YEA_PLUGINS")
+        if env_plugins is None:
+            return
+        plugins = env_plugins.split(",")
     for plug in plugins:
         mod_name = f"yea_{plug}"
         mod = importlib.import_module(mod_name)
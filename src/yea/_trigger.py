@@ -1,26 +1,244 @@
+"""Trigger actions of the mock server from a test.
+
+The control url comes from ``YEA_WANDB_MITM``, either ``http://host:port`` or
+``unix:/path/to/socket`` for mock servers listening on a unix socket. One
+connection is kept open for all triggers of a process.
+
+``trigger(name)`` waits for the server to act on it. ``trigger(name,
+wait=False)`` only queues it; queued triggers are sent in the background,
+in order, and ``flush()`` waits until all of them were handled. If the
+server accepts lists of commands (``YEA_TRIGGER_BATCH=1``) queued triggers
+are sent together in one request.
+"""
+
+import atexit
+import http.client
+import json
 import os
-from typing import Dict
+import socket
+import threading
+import urllib.parse
+from typing import Dict, List, Optional, Union
 
 import requests
 
-_session = requests.Session()
+DEFAULT_TIMEOUT = 60.0
+CONTROL_PATH = "/_control"
+
+
+class TriggerError(requests.HTTPError):
+    # triggers used to raise the errors of requests, keep catching them working
+    pass
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self._socket_path = path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self._socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class TriggerClient:
+    _queue: List[Dict[str, str]]
+
+    def __init__(
+        self, url: str, timeout: float = DEFAULT_TIMEOUT, batch: bool = False
+    ) -> None:
+        self._timeout = timeout
+        self._batch = batch
+        self._socket_path: Optional[str] = None
+        self._base = ""
+        if url.startswith("unix:"):
+            self._socket_path = url[len("unix:") :]
+        else:
+            parsed = urllib.parse.urlsplit(url)
+            if parsed.scheme not in ("http", "https") or not parsed.hostname:
+                raise TriggerError(f"Unsupported trigger url: {url}")
+            self._scheme = parsed.scheme
+            self._netloc = parsed.netloc
+            self._base = parsed.path.rstrip("/")
+        self._conn: Optional[http.client.HTTPConnection] = None
+        # serializes requests on the one connection
+        self._send_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._queue = []
+        self._sending = False
+        self._error: Optional[BaseException] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._conn is None:
+            if self._socket_path is not None:
+                self._conn = _UnixHTTPConnection(self._socket_path, self._timeout)
+            elif self._scheme == "https":
+                self._conn = http.client.HTTPSConnection(
+                    self._netloc, timeout=self._timeout
+                )
+            else:
+                self._conn = http.client.HTTPConnection(
+                    self._netloc, timeout=self._timeout
+                )
+        return self._conn
+
+    def _post(self, data: Union[Dict[str, str], List[Dict[str, str]]]) -> None:
+        body = json.dumps(data).encode("utf8")
+        headers = {"Content-Type": "application/json"}
+        with self._send_lock:
+            # the server may have closed an idle connection, retry once on a new
+            # one; only when nothing came back, else the trigger could fire twice
+            reused = self._conn is not None and self._conn.sock is not None
+            while True:
+                conn = self._connection()
+                try:
+                    conn.request("POST", self._base + CONTROL_PATH, body, headers)
+                    response = conn.getresponse()
+                    response.read()
+                except (http.client.HTTPException, OSError) as e:
+                    self._close_connection()
+                    if reused and isinstance(e, http.client.RemoteDisconnected):
+                        reused = False
+                        continue
+                    raise TriggerError(f"Trigger failed: {e}") from e
+                break
+            if response.will_close:
+                self._close_connection()
+        if response.status >= 400:
+            raise TriggerError(f"Trigger failed: {response.status} {response.reason}")
+
+    def _close_connection(self) -> None:
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def trigger(self, name: str, wait: bool = True) -> None:
+        data = {"service": name, "command": "trigger"}
+        if not wait:
+            self._enqueue(data)
+            return
+        # keep the order of triggers queued before this one
+        self.flush()
+        self._post(data)
+
+    def _enqueue(self, data: Dict[str, str]) -> None:
+        with self._cond:
+            self._queue.append(data)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._send_loop, name="yea-trigger", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify_all()
 
+    def _send_loop(self) -> None:
+        try:
+            while True:
+                with self._cond:
+                    while not self._queue:
+                        self._cond.wait()
+                    batch, self._queue = self._queue, []
+                    self._sending = True
+                try:
+                    self._send(batch)
+                except Exception as e:
+                    error = e
+                    if not isinstance(e, TriggerError):
+                        error = TriggerError(f"Trigger failed: {e!r}")
+                        error.__cause__ = e
+                    with self._cond:
+                        self._error = self._error or error
+                finally:
+                    with self._cond:
+                        self._sending = False
+                        self._cond.notify_all()
+        finally:
+            # the next queued trigger starts a new sender
+            with self._cond:
+                self._thread = None
+                self._cond.notify_all()
 
-def _sendit(url: str, data: Dict[str, str]) -> None:
-    relay_url = f"{url}/_control"
-    prepared_relayed_request = requests.Request(
-        method="POST",
-        url=relay_url,
-        json=data,
-    ).prepare()
-    response = _session.send(prepared_relayed_request)
-    response.raise_for_status()
+    def _send(self, batch: List[Dict[str, str]]) -> None:
+        if self._batch and len(batch) > 1:
+            self._post(batch)
+        else:
+            for data in batch:
+                self._post(data)
 
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait until queued triggers were sent, raise the first error."""
+        with self._cond:
+            done = self._cond.wait_for(
+                lambda: (not self._queue and not self._sending) or not self._thread,
+                timeout=timeout,
+            )
+            error, self._error = self._error, None
+            lost = bool(self._queue) and not self._thread
+        if error:
+            raise error
+        if lost:
+            raise TriggerError("Trigger sender stopped")
+        if not done:
+            raise TriggerError("Timed out flushing triggers")
 
-def trigger(name: str) -> None:
-    mitm = os.environ.get("YEA_WANDB_MITM")
-    if not mitm:
+    def close(self) -> None:
+        with self._send_lock:
+            self._close_connection()
+
+
+_client: Optional[TriggerClient] = None
+_client_lock = threading.Lock()
+
+
+def _get_client() -> Optional[TriggerClient]:
+    global _client
+    url = os.environ.get("YEA_WANDB_MITM")
+    if not url:
+        return None
+    with _client_lock:
+        if _client is None:
+            batch = os.environ.get("YEA_TRIGGER_BATCH", "") not in ("", "0")
+            _client = TriggerClient(url, batch=batch)
+            atexit.register(_flush_at_exit, _client)
+    return _client
+
+
+def _flush_at_exit(client: TriggerClient) -> None:
+    try:
+        client.flush(timeout=client._timeout)
+    except TriggerError as e:
+        print(f"ERROR: {e}")
+    client.close()
+
+
+def _reset_after_fork() -> None:
+    # connection, lock and sender thread belong to the parent
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def trigger(name: str, wait: bool = True) -> None:
+    client = _get_client()
+    if not client:
         return
-    data = {"service": name, "command": "trigger"}
-    _sendit(url=mitm, data=data)
-    pass
+    client.trigger(name, wait=wait)
+
+
+def flush() -> None:
+    """Wait until triggers queued with ``wait=False`` were sent."""
+    client = _get_client()
+    if not client:
+        return
+    client.flush()
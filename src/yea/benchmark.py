@@ -0,0 +1,187 @@
+"""Benchmark mode: run a test repeatedly and aggregate its measurements.
+
+A test with a ``benchmark`` section runs its program ``warmup`` times
+without checking the results, then at least ``repeat`` times (and until
+``min_time`` seconds were measured), optionally pinned to some cpus::
+
+    benchmark:
+      warmup: 1
+      repeat: 5
+      min_time: 10      # seconds
+      cpus: [2, 3]      # or "isolated" for the kernel isolcpus list
+
+Wall time, cpu time and peak rss of every repetition, as well as the
+``:yea:profile`` values reported for it, are aggregated into min, median
+and stddev. The medians are recorded as the result of the test.
+"""
+
+import os
+import pathlib
+import statistics
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+DEFAULT_WARMUP = 1
+DEFAULT_REPEAT = 5
+# repetitions stop here whatever min_time asks for
+MAX_REPEAT = 1000
+ISOLATED_CPUS = pathlib.Path("/sys/devices/system/cpu/isolated")
+PROPERTY_PREFIX = "yea::bench::"
+STATS = ("min", "median", "stddev")
+
+
+class Usage(NamedTuple):
+    """Resources used by one run of a test program."""
+
+    wall: float
+    cpu: Optional[float] = None
+    maxrss: Optional[int] = None
+
+
+def maxrss_bytes(maxrss: int) -> int:
+    # linux reports kilobytes, macos bytes
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def parse_cpu_list(text: str) -> List[int]:
+    """Parse a kernel cpu list like ``2-3,8``."""
+    cpus: List[int] = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+class BenchmarkConfig(NamedTuple):
+    warmup: int = DEFAULT_WARMUP
+    repeat: int = DEFAULT_REPEAT
+    min_time: float = 0.0
+    cpus: Union[List[int], str, None] = None
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any]) -> "BenchmarkConfig":
+        return cls(
+            warmup=int(spec.get("warmup", DEFAULT_WARMUP)),
+            repeat=max(int(spec.get("repeat", DEFAULT_REPEAT)), 1),
+            min_time=float(spec.get("min_time", 0.0)),
+            cpus=spec.get("cpus"),
+        )
+
+    def done(self, usages: List[Usage]) -> bool:
+        """Return whether enough repetitions were measured."""
+        if len(usages) >= MAX_REPEAT:
+            return True
+        if len(usages) < self.repeat:
+            return False
+        return sum(u.wall for u in usages) >= self.min_time
+
+    def pin_cpus(self) -> Optional[List[int]]:
+        """Return the cpus to pin the test program to, None to not pin it."""
+        if self.cpus is None:
+            return None
+        if not hasattr(os, "sched_setaffinity"):
+            print("WARNING: cpu pinning is not supported on this platform")
+            return None
+        if self.cpus == "isolated":
+            try:
+                wanted = parse_cpu_list(ISOLATED_CPUS.read_text())
+            except OSError:
+                wanted = []
+            if not wanted:
+                print("WARNING: no isolated cpus, not pinning benchmark")
+                return None
+        else:
+            wanted = [int(c) for c in self.cpus]
+        available = os.sched_getaffinity(0)
+        cpus = [c for c in wanted if c in available]
+        if len(cpus) < len(wanted):
+            missing = sorted(set(wanted) - available)
+            print(f"WARNING: ignoring unavailable benchmark cpus {missing}")
+        return cpus or None
+
+
+def config_for(spec: Dict[str, Any]) -> Optional[BenchmarkConfig]:
+    bench = spec.get("benchmark")
+    if bench is None:
+        return None
+    return BenchmarkConfig.from_spec(bench)
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return dict(
+        min=min(values),
+        median=statistics.median(values),
+        stddev=statistics.stdev(values) if len(values) > 1 else 0.0,
+    )
+
+
+def aggregate_usage(usages: List[Usage]) -> Dict[str, Dict[str, float]]:
+    """Return min, median and stddev of wall, cpu and rss (MiB) by resource."""
+    out = {"wall": summarize([u.wall for u in usages])}
+    cpu = [u.cpu for u in usages if u.cpu is not None]
+    if cpu:
+        out["cpu"] = summarize(cpu)
+    rss = [maxrss_bytes(u.maxrss) / 2**20 for u in usages if u.maxrss is not None]
+    if rss:
+        out["rss"] = summarize(rss)
+    return out
+
+
+def median_usage(usages: List[Usage]) -> Usage:
+    """Return the usage of a typical repetition, the median of each resource."""
+    cpu = [u.cpu for u in usages if u.cpu is not None]
+    rss = [u.maxrss for u in usages if u.maxrss is not None]
+    return Usage(
+        wall=statistics.median(u.wall for u in usages),
+        cpu=statistics.median(cpu) if cpu else None,
+        maxrss=int(statistics.median(rss)) if rss else None,
+    )
+
+
+def aggregate_profiles(
+    profiles: List[Dict[str, Any]],
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Return min, median and stddev of every numeric profile metric stat."""
+    values: Dict[str, Dict[str, List[float]]] = {}
+    for profile in profiles:
+        for metric, stats in profile.items():
+            if not isinstance(stats, dict):
+                continue
+            for stat, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    values.setdefault(metric, {}).setdefault(stat, []).append(value)
+    return {
+        metric: {stat: summarize(v) for stat, v in stats.items()}
+        for metric, stats in values.items()
+    }
+
+
+def median_profile(
+    aggregated: Dict[str, Dict[str, Dict[str, float]]],
+) -> Dict[str, Dict[str, float]]:
+    """Return the profile of a test made of the median of every stat."""
+    return {
+        metric: {stat: summary["median"] for stat, summary in stats.items()}
+        for metric, stats in aggregated.items()
+    }
+
+
+def properties(
+    usage: Dict[str, Dict[str, float]],
+    profile: Dict[str, Dict[str, Dict[str, float]]],
+    runs: int,
+) -> List[Dict[str, str]]:
+    """Return JUnit properties of the aggregates."""
+    props = [dict(name=f"{PROPERTY_PREFIX}runs", value=str(runs))]
+    for resource, summary in usage.items():
+        for stat in STATS:
+            name = f"{PROPERTY_PREFIX}{resource}::{stat}"
+            props.append(dict(name=name, value=f"{summary[stat]:.6g}"))
+    for metric, stats in profile.items():
+        for metric_stat, summary in stats.items():
+            for stat in STATS:
+                name = f"{PROPERTY_PREFIX}{metric}::{metric_stat}::{stat}"
+                props.append(dict(name=name, value=f"{summary[stat]:.6g}"))
+    return props
@@ -4,7 +4,21 @@ import argparse
 import sys
 from typing import Callable, List, Optional
 
-from yea import __version__, context, registry, runner, ytest
+from yea import (
+    __version__,
+    context,
+    durations,
+    perf,
+    plugins,
+    profiler,
+    progress,
+    registry,
+    resultsdb,
+    runner,
+    selection,
+    split,
+    ytest,
+)
 
 if sys.version_info >= (3, 8):
     from typing import Literal
@@ -18,7 +32,7 @@ class CliArgs:
     plugin_args: List[str]
 
     def __init__(self, args: argparse.Namespace):
-        self.action: Literal["run", "list", "r", "l"] = args.action
+        self.action: Literal["run", "list", "r", "l", "perf", "history"] = args.action
         self.all: bool = args.all
         self.debug: bool = args.debug
         self.yeadoc: bool = args.yeadoc
@@ -30,18 +44,39 @@ class CliArgs:
         self.platform: Optional[str] = args.platform
         self.shard: Optional[str] = args.shard
         self.suite: Optional[str] = args.suite
+        self.select: Optional[str] = args.select
         self.tests: Optional[List[str]] = args.tests
         self.plugin_args: list = args.plugin_args or []
         self.strict: bool = args.strict
         self.splits: Optional[int] = args.splits
         self.group: Optional[int] = args.group
+        self.split_budget: Optional[int] = args.split_budget
+        self.split_strategy: str = args.split_strategy
         self.store_durations: bool = args.store_durations
+        self.duration_estimator: str = args.duration_estimator
+        self.queue_dir: Optional[str] = args.queue_dir
+        self.events: Optional[str] = args.events
+        self.profile_harness: Optional[str] = args.profile_harness
+        self.progress: str = args.progress
+        self.declared_plugins_only: bool = args.declared_plugins_only
+        self.check_timeout: Optional[float] = args.check_timeout
+        self.history_action: str = args.history_action
+        self.history_runs: int = args.history_runs
+        self.history_limit: int = args.history_limit
+        self.history_metric: str = args.history_metric
 
 
 def get_tests(yc: "context.YeaContext") -> List["ytest.YeaTest"]:
-    test_reg = registry.Registry(yc=yc)
-    test_reg.probe(all_tests=yc._args.all, tests=yc._args.tests)
-    tests = test_reg.get_tests()
+    with yc._timer.phase("discovery"):
+        test_reg = registry.Registry(yc=yc)
+        with yc._profiler.phase("probe"):
+            test_reg.probe(all_tests=yc._args.all, tests=yc._args.tests)
+        try:
+            with yc._profiler.phase("get_tests"):
+                tests = test_reg.get_tests()
+        except selection.SelectionError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
     return tests
 
 
@@ -67,6 +102,53 @@ def cli_run(yc: "context.YeaContext") -> None:
     tr.run(tests)
 
 
+def cli_perf(yc: "context.YeaContext") -> None:
+    history = perf.PerfHistory(yc._cachedir / perf.HISTORY_DIRNAME).load()
+    lines = perf.report(history, prefixes=yc._args.tests)
+    if not lines:
+        print("No perf history.")
+        return
+    print("Perf report:")
+    for line in lines:
+        print(line)
+
+
+def cli_history(yc: "context.YeaContext") -> None:
+    args = yc._args
+    path = yc._cachedir / resultsdb.DB_FNAME
+    if not path.exists():
+        print("No history.")
+        return
+    db = resultsdb.ResultsDB(path)
+    runs, limit, prefixes = args.history_runs, args.history_limit, args.tests
+    lines = []
+    try:
+        if args.history_action == "flaky":
+            title = f"Flaky tests (last {runs} runs):"
+            for test_id, num, fails, flips in db.flaky(runs, limit, prefixes):
+                lines.append((test_id, f"failed {fails}/{num}, flipped {flips}"))
+        elif args.history_action == "trend":
+            metric = args.history_metric
+            title = f"Trend of {metric} (last {runs} runs):"
+            for test_id, values in db.trend(runs, limit, prefixes, metric=metric):
+                spark = resultsdb.sparkline(values)
+                lines.append((test_id, f"{spark} last {values[-1]:.4g}"))
+        else:
+            title = f"Slowest tests (last {runs} runs, sec):"
+            for test_id, num, median, worst in db.slowest(runs, limit, prefixes):
+                text = f"median {median:.2f}, max {worst:.2f} ({num} runs)"
+                lines.append((test_id, text))
+    finally:
+        db.close()
+    if not lines:
+        print("No history.")
+        return
+    tlen = max(len(test_id) for test_id, _ in lines)
+    print(title)
+    for test_id, text in lines:
+        print(f"  {test_id:<{tlen}s}: {text}")
+
+
 def cli() -> None:
     parser = argparse.ArgumentParser(allow_abbrev=False)
 
@@ -88,15 +170,78 @@ def cli() -> None:
     parser.add_argument("--shard", help="Specify testing shard")
     parser.add_argument("--suite", help="Specify testing suite")
     parser.add_argument("--platform", help="Specify testing platform")
+    parser.add_argument(
+        "-k",
+        "--select",
+        help="Select tests by expression (e.g. 'wandb and not slow'), quote operands"
+        " with spaces or parentheses (e.g. 'id~\"sample(02|03)\"')",
+    )
     parser.add_argument("--noskip", action="store_true", help="Do not skip any tests")
     parser.add_argument("-p", "--plugin-args", action="append", help="Add plugin args")
     parser.add_argument("--version", help="Print version and exit", action="store_true")
     # for split tests (follows pytest-split conventions)
     parser.add_argument("--splits", type=int, help="Number of split workers")
     parser.add_argument("--group", type=int, help="Which split worker are we")
+    parser.add_argument(
+        "--split-budget",
+        type=int,
+        help="Candidate moves to spend improving the split (0 for greedy only)",
+    )
+    parser.add_argument(
+        "--split-strategy",
+        choices=split.STRATEGIES,
+        default="duration",
+        help="Balance splits by test durations or by consistent hashing of test ids",
+    )
     parser.add_argument(
         "--store-durations", action="store_true", help="Store split worker test info"
     )
+    parser.add_argument(
+        "--duration-estimator",
+        choices=durations.ESTIMATORS,
+        default=durations.DEFAULT_ESTIMATOR,
+        help="Statistic of the duration history used to split tests",
+    )
+    parser.add_argument(
+        "--queue-dir",
+        help="Shared directory to pull tests from instead of static splits,"
+        " a new one for every run",
+    )
+
+    parser.add_argument(
+        "--events",
+        help="Write JSONL run events to this path or file descriptor number",
+    )
+
+    parser.add_argument(
+        "--profile-harness",
+        nargs="?",
+        const="cpu",
+        choices=profiler.MODES,
+        help="Profile yea itself, with 'memory' also trace allocations",
+    )
+
+    parser.add_argument(
+        "--progress",
+        choices=progress.MODES,
+        default="auto",
+        help="Show a live status line (tty), periodic progress lines (line) or none"
+        " (off); auto is line, as test output would garble the status line",
+    )
+
+    parser.add_argument(
+        "--declared-plugins-only",
+        action="store_true",
+        help="Only call test_prep/test_done of the plugins a test declares",
+    )
+
+    parser.add_argument(
+        "--check-timeout",
+        type=float,
+        default=plugins.DEFAULT_CHECK_TIMEOUT,
+        help="Seconds the threaded plugin checks of a test may take together,"
+        " plugins that are not thread safe are not bounded (0 to wait forever)",
+    )
 
     parse_list = subparsers.add_parser("list", aliases=["l"], allow_abbrev=False)
     parse_list.add_argument("-a", "--all", action="store_true", help="List all")
@@ -108,6 +253,44 @@ def cli() -> None:
     parse_run.add_argument("tests", nargs="*")
     parse_run.set_defaults(func=cli_run)
 
+    parse_perf = subparsers.add_parser("perf", allow_abbrev=False)
+    parse_perf.add_argument("perf_action", choices=["report"])
+    parse_perf.add_argument("tests", nargs="*", help="Test id prefixes")
+    parse_perf.set_defaults(func=cli_perf, all=False)
+
+    parse_history = subparsers.add_parser("history", allow_abbrev=False)
+    parse_history.add_argument("history_action", choices=["slowest", "flaky", "trend"])
+    parse_history.add_argument("tests", nargs="*", help="Test id prefixes")
+    parse_history.add_argument(
+        "--runs",
+        dest="history_runs",
+        type=int,
+        default=resultsdb.DEFAULT_RUNS,
+        help="Number of most recent runs to look at",
+    )
+    parse_history.add_argument(
+        "--limit",
+        dest="history_limit",
+        type=int,
+        default=resultsdb.DEFAULT_LIMIT,
+        help="Number of tests to show",
+    )
+    parse_history.add_argument(
+        "--metric",
+        dest="history_metric",
+        default="elapsed",
+        help="Trend of elapsed, cpu, maxrss, phase::<name> or <metric>::<stat>",
+    )
+    parse_history.set_defaults(func=cli_history, all=False)
+
+    # options of the history action
+    parser.set_defaults(
+        history_action="slowest",
+        history_runs=resultsdb.DEFAULT_RUNS,
+        history_limit=resultsdb.DEFAULT_LIMIT,
+        history_metric="elapsed",
+    )
+
     args = parser.parse_args()
 
     if args.version:
@@ -120,7 +303,12 @@ def cli() -> None:
 
     cli_args = CliArgs(args)
     yc = context.YeaContext(args=cli_args)
-    args.func(yc)
+    try:
+        args.func(yc)
+    finally:
+        outdir = yc._cachedir / f"harness-profile-{yc._ts}-{yc._pid}"
+        yc._profiler.report(outdir)
+        yc._events.close()
 
 
 if __name__ == "__main__":
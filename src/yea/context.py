@@ -6,9 +6,9 @@ import os
 import shutil
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
-from yea import cli, config, plugins, ytest
+from yea import cli, config, events, plugins, profiler, timing, ytest
 
 
 def _get_width() -> int:
@@ -24,12 +24,18 @@ class YeaContext:
         self._now = datetime.datetime.now()
         self._ts = self._now.strftime("%Y%m%dT%H%M%S")
         self._pid = os.getpid()
+        # harness phases, tests keep their own
+        self._timer = timing.PhaseTimer()
+        self._profiler = profiler.HarnessProfiler(args.profile_harness)
         self._setup_env()
-        self._cfg = config.Config()
-        self._setup_cachedir()
-        self._setup_logging()
-        self._plugs: plugins.Plugins = plugins.Plugins(yc=self)
+        with self._profiler.phase("config"):
+            self._cfg = config.Config()
+            self._setup_cachedir()
+            self._setup_logging()
+        with self._profiler.phase("plugins"):
+            self._plugs: plugins.Plugins = plugins.Plugins(yc=self)
         self._platform = self._get_platform()
+        self._events = events.EventLog(args.events)
 
     def _setup_env(self) -> None:
         self._covfile = os.environ.get("COVERAGE_FILE")
@@ -69,6 +75,9 @@ class YeaContext:
             p = "mac"
         return p
 
+    def emit(self, event: str, **fields: Any) -> None:
+        self._events.emit(event, **fields)
+
     def is_live(self) -> bool:
         return self._args.live
 
@@ -87,8 +96,8 @@ class YeaContext:
     def monitors_stop(self) -> None:
         self._plugs.monitors_stop()
 
-    def monitors_reset(self) -> None:
-        self._plugs.monitors_reset()
+    def monitors_reset(self, yt: "Optional[ytest.YeaTest]" = None) -> None:
+        self._plugs.monitors_reset(yt)
 
     def test_prep(self, yt: "ytest.YeaTest") -> None:
         width = _get_width()
@@ -0,0 +1,121 @@
+"""Test duration history.
+
+Every run that stores durations appends its own jsonl file to the history
+directory, so split workers never overwrite each other and partial files
+from several workers can be merged by copying them into the directory.
+"""
+
+import json
+import pathlib
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from yea import jsonlhistory
+
+ESTIMATORS = ("median", "ewma", "p90", "mean", "last")
+DEFAULT_ESTIMATOR = "median"
+# number of most recent samples kept per test
+HISTORY_WINDOW = 20
+EWMA_ALPHA = 0.3
+# merge history files into one once there are this many
+COMPACT_FILES = 50
+COMPACT_FNAME = jsonlhistory.COMPACT_FNAME
+# directory under the yea cache dir
+HISTORY_DIRNAME = "durations"
+
+
+class Sample(NamedTuple):
+    ts: float
+    elapsed: float
+    ok: bool
+
+
+class DurationStats(NamedTuple):
+    num_samples: int
+    last: float
+    mean: float
+    ewma: float
+    median: float
+    p90: float
+
+
+def _quantile(values: List[float], q: float) -> float:
+    """Return quantile q of sorted values with linear interpolation."""
+    pos = (len(values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def compute_stats(samples: List[Sample]) -> Optional[DurationStats]:
+    # failed runs often end early or hang until timeout, prefer good samples
+    good = [s for s in samples if s.ok] or samples
+    if not good:
+        return None
+    elapsed = [s.elapsed for s in sorted(good)]
+    ewma = elapsed[0]
+    for e in elapsed[1:]:
+        ewma = EWMA_ALPHA * e + (1 - EWMA_ALPHA) * ewma
+    ordered = sorted(elapsed)
+    return DurationStats(
+        num_samples=len(elapsed),
+        last=elapsed[-1],
+        mean=sum(elapsed) / len(elapsed),
+        ewma=ewma,
+        median=_quantile(ordered, 0.5),
+        p90=_quantile(ordered, 0.9),
+    )
+
+
+class DurationHistory(jsonlhistory.JsonlHistory[str, Sample]):
+    kind = "durations"
+
+    def __init__(self, path: pathlib.Path) -> None:
+        super().__init__(path, window=HISTORY_WINDOW, compact_files=COMPACT_FILES)
+
+    def load(self) -> "DurationHistory":
+        self._load()
+        return self
+
+    def _parse(self, rec: Dict[str, Any]) -> Tuple[str, Sample]:
+        test_id = rec["id"]
+        if not isinstance(test_id, str):
+            raise TypeError(f"test id {test_id!r}")
+        return test_id, Sample(float(rec["ts"]), float(rec["elapsed"]), bool(rec["ok"]))
+
+    def _format(self, test_id: str, s: Sample) -> Dict[str, Any]:
+        return dict(id=test_id, ts=s.ts, elapsed=s.elapsed, ok=s.ok)
+
+    def append(self, results: List[Tuple[str, float, bool]]) -> pathlib.Path:
+        """Record results of this run in a new history file."""
+        now = time.time()
+        return self._append(
+            [(test_id, Sample(now, elapsed, ok)) for test_id, elapsed, ok in results]
+        )
+
+    def stats(self) -> Dict[str, DurationStats]:
+        out = {}
+        for test_id, samples in self._samples.items():
+            st = compute_stats(samples)
+            if st:
+                out[test_id] = st
+        return out
+
+    def estimates(self, estimator: str = DEFAULT_ESTIMATOR) -> Dict[str, float]:
+        if estimator not in ESTIMATORS:
+            raise ValueError(f"Unknown duration estimator: {estimator}")
+        return {k: getattr(st, estimator) for k, st in self.stats().items()}
+
+
+def load_durations(
+    durations_path: Optional[pathlib.Path],
+    history_path: pathlib.Path,
+    estimator: str = DEFAULT_ESTIMATOR,
+) -> Dict[str, float]:
+    """Return duration estimates from the history, falling back to .yea_durations."""
+    durations: Dict[str, float] = {}
+    if durations_path and durations_path.exists():
+        with open(durations_path) as f:
+            durations = json.load(f)
+    durations.update(DurationHistory(history_path).load().estimates(estimator))
+    return durations
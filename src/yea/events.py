@@ -0,0 +1,55 @@
+"""Machine readable event stream of a yea run.
+
+With ``--events <path|fd>`` every step of the run lifecycle is written as a
+line of JSON, for example::
+
+    {"event": "process_exit", "ts": 5123.52, "test_id": "0.sample", "exit_code": 0}
+
+``ts`` is ``time.monotonic()`` so events can be ordered and timed reliably;
+the ``run_start`` event also records the wall clock time and pid to anchor
+them. Events are flushed as they are written so the stream can be followed
+while the run is in progress.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import IO, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EventLog:
+    _file: Optional[IO[str]]
+
+    def __init__(self, target: Optional[str] = None) -> None:
+        self._file = None
+        if not target:
+            return
+        if target.isdigit():
+            # the fd belongs to whoever started us, leave it open
+            self._file = os.fdopen(int(target), "w", buffering=1, closefd=False)
+        else:
+            self._file = open(target, "a", buffering=1, encoding="utf8")
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None
+
+    def emit(self, event: str, **fields: Any) -> None:
+        if not self._file:
+            return
+        record = dict(event=event, ts=time.monotonic(), **fields)
+        try:
+            self._file.write(json.dumps(record, default=str) + "\n")
+            self._file.flush()
+        except (OSError, ValueError) as e:
+            # a closed pipe must not take the run down with it
+            logger.warning(f"Disabling event stream: {e}")
+            self._file = None
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,113 @@
+"""Histories of per key samples stored as jsonl files in a directory.
+
+Every run appends its own file, so parallel workers never overwrite each
+other and files from several machines can be merged by copying them into
+the directory. Once there are many files they are compacted into one that
+keeps only the most recent samples of every key.
+"""
+
+import abc
+import json
+import logging
+import os
+import pathlib
+import socket
+import time
+import uuid
+from typing import Any, Dict, Generic, Iterable, List, Tuple, TypeVar
+
+from yea import util
+
+logger = logging.getLogger(__name__)
+
+COMPACT_FNAME = "history.jsonl"
+# held while compacting, appending needs no lock
+LOCK_FNAME = "compact.lock"
+
+K = TypeVar("K")
+# samples are named tuples starting with their timestamp
+S = TypeVar("S", bound=Tuple[Any, ...])
+
+
+class JsonlHistory(abc.ABC, Generic[K, S]):
+    """Base of the histories, subclasses convert samples from and to records."""
+
+    # file name prefix and what is named in warnings
+    kind = "history"
+    _path: pathlib.Path
+    _samples: Dict[K, List[S]]
+    _files: List[pathlib.Path]
+
+    def __init__(self, path: pathlib.Path, window: int, compact_files: int) -> None:
+        self._path = path
+        self._window = window
+        self._compact_files = compact_files
+        self._samples = {}
+        self._files = []
+
+    @abc.abstractmethod
+    def _parse(self, rec: Dict[str, Any]) -> Tuple[K, S]:
+        """Return key and sample of a record, raise on a bad one."""
+
+    @abc.abstractmethod
+    def _format(self, key: K, sample: S) -> Dict[str, Any]:
+        """Return the record of a sample."""
+
+    def _load(self) -> None:
+        if not self._path.is_dir():
+            return
+        for fname in sorted(self._path.glob("*.jsonl")):
+            self._load_file(fname)
+            self._files.append(fname)
+        for samples in self._samples.values():
+            samples.sort()
+            del samples[: -self._window]
+
+    def _load_file(self, fname: pathlib.Path) -> None:
+        with open(fname, encoding="utf8") as f:
+            for line in f:
+                try:
+                    key, sample = self._parse(json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    logger.warning(f"Ignoring bad {self.kind} record in {fname}")
+                    continue
+                self._samples.setdefault(key, []).append(sample)
+
+    def _write(self, fname: pathlib.Path, records: Iterable[Tuple[K, S]]) -> None:
+        self._path.mkdir(parents=True, exist_ok=True)
+        tmp_path = fname.with_name(f".{fname.name}.tmp")
+        with open(tmp_path, "w", encoding="utf8") as f:
+            for key, sample in records:
+                f.write(json.dumps(self._format(key, sample)) + "\n")
+        # readers only ever see complete files
+        os.replace(tmp_path, fname)
+
+    def _append(self, records: List[Tuple[K, S]]) -> pathlib.Path:
+        """Write records to a new history file of this run."""
+        host = socket.gethostname()
+        ts = time.strftime("%Y%m%dT%H%M%S")
+        suffix = uuid.uuid4().hex[:8]
+        fname = self._path / f"{self.kind}-{ts}-{host}-{os.getpid()}-{suffix}.jsonl"
+        self._write(fname, records)
+        for key, sample in records:
+            self._samples.setdefault(key, []).append(sample)
+        self._files.append(fname)
+        return fname
+
+    def compact(self) -> None:
+        """Merge all history files into one, keeping the recent window."""
+        if len(self._files) < self._compact_files:
+            return
+        fname = self._path / COMPACT_FNAME
+        with util.FileLock(self._path / LOCK_FNAME):
+            # other workers may have appended or compacted since we loaded
+            self._samples = {}
+            self._files = []
+            self._load()
+            records = [(k, s) for k, samples in self._samples.items() for s in samples]
+            self._write(fname, records)
+            # only files that went into the compacted one
+            for f in self._files:
+                if f != fname:
+                    f.unlink(missing_ok=True)
+        self._files = [fname]
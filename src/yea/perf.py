@@ -0,0 +1,326 @@
+"""Performance history of ``:yea:profile`` metrics.
+
+Plugins report profile metrics as metric -> stat -> value. Every run appends
+them, per test id, to a history directory in the yea cache (one jsonl file
+per run, like the duration history). A new value is compared against the
+recent good values of the same test, metric and stat with a one sided
+Mann-Whitney U test. A test that declares a ``perf`` section fails when a
+metric is both significantly and relevantly larger than its baseline::
+
+    perf:
+      threshold: 0.1      # allowed relative increase over the baseline median
+      alpha: 0.1          # significance level
+      baseline: 20        # number of recent good runs to compare against
+      accept: 5           # accept a change after this many regressed runs, 0 never
+      metrics:
+        ":wandb:init::mean": 0.25  # threshold per metric::stat (or metric)
+"""
+
+import math
+import pathlib
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from yea import jsonlhistory
+
+HISTORY_DIRNAME = "perf"
+COMPACT_FILES = 50
+# samples kept per test, metric and stat
+HISTORY_WINDOW = 50
+DEFAULT_THRESHOLD = 0.1
+DEFAULT_ALPHA = 0.1
+DEFAULT_BASELINE = 20
+# consecutive regressions after which the new level becomes the baseline
+DEFAULT_ACCEPT = 5
+# a single new value can only be significant with enough history
+MIN_BASELINE = 10
+# exact null distribution of U up to this many pairs, normal approximation above
+EXACT_MAX_PAIRS = 2000
+
+# (test id, metric, stat)
+Key = Tuple[str, str, str]
+
+
+class PerfSample(NamedTuple):
+    ts: float
+    value: float
+    ok: bool
+
+
+class Comparison(NamedTuple):
+    baseline_size: int
+    baseline_median: float
+    value: float
+    change: float
+    p_value: float
+    threshold: float
+    regressed: bool
+
+
+def _median(values: List[float]) -> float:
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def u_distribution(n1: int, n2: int) -> List[int]:
+    """Return how many orderings of n1 + n2 distinct values give each U.
+
+    U counts the (baseline, current) pairs where the current value is larger.
+    """
+    # counts[m, k] is the distribution for m baseline and k current values
+    counts: Dict[Tuple[int, int], List[int]] = {}
+    for m in range(n1 + 1):
+        for k in range(n2 + 1):
+            if not m or not k:
+                counts[m, k] = [1]
+                continue
+            # the largest value is current (beats all m) or baseline (beats none)
+            dist = [0] * (m * k + 1)
+            for u, c in enumerate(counts[m, k - 1]):
+                dist[u + m] += c
+            for u, c in enumerate(counts[m - 1, k]):
+                dist[u] += c
+            counts[m, k] = dist
+    return counts[n1, n2]
+
+
+def mann_whitney_p(baseline: List[float], current: List[float]) -> float:
+    """One sided p-value for current being larger than baseline."""
+    n1, n2 = len(baseline), len(current)
+    if not n1 or not n2:
+        return 1.0
+    u = 0.0
+    for c in current:
+        for b in baseline:
+            if c > b:
+                u += 1
+            elif c == b:
+                u += 0.5
+    if n1 * n2 <= EXACT_MAX_PAIRS:
+        # exact for distinct values, ties count as half a win
+        counts = u_distribution(n1, n2)
+        return sum(counts[math.ceil(u - 1e-9) :]) / sum(counts)
+
+    # normal approximation with tie correction
+    values = sorted(baseline + current)
+    n = n1 + n2
+    ties = 0
+    i = 0
+    while i < n:
+        j = i
+        while j < n and values[j] == values[i]:
+            j += 1
+        ties += (j - i) ** 3 - (j - i)
+        i = j
+    var = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if var <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(var)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def min_baseline(alpha: float) -> int:
+    """Return the baseline size at which one new value can reach p < alpha."""
+    # the smallest p-value of one value against n is 1 / (n + 1)
+    return max(MIN_BASELINE, math.floor(1 / alpha) if alpha > 0 else 0)
+
+
+def compare(
+    baseline: List[float],
+    current: List[float],
+    threshold: float = DEFAULT_THRESHOLD,
+    alpha: float = DEFAULT_ALPHA,
+) -> Optional[Comparison]:
+    """Compare current values to the baseline, None without enough history."""
+    if len(baseline) < min_baseline(alpha) or not current:
+        return None
+    base = _median(baseline)
+    value = _median(current)
+    change = value / base - 1 if base else 0.0
+    p_value = mann_whitney_p(baseline, current)
+    return Comparison(
+        baseline_size=len(baseline),
+        baseline_median=base,
+        value=value,
+        change=change,
+        p_value=p_value,
+        threshold=threshold,
+        regressed=p_value < alpha and change > threshold,
+    )
+
+
+class PerfConfig(NamedTuple):
+    threshold: float
+    alpha: float
+    baseline: int
+    metrics: Dict[str, float]
+    accept: int = DEFAULT_ACCEPT
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any]) -> "PerfConfig":
+        config = cls(
+            threshold=float(spec.get("threshold", DEFAULT_THRESHOLD)),
+            alpha=float(spec.get("alpha", DEFAULT_ALPHA)),
+            baseline=int(spec.get("baseline", DEFAULT_BASELINE)),
+            metrics={k: float(v) for k, v in spec.get("metrics", {}).items()},
+            accept=int(spec.get("accept", DEFAULT_ACCEPT)),
+        )
+        need = min_baseline(config.alpha)
+        if config.baseline < need:
+            print(
+                f"WARNING: perf alpha {config.alpha} needs a baseline of {need} runs,"
+                f" with {config.baseline} no regression can be detected"
+            )
+        return config
+
+    def threshold_for(self, metric: str, stat: str) -> float:
+        name = f"{metric}::{stat}"
+        if name in self.metrics:
+            return self.metrics[name]
+        return self.metrics.get(metric, self.threshold)
+
+
+DEFAULT_CONFIG = PerfConfig(DEFAULT_THRESHOLD, DEFAULT_ALPHA, DEFAULT_BASELINE, {})
+
+
+def profile_values(profile: Dict[str, Any]) -> List[Tuple[str, str, float]]:
+    """Return the numeric (metric, stat, value) entries of a profile."""
+    values = []
+    for metric, stats in profile.items():
+        if not isinstance(stats, dict):
+            continue
+        for stat, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                values.append((metric, str(stat), float(value)))
+    return values
+
+
+def baseline_values(
+    samples: List[PerfSample],
+    size: int = DEFAULT_BASELINE,
+    accept: int = DEFAULT_ACCEPT,
+) -> List[float]:
+    """Return the values of the most recent good samples.
+
+    At least accept consecutive regressed samples are a step change: they
+    become the baseline and the samples before them are dropped.
+    """
+    values: List[float] = []
+    streak: List[float] = []
+    for s in reversed(samples):
+        if not s.ok:
+            streak.append(s.value)
+            continue
+        if accept and len(streak) >= accept:
+            break
+        streak = []
+        values.append(s.value)
+    if accept and len(streak) >= accept:
+        values.extend(streak)
+    return values[:size][::-1]
+
+
+class PerfHistory(jsonlhistory.JsonlHistory[Key, PerfSample]):
+    kind = "perf"
+    _pending: List[Tuple[Key, PerfSample]]
+
+    def __init__(self, path: pathlib.Path) -> None:
+        super().__init__(path, window=HISTORY_WINDOW, compact_files=COMPACT_FILES)
+        self._pending = []
+
+    def load(self) -> "PerfHistory":
+        self._load()
+        return self
+
+    def _parse(self, rec: Dict[str, Any]) -> Tuple[Key, PerfSample]:
+        key = (str(rec["id"]), str(rec["metric"]), str(rec["stat"]))
+        return key, PerfSample(float(rec["ts"]), float(rec["value"]), bool(rec["ok"]))
+
+    def _format(self, key: Key, s: PerfSample) -> Dict[str, Any]:
+        test_id, metric, stat = key
+        return dict(
+            id=test_id, metric=metric, stat=stat, ts=s.ts, value=s.value, ok=s.ok
+        )
+
+    def keys(self) -> List[Key]:
+        return sorted(self._samples)
+
+    def samples(self, key: Key) -> List[PerfSample]:
+        return self._samples.get(key, [])
+
+    def baseline(
+        self, key: Key, size: int = DEFAULT_BASELINE, accept: int = DEFAULT_ACCEPT
+    ) -> List[float]:
+        """Return the most recent good values of key."""
+        return baseline_values(self.samples(key), size, accept)
+
+    def check(
+        self, test_id: str, profile: Dict[str, Any], config: PerfConfig
+    ) -> Dict[Key, Comparison]:
+        """Compare a test's profile metrics to their baselines."""
+        out = {}
+        for metric, stat, value in profile_values(profile):
+            key = (test_id, metric, stat)
+            cmp = compare(
+                self.baseline(key, config.baseline, config.accept),
+                [value],
+                threshold=config.threshold_for(metric, stat),
+                alpha=config.alpha,
+            )
+            if cmp:
+                out[key] = cmp
+        return out
+
+    def record(self, test_id: str, profile: Dict[str, Any], ok: bool) -> None:
+        """Queue a test's profile metrics, written by save()."""
+        now = time.time()
+        for metric, stat, value in profile_values(profile):
+            self._pending.append(((test_id, metric, stat), PerfSample(now, value, ok)))
+
+    def save(self) -> Optional[pathlib.Path]:
+        """Write the recorded samples of this run to a new history file."""
+        if not self._pending:
+            return None
+        fname = self._append(self._pending)
+        self._pending = []
+        self.compact()
+        return fname
+
+
+def report(history: PerfHistory, prefixes: Optional[List[str]] = None) -> List[str]:
+    """Return report lines comparing the last value of every metric."""
+    rows = []
+    for key in history.keys():
+        test_id, metric, stat = key
+        if prefixes and not any(test_id.startswith(p) for p in prefixes):
+            continue
+        samples = history.samples(key)
+        last = samples[-1]
+        good = baseline_values(samples[:-1])
+        cmp = compare(good, [last.value])
+        name = f"{test_id} {metric}::{stat}"
+        if cmp is None:
+            status = f"n={len(good)} (need {min_baseline(DEFAULT_ALPHA)})"
+            rows.append((name, f"{last.value:.4g}", "", "", status))
+            continue
+        status = "REGRESSED" if cmp.regressed else "ok"
+        rows.append(
+            (
+                name,
+                f"{last.value:.4g}",
+                f"{cmp.baseline_median:.4g}",
+                f"{cmp.change:+.1%}",
+                f"p={cmp.p_value:.3f} {status}",
+            )
+        )
+    if not rows:
+        return []
+    header = ("metric", "last", "baseline", "change", "status")
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    lines = []
+    for row in [header] + rows:
+        lines.append("  " + "  ".join(f"{c:<{w}s}" for c, w in zip(row, widths)))
+    return lines
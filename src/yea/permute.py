@@ -0,0 +1,141 @@
+"""Permutation strategies for ``parametrize``.
+
+The full cartesian product of the permute groups grows quickly, a covering
+array runs every combination of values of any ``k`` groups in far fewer
+permutations::
+
+    parametrize:
+      strategy: pairwise  # full | pairwise | nwise(k) | sample(n, seed)
+      permute:
+        - ...
+
+Permutations are identified by their index in the full product (the
+ordering of ``itertools.product``), so a combination keeps its permute id
+whatever strategy selected it.
+"""
+
+import itertools
+import random
+import re
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+DEFAULT_STRATEGY = "full"
+
+RE_STRATEGY = re.compile(
+    r"^\s*(?:(full|pairwise)|nwise\(\s*(\d+)\s*\)"
+    r"|sample\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\))\s*$"
+)
+
+
+class Strategy(NamedTuple):
+    """Parsed strategy: kind is one of full, nwise or sample."""
+
+    kind: str
+    strength: int = 0
+    size: int = 0
+    seed: int = 0
+
+
+def parse_strategy(text: Optional[str]) -> Strategy:
+    if text is None:
+        return Strategy(DEFAULT_STRATEGY)
+    m = RE_STRATEGY.match(str(text))
+    if not m:
+        raise ValueError(f"Unknown parametrize strategy: {text}")
+    name, strength, count, seed = m.groups()
+    if name == "full":
+        return Strategy("full")
+    if name == "pairwise":
+        return Strategy("nwise", strength=2)
+    if strength is not None:
+        if int(strength) < 1:
+            raise ValueError(f"Strength of {text} must be at least 1")
+        return Strategy("nwise", strength=int(strength))
+    return Strategy("sample", size=int(count), seed=int(seed or 0))
+
+
+def encode(sizes: Sequence[int], row: Sequence[int]) -> int:
+    """Return the index of row (value indexes) in the full product."""
+    index = 0
+    for size, value in zip(sizes, row):
+        index = index * size + value
+    return index
+
+
+def decode(sizes: Sequence[int], index: int) -> Tuple[int, ...]:
+    row = []
+    for size in reversed(sizes):
+        index, value = divmod(index, size)
+        row.append(value)
+    return tuple(reversed(row))
+
+
+def _total(sizes: Sequence[int]) -> int:
+    total = 1
+    for size in sizes:
+        total *= size
+    return total
+
+
+def covering_array(sizes: Sequence[int], strength: int) -> List[Tuple[int, ...]]:
+    """Return rows covering every combination of values of strength columns.
+
+    Greedy and deterministic: each row starts from the smallest uncovered
+    combination and fills the remaining columns, in order, with the value
+    covering the most new combinations (ties go to the lowest value).
+    """
+    ncols = len(sizes)
+    if strength >= ncols:
+        return list(itertools.product(*[range(s) for s in sizes]))
+    subsets = list(itertools.combinations(range(ncols), strength))
+    by_col: Dict[int, List[Tuple[int, ...]]] = {c: [] for c in range(ncols)}
+    for cols in subsets:
+        for c in cols:
+            by_col[c].append(cols)
+    uncovered: Set[Tuple[Tuple[int, ...], Tuple[int, ...]]] = set()
+    for cols in subsets:
+        for vals in itertools.product(*[range(sizes[c]) for c in cols]):
+            uncovered.add((cols, vals))
+
+    rows = []
+    while uncovered:
+        seed_cols, seed_vals = min(uncovered)
+        # -1 marks columns without a value yet
+        row = [-1] * ncols
+        for c, v in zip(seed_cols, seed_vals):
+            row[c] = v
+        for col in range(ncols):
+            if row[col] >= 0:
+                continue
+            best_value, best_gain = 0, -1
+            for value in range(sizes[col]):
+                row[col] = value
+                gain = 0
+                for cols in by_col[col]:
+                    vals = tuple(row[c] for c in cols)
+                    if min(vals) >= 0 and (cols, vals) in uncovered:
+                        gain += 1
+                if gain > best_gain:
+                    best_value, best_gain = value, gain
+            row[col] = best_value
+        full_row = tuple(row)
+        for cols in subsets:
+            uncovered.discard((cols, tuple(full_row[c] for c in cols)))
+        rows.append(full_row)
+    return rows
+
+
+def select(sizes: Sequence[int], strategy: Optional[str]) -> List[int]:
+    """Return the sorted full product indexes of the permutations to run."""
+    parsed = parse_strategy(strategy)
+    total = _total(sizes)
+    if total == 0:
+        return []
+    if parsed.kind == "sample":
+        rng = random.Random(parsed.seed)
+        return sorted(rng.sample(range(total), min(parsed.size, total)))
+    if parsed.kind == "nwise":
+        return sorted(
+            {encode(sizes, r) for r in covering_array(sizes, parsed.strength)}
+        )
+    return list(range(total))
@@ -1,7 +1,9 @@
 """Plugins."""
 
 import sys
-from typing import Any, List, Set
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
 
 from yea import context, result, ytest
 
@@ -13,6 +15,39 @@ else:
 
 # TODO: implement YeaPlugin that plugins (such as yea-wandb) will inherit from
 
+# name of per test hook timings, as PhaseTimer entries and JUnit properties
+HOOK_PREFIX = "plugin::"
+DEFAULT_CHECK_TIMEOUT = 600.0
+
+
+class HookStats:
+    """Calls, total and slowest time of a plugin hook over the run."""
+
+    __slots__ = ("calls", "total", "slowest")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0.0
+        self.slowest = 0.0
+
+
+class _Check(threading.Thread):
+    """A plugin check yea can stop waiting for, it does not keep yea alive."""
+
+    def __init__(self, plugins: "Plugins", p: Any, yt: "ytest.YeaTest") -> None:
+        super().__init__(name=f"yea-check-{p.name}", daemon=True)
+        self._plugins = plugins
+        self._p = p
+        self.yt = yt
+        self.result: Optional[result.ResultData] = None
+        self.error: Optional[BaseException] = None
+
+    def run(self) -> None:
+        try:
+            self.result = self._plugins._check(self._p, self.yt)
+        except BaseException as e:
+            self.error = e
+
 
 class Plugins:
     def __init__(self, yc: "context.YeaContext") -> None:
@@ -20,6 +55,69 @@ class Plugins:
         self._plugin_list: list = []
         self._find_plugins()
         self._plugs_needed: Set[str] = set()
+        self._hook_stats: Dict[str, HookStats] = {}
+        # test_check hooks finish in yea-check threads
+        self._stats_lock = threading.Lock()
+        # checks that timed out and may still be running, by plugin name
+        self._timed_out: Dict[str, _Check] = {}
+
+    def _call(
+        self,
+        p: Any,
+        hook: str,
+        *args: Any,
+        yt: "Optional[ytest.YeaTest]" = None,
+        **kwargs: Any,
+    ) -> Any:
+        """Call a plugin hook, timing it for the run and for test yt.
+
+        Plugins still running a timed out check are skipped.
+        """
+        check = self._still_checking(p)
+        if check:
+            print(
+                f"WARNING: skipping {p.name}::{hook}, plugin {p.name} is still"
+                f" checking {check.yt.test_id}"
+            )
+            return None
+        start = time.monotonic()
+        try:
+            return getattr(p, hook)(*args, **kwargs)
+        finally:
+            elapsed = time.monotonic() - start
+            name = f"{p.name}::{hook}"
+            with self._stats_lock:
+                stats = self._hook_stats.setdefault(name, HookStats())
+                stats.calls += 1
+                stats.total += elapsed
+                stats.slowest = max(stats.slowest, elapsed)
+                if yt is not None:
+                    yt._plugin_times.add(f"{HOOK_PREFIX}{name}", elapsed)
+
+    def _still_checking(self, p: Any) -> Optional[_Check]:
+        with self._stats_lock:
+            check = self._timed_out.get(p.name)
+            if check and not check.is_alive():
+                del self._timed_out[p.name]
+                check = None
+        return check
+
+    def hook_report(self) -> List[str]:
+        """Return summary lines of hook times, slowest total first."""
+        lines: List[str] = []
+        if not self._hook_stats:
+            return lines
+        nlen = max(len(name) for name in self._hook_stats)
+        ranked = sorted(self._hook_stats.items(), key=lambda kv: -kv[1].total)
+        for name, stats in ranked:
+            lines.append(
+                f"  {name:<{nlen}s}: {stats.total:8.2f} in {stats.calls} calls"
+                f" (mean {stats.total / stats.calls:.3f}, max {stats.slowest:.3f})"
+            )
+        return lines
+
+    def _declared(self, p: Any, yt: "ytest.YeaTest") -> bool:
+        return p.name in yt.config.get("plugin", [])
 
     def _find_plugins(self) -> None:
         discovered_plugins = entry_points(group="yea.plugins")
@@ -45,52 +143,101 @@ class Plugins:
         for p in self._plugin_list:
             if p.name not in self._plugs_needed:
                 continue
-            p.monitors_init()
+            self._call(p, "monitors_init")
 
     def monitors_start(self) -> None:
         for p in self._plugin_list:
             if p.name not in self._plugs_needed:
                 continue
-            p.monitors_start()
+            self._call(p, "monitors_start")
 
     def monitors_start_test(self, yt: "ytest.YeaTest") -> None:
         for p in self._plugin_list:
             if p.name not in self._plugs_needed:
                 continue
-            p.monitors_start_test(yt)
+            self._call(p, "monitors_start_test", yt, yt=yt)
 
     def monitors_stop(self) -> None:
         for p in self._plugin_list:
             if p.name not in self._plugs_needed:
                 continue
-            p.monitors_stop()
+            self._call(p, "monitors_stop")
 
-    def monitors_reset(self) -> None:
+    def monitors_reset(self, yt: "Optional[ytest.YeaTest]" = None) -> None:
         for p in self._plugin_list:
             if p.name not in self._plugs_needed:
                 continue
-            p.monitors_reset()
+            self._call(p, "monitors_reset", yt=yt)
 
     def test_prep(self, yt: "ytest.YeaTest") -> None:
         # wandb_dir_safe_cleanup()
+        declared_only = self._yc._args.declared_plugins_only
         for p in self._plugin_list:
-            p.test_prep(yt)
+            if declared_only and not self._declared(p, yt):
+                continue
+            self._call(p, "test_prep", yt, yt=yt)
 
     def test_done(self, yt: "ytest.YeaTest") -> None:
         # wandb_dir_safe_cleanup()
+        declared_only = self._yc._args.declared_plugins_only
         for p in self._plugin_list:
-            p.test_done(yt)
+            if declared_only and not self._declared(p, yt):
+                continue
+            self._call(p, "test_done", yt, yt=yt)
 
     def test_check(self, yt: "ytest.YeaTest") -> List[result.ResultData]:
+        """Return the results of the plugins a test uses, in plugin order.
+
+        Plugins check in their own threads unless they set ``thread_safe =
+        False``, those are checked one at a time in this thread and are not
+        bounded. Once they are done the threaded checks get --check-timeout
+        seconds together. A check that takes longer is left running and its
+        plugin is skipped until it returns.
+        """
         # ctx = self._backend.get_state()
         test_config = yt.config
-        result_list = []
-        for p in self._plugin_list:
-            if p.name not in self._plugs_needed:
-                continue
-            if p.name not in test_config.get("plugin", []):
+        plugs = [
+            p
+            for p in self._plugin_list
+            if p.name in self._plugs_needed and p.name in test_config.get("plugin", [])
+        ]
+        timeout = self._yc._args.check_timeout or None
+        results: Dict[str, Optional[result.ResultData]] = {}
+        checks: Dict[str, _Check] = {}
+        for p in plugs:
+            if self._still_checking(p):
+                results[p.name] = self._failed(f"CHECK_BUSY({p.name})")
+            elif getattr(p, "thread_safe", True):
+                checks[p.name] = _Check(self, p, yt)
+                checks[p.name].start()
+        for p in plugs:
+            if p.name not in results and p.name not in checks:
+                results[p.name] = self._check(p, yt)
+
+        deadline = time.monotonic() + timeout if timeout else None
+        for name, check in checks.items():
+            check.join(None if deadline is None else deadline - time.monotonic())
+            if check.is_alive():
+                print(
+                    f"WARNING: plugin {name} still checking {yt.test_id}"
+                    f" after {timeout:g}s, leaving it running"
+                )
+                with self._stats_lock:
+                    self._timed_out[name] = check
+                results[name] = self._failed(f"CHECK_TIMEOUT({name}:{timeout:g}s)")
                 continue
-            result = p.test_check(yt, debug=self._yc._args.debug)
-            if result:
-                result_list.append(result)
-        return result_list
+            if check.error:
+                raise check.error
+            results[name] = check.result
+        return [r for r in (results[p.name] for p in plugs) if r]
+
+    def _failed(self, failure: str) -> result.ResultData:
+        res = result.ResultData()
+        res.failures.append(failure)
+        return res
+
+    def _check(self, p: Any, yt: "ytest.YeaTest") -> Optional[result.ResultData]:
+        res: Optional[result.ResultData] = self._call(
+            p, "test_check", yt, yt=yt, debug=self._yc._args.debug
+        )
+        return res
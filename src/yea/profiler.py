@@ -0,0 +1,200 @@
+"""Profiling of the yea harness itself (``--profile-harness``).
+
+Each top level phase (config, plugins, probe, get_tests, run, finish) gets
+its own cProfile profile; nested phases pause the enclosing one so time is
+only counted once. With ``--profile-harness memory`` tracemalloc also
+records the peak memory of each phase. At exit the profiles are written to
+a directory in the yea cache:
+
+    <phase>.pstats      load with ``python -m pstats``
+    harness.collapsed   collapsed stacks for flamegraph.pl or speedscope
+
+and a summary of the slowest functions is printed.
+"""
+
+import contextlib
+import cProfile
+import pathlib
+import pstats
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MODES = ("cpu", "memory")
+TOP_N = 15
+# deeper call chains are cut off in the collapsed stacks
+MAX_STACK_DEPTH = 64
+
+Func = Tuple[str, int, str]
+
+
+def _func_name(func: Func) -> str:
+    fname, line, name = func
+    if fname == "~":
+        # builtins
+        return name
+    return f"{name} ({pathlib.Path(fname).name}:{line})"
+
+
+def collapsed_stacks(stats: pstats.Stats, root: str = "") -> List[str]:
+    """Convert profile stats to collapsed stack lines with microsecond counts.
+
+    cProfile only records caller/callee pairs, so the time of a function
+    called from several places is split between them in proportion to the
+    cumulative time of each call edge.
+    """
+    raw: Dict[Func, Any] = stats.stats  # type: ignore[attr-defined]
+    callees: Dict[Func, Dict[Func, float]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge[3]
+    roots = [func for func, entry in raw.items() if not entry[4]]
+
+    counts: Dict[str, int] = {}
+
+    def walk(func: Func, stack: List[str], share: float) -> None:
+        _, _, tottime, cumtime, _ = raw[func]
+        stack = stack + [_func_name(func)]
+        own = int(tottime * share * 1e6)
+        if own > 0:
+            key = ";".join(stack)
+            counts[key] = counts.get(key, 0) + own
+        if len(stack) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_cumtime in callees.get(func, {}).items():
+            callee_cumtime = raw[callee][3]
+            if _func_name(callee) in stack or not callee_cumtime:
+                continue
+            callee_share = share * min(edge_cumtime / callee_cumtime, 1.0)
+            if raw[callee][3] * callee_share * 1e6 < 1:
+                continue
+            walk(callee, stack, callee_share)
+
+    for func in roots:
+        walk(func, [root] if root else [], 1.0)
+    return [f"{key} {count}" for key, count in sorted(counts.items())]
+
+
+class HarnessProfiler:
+    _profiles: Dict[str, cProfile.Profile]
+    _wall: Dict[str, float]
+    _peak: Dict[str, int]
+    _stack: List[str]
+
+    def __init__(self, mode: Optional[str] = None) -> None:
+        self._mode = mode
+        self._profiles = {}
+        self._wall = {}
+        self._peak = {}
+        self._stack = []
+        self._started = 0.0
+        if self.memory:
+            tracemalloc.start()
+
+    @property
+    def enabled(self) -> bool:
+        return self._mode is not None
+
+    @property
+    def memory(self) -> bool:
+        return self._mode == "memory"
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        self._pause()
+        self._stack.append(name)
+        self._resume()
+        try:
+            yield
+        finally:
+            self._pause()
+            self._stack.pop()
+            self._resume()
+
+    def _pause(self) -> None:
+        if not self._stack:
+            return
+        name = self._stack[-1]
+        self._profiles[name].disable()
+        self._wall[name] = (
+            self._wall.get(name, 0.0) + time.perf_counter() - self._started
+        )
+        if self.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            self._peak[name] = max(self._peak.get(name, 0), peak)
+
+    def _resume(self) -> None:
+        if not self._stack:
+            return
+        name = self._stack[-1]
+        profile = self._profiles.setdefault(name, cProfile.Profile())
+        if self.memory and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        self._started = time.perf_counter()
+        profile.enable()
+
+    def _stats(self) -> Dict[str, pstats.Stats]:
+        out = {}
+        for name, profile in self._profiles.items():
+            try:
+                out[name] = pstats.Stats(profile)
+            except TypeError:
+                # nothing was recorded
+                continue
+        return out
+
+    def save(self, outdir: pathlib.Path) -> Dict[str, pstats.Stats]:
+        outdir.mkdir(parents=True, exist_ok=True)
+        stats = self._stats()
+        lines = []
+        for name, st in stats.items():
+            st.dump_stats(str(outdir / f"{name}.pstats"))
+            lines.extend(collapsed_stacks(st, root=f"phase:{name}"))
+        with open(outdir / "harness.collapsed", "w", encoding="utf8") as f:
+            f.writelines(line + "\n" for line in lines)
+        return stats
+
+    def report(self, outdir: pathlib.Path, top: int = TOP_N) -> None:
+        """Save the profiles and print a summary."""
+        if not self.enabled:
+            return
+        snapshot = None
+        if self.memory:
+            # before saving so the profiler's own allocations stay out of it
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, __file__),
+                    tracemalloc.Filter(False, cProfile.__file__),
+                ]
+            )
+        stats = self.save(outdir)
+        print(f"\nHarness profile ({outdir}):")
+        print("-----------------" + "-" * len(str(outdir)) + "--")
+        for name, wall in self._wall.items():
+            peak = ""
+            if name in self._peak:
+                peak = f", peak {self._peak[name] / 2**20:.1f}MiB"
+            print(f"  {name:<10s}: {wall:.3f}s{peak}")
+
+        combined: Dict[Func, Tuple[int, float, float]] = {}
+        for st in stats.values():
+            raw: Dict[Func, Any] = st.stats  # type: ignore[attr-defined]
+            for func, (_, ncalls, tottime, cumtime, _) in raw.items():
+                prev = combined.get(func, (0, 0.0, 0.0))
+                combined[func] = (
+                    prev[0] + ncalls,
+                    prev[1] + tottime,
+                    prev[2] + cumtime,
+                )
+        print(f"\nTop {top} functions by own time (ncalls, own, cumulative):")
+        ranked = sorted(combined.items(), key=lambda kv: -kv[1][1])[:top]
+        for func, (ncalls, tottime, cumtime) in ranked:
+            print(f"  {ncalls:>8d} {tottime:8.3f}s {cumtime:8.3f}s  {_func_name(func)}")
+
+        if snapshot:
+            print(f"\nTop {top} allocation sites still in use:")
+            for stat in snapshot.statistics("lineno")[:top]:
+                print(f"  {stat.size / 2**10:10.1f}KiB  {stat.traceback}")
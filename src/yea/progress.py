@@ -0,0 +1,181 @@
+"""Live progress of a run.
+
+With ``tty`` a status line on stderr is redrawn about once a second, with
+``line`` a progress line is printed every PERIODIC_INTERVAL seconds::
+
+    [12/40] 10 passed, 2 failed | 0.wandb.03 12s/~30s | ETA 3m20s
+
+Remaining time is estimated from the duration history; tests without any
+history use the mean elapsed time of the tests completed so far. The ETA is
+marked approximate (``~``) while it depends on such made up durations.
+
+Tests write to the same terminal, which garbles a status line, so ``auto``
+always prints periodic lines; ``--progress tty`` asks for the status line.
+"""
+
+import sys
+import threading
+import time
+from typing import IO, Collection, Dict, List, Optional, Set
+
+MODES = ("auto", "tty", "line", "off")
+TTY_INTERVAL = 1.0
+PERIODIC_INTERVAL = 30.0
+# redraws triggered by tests starting or finishing are at most this frequent
+MIN_INTERVAL = 0.2
+
+
+def format_seconds(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m{seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m"
+
+
+class Progress:
+    _running: Dict[str, float]
+    _queued: Set[str]
+
+    def __init__(
+        self,
+        test_ids: List[str],
+        estimates: Optional[Dict[str, float]] = None,
+        mode: str = "auto",
+        stream: Optional[IO[str]] = None,
+        imputed: Optional[Collection[str]] = None,
+    ) -> None:
+        self._stream = stream or sys.stderr
+        if mode == "auto":
+            # whole lines interleave cleanly with the output of the tests
+            mode = "line"
+        self._mode = mode
+        self._interval = TTY_INTERVAL if mode == "tty" else PERIODIC_INTERVAL
+        self._total = len(test_ids)
+        self._queued = set(test_ids)
+        self._estimates = estimates or {}
+        # estimates not from the history of the test itself
+        self._imputed = set(imputed or ())
+        self._running = {}
+        self._passed = 0
+        self._failed = 0
+        self._elapsed_done = 0.0
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_render = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self._mode != "off" and self._total > 0
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        self._thread = threading.Thread(
+            target=self._loop, name="yea-progress", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._mode == "tty":
+            self._write("\r\x1b[K")
+
+    def test_start(self, test_id: str) -> None:
+        with self._lock:
+            self._queued.discard(test_id)
+            self._running[test_id] = time.monotonic()
+        self._maybe_render()
+
+    def test_done(self, test_id: str, ok: bool) -> None:
+        with self._lock:
+            started = self._running.pop(test_id, None)
+            if started is not None:
+                self._elapsed_done += time.monotonic() - started
+            if ok:
+                self._passed += 1
+            else:
+                self._failed += 1
+        self._maybe_render()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self._interval):
+            self._render()
+
+    def _maybe_render(self) -> None:
+        # only live status lines follow every test, periodic lines keep time
+        if self._mode != "tty" or not self._thread:
+            return
+        if time.monotonic() - self._last_render >= MIN_INTERVAL:
+            self._render()
+
+    def eta(self, now: Optional[float] = None) -> Optional[float]:
+        """Return the estimated seconds left, None without anything to go on."""
+        now = now or time.monotonic()
+        with self._lock:
+            done = self._passed + self._failed
+            if done:
+                default = self._elapsed_done / done
+            elif self._estimates:
+                default = sum(self._estimates.values()) / len(self._estimates)
+            else:
+                return None
+            remaining = sum(self._estimates.get(t, default) for t in self._queued)
+            for test_id, started in self._running.items():
+                expected = self._estimates.get(test_id, default)
+                remaining += max(expected - (now - started), 0.0)
+        return remaining
+
+    def approximate(self) -> bool:
+        """Return whether the ETA relies on imputed durations."""
+        with self._lock:
+            left = self._queued.union(self._running)
+        return any(t in self._imputed or t not in self._estimates for t in left)
+
+    def status(self, now: Optional[float] = None) -> str:
+        now = now or time.monotonic()
+        eta = self.eta(now)
+        approx = "~" if self.approximate() else ""
+        with self._lock:
+            done = self._passed + self._failed
+            parts = [f"[{done}/{self._total}] {self._passed} passed"]
+            if self._failed:
+                parts[0] += f", {self._failed} failed"
+            for test_id, started in self._running.items():
+                running = f"{test_id} {format_seconds(now - started)}"
+                if test_id in self._estimates:
+                    running += f"/~{format_seconds(self._estimates[test_id])}"
+                parts.append(running)
+        parts.append(
+            f"ETA {approx}{format_seconds(eta)}" if eta is not None else "ETA ?"
+        )
+        return " | ".join(parts)
+
+    def _render(self) -> None:
+        with self._render_lock:
+            if self._mode == "off":
+                return
+            now = time.monotonic()
+            self._last_render = now
+            line = self.status(now)
+            if self._mode == "tty":
+                self._write(f"\r\x1b[K{line}")
+            else:
+                self._write(f"PROGRESS: {line}\n")
+
+    def _write(self, text: str) -> None:
+        try:
+            self._stream.write(text)
+            self._stream.flush()
+        except (OSError, ValueError):
+            # progress is best effort, never fail the run because of it
+            self._mode = "off"
@@ -1,8 +1,6 @@
 """Registry class."""
 
-import ast
 import configparser
-import json
 import logging
 import os
 import pathlib
@@ -10,8 +8,15 @@ import re
 import sys
 from typing import Dict, List, Optional, Set, Union
 
-from yea import config, context, split, testspec, ytest
-from yea.yeadoc import YeadocSnippet, load_tests_from_docstring
+from yea import config, context, selection, split, testspec, ytest
+from yea.durations import HISTORY_DIRNAME, load_durations
+from yea.yeadoc import (
+    YEADOC_MARKER,
+    YeadocCache,
+    YeadocSnippet,
+    load_docstrings_from_source,
+    load_tests_from_docstring,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +37,7 @@ class Registry:
     _yearc_dict: Dict[pathlib.Path, Optional[configparser.ConfigParser]]
     _yeadoc_dict: Dict[str, "YeadocSnippet"]
     _yeadoc_set: Set[str]
+    _yeadoc_cache: Optional["YeadocCache"]
 
     def __init__(self, yc: "context.YeaContext") -> None:
         self._yc = yc
@@ -40,6 +46,7 @@ class Registry:
         self._yearc_dict = {}
         self._yeadoc_dict = {}
         self._yeadoc_set = set()
+        self._yeadoc_cache = None
 
     def _warn(self, msg: str, path: Optional[pathlib.Path] = None) -> None:
         if path:
@@ -160,6 +167,9 @@ class Registry:
             dirs.remove("wandb")
         if ".tox" in dirs:
             dirs.remove(".tox")
+        # materialized yeadoc snippets stay around between runs
+        if ".yeadoc" in dirs:
+            dirs.remove(".yeadoc")
 
     def _probe_walk(self, path_dir: pathlib.Path) -> None:
         self._probe_dir(path_dir)
@@ -201,45 +211,41 @@ class Registry:
         for path_dir in path_dirs:
             self._probe_walk(path_dir)
 
+    def _scan_yeadoc_file(self, tpath: pathlib.Path) -> List[YeadocSnippet]:
+        cache = self._yeadoc_cache
+        st = tpath.stat()
+        if cache:
+            cached = cache.get(tpath, st)
+            if cached is not None:
+                return cached
+
+        with open(tpath, "rb") as f:
+            data = f.read()
+
+        snippets: List[YeadocSnippet] = []
+        cacheable = True
+        # only pay for parsing files that could contain snippets
+        if YEADOC_MARKER in data:
+            for docstr in load_docstrings_from_source(data.decode("utf8")):
+                try:
+                    snippets.extend(load_tests_from_docstring(docstr))
+                except RuntimeError as e:
+                    self._warn(f"Unable to parse yeadoc docstr: {e}", path=tpath)
+                    # keep warning about this file until it is fixed
+                    cacheable = False
+
+        if cache and cacheable:
+            cache.set(tpath, st, snippets)
+        return snippets
+
     def _probe_yeadoc_dir(self, path_dir: pathlib.Path) -> None:
         # pick up yea tests from docstrings
         id_test_map: Dict[str, YeadocSnippet] = {}
 
         # build up the list of tests that can be run by parsing docstrings
         for tpath in path_dir.glob("*.py"):
-            # parse the test file using ast
-            with open(tpath, encoding="utf8") as f:
-                mod = ast.parse(f.read())
-
-            doc_strings = []
-
-            function_definitions = [
-                node for node in mod.body if isinstance(node, ast.FunctionDef)
-            ]
-            for func in function_definitions:
-                docstr = ast.get_docstring(func) or ""
-                doc_strings.append(docstr)
-
-            classes = [node for node in mod.body if isinstance(node, ast.ClassDef)]
-            for class_ in classes:
-                methods = [
-                    node for node in class_.body if isinstance(node, ast.FunctionDef)
-                ]
-                for func in methods:
-                    docstr = ast.get_docstring(func) or ""
-                    doc_strings.append(docstr)
-                class_docstr = ast.get_docstring(class_) or ""
-                if class_docstr is not None:
-                    doc_strings.append(class_docstr)
-
-            for docstr in doc_strings:
-                try:
-                    snippets = load_tests_from_docstring(docstr)
-                except RuntimeError as e:
-                    self._warn(f"Unable to parse yeadoc docstr: {e}", path=tpath)
-                    continue
-                for s in snippets:
-                    id_test_map[s.id] = s
+            for s in self._scan_yeadoc_file(tpath):
+                id_test_map[s.id] = s
 
         self._yeadoc_dict.update(id_test_map)
 
@@ -254,10 +260,12 @@ class Registry:
                 self._probe_yeadoc_dir(path_dir)
 
     def _probe_yeadoc(self) -> None:
+        self._yeadoc_cache = YeadocCache(self._yc._cachedir / "yeadoc-cache.json")
         for yddir in self._cfg.yeadoc_dirs:
             assert self._cfg.test_root
             path_dir = pathlib.Path(self._cfg.test_root, yddir)
             self._probe_yeadoc_walk(path_dir)
+        self._yeadoc_cache.save()
 
     def _probe_yeadoc_check(self) -> None:
         """Validate that all found yeadoc descriptions have tests."""
@@ -279,39 +287,95 @@ class Registry:
         if self._yc._args.yeadoc and all_tests:
             self._probe_yeadoc_check()
 
+    def _report_imputed(self, imputed: Dict[str, str]) -> None:
+        if not imputed:
+            return
+        counts: Dict[str, int] = {}
+        for test_id, source in sorted(imputed.items()):
+            logger.info(f"imputed duration of {test_id} from {source}")
+            counts[source] = counts.get(source, 0) + 1
+        by_source = ", ".join(f"{k}: {v}" for k, v in sorted(counts.items()))
+        print(f"INFO: imputed durations for {len(imputed)} tests ({by_source})")
+
     def filter_splits(self, tlist: List["ytest.YeaTest"]) -> List["ytest.YeaTest"]:
         splits = self._yc._args.splits
         group = self._yc._args.group
         durations_path = self._cfg.durations_path
         if not splits or not group or not durations_path:
             return tlist
+        if self._yc._args.queue_dir:
+            self._warn("Ignoring --splits/--group when using --queue-dir")
+            return tlist
 
-        with open(durations_path) as f:
-            durations = json.load(f)
+        durations = load_durations(
+            durations_path,
+            self._yc._cachedir / HISTORY_DIRNAME,
+            estimator=self._yc._args.duration_estimator,
+        )
 
-        tlist.sort(key=alphanum_sort)
-        groups = split.least_duration(splits=splits, items=tlist, durations=durations)
+        strategy = self._yc._args.split_strategy
+        if strategy == "duration" and not durations:
+            # without any durations a hash split at least stays stable
+            print("INFO: no test durations found, splitting by test id hash")
+            strategy = "hash"
 
-        my_tests = groups[group - 1].selected
+        tlist.sort(key=alphanum_sort)
+        durations, imputed = split.impute_durations(tlist, durations)
+        if strategy == "duration":
+            self._report_imputed(imputed)
+        my_group, loads = split.select_group(
+            splits=splits,
+            group=group - 1,
+            items=tlist,
+            durations=durations,
+            refine_steps=self._yc._args.split_budget,
+            strategy=strategy,
+        )
+
+        my_tests = my_group.selected
+        group_durations = ", ".join(f"{load:.1f}" for load in loads)
+        msg = (
+            f"split {group}/{splits} ({strategy}): {len(my_tests)} tests, "
+            f"predicted {my_group.duration:.1f}s "
+            f"(groups: {group_durations}; "
+            f"imbalance: {split.load_imbalance(loads):.1%})"
+        )
+        logger.info(msg)
+        print(f"INFO: {msg}")
         return my_tests
 
     def get_tests(self, include_skip: bool = False) -> List["ytest.YeaTest"]:
+        select_expr = self._yc._args.select
+        matcher = selection.compile_expression(select_expr) if select_expr else None
+        index = selection.TestIndex(yc=self._yc) if matcher else None
+
+        self._yc.emit("discovered", files=len(self._registry))
         tlist: List[ytest.YeaTest] = []
         for tname in self._registry:
             tname = tname.resolve()
-            t = ytest.YeaTest(tname=tname, yc=self._yc)
-            if t.skip and not self._yc._args.noskip:
+            selected = None
+            try:
+                if matcher and index:
+                    # use the cached index so unselected specs are never loaded
+                    selected = index.select(tname, matcher)
+                    if not selected:
+                        continue
+                t = ytest.YeaTest(tname=tname, yc=self._yc)
+                if t.skip and not self._yc._args.noskip:
+                    continue
+                # slight hack to add info on a test so it doesnt have to be re-probed
+                # permutations share it with their base test
+                t._add_yearc_list(self._probe_yearc(tname))
+                t._add_registry(self)
+                tlist.extend(t.iter_permutations(indexes=selected))
+            except ValueError as e:
+                self._warn(f"Ignoring test: {e}", path=tname)
                 continue
-            test_perms = t.get_permutations()
-
-            # slight hack to add info on a test so it doesnt have to be re-probed
-            yearc_list = self._probe_yearc(tname)
-            for test in test_perms:
-                test._add_yearc_list(yearc_list)
-                test._add_registry(self)
 
-            tlist.extend(test_perms)
+        if index:
+            index.save()
 
         tlist = self.filter_splits(tlist)
         tlist.sort(key=alphanum_sort)
+        self._yc.emit("selected", tests=[t.test_id for t in tlist])
         return tlist
@@ -0,0 +1,282 @@
+"""Results database of all yea runs.
+
+Every run records its metadata and, per test, the outcome, phase timings,
+resource usage and ``:yea:profile`` metrics to ``results.db`` (SQLite) in
+the yea cache, in a single transaction. ``yea history`` queries it::
+
+    yea history slowest            # slowest tests by median elapsed time
+    yea history flaky              # tests that both passed and failed
+    yea history trend 0.wandb.01   # elapsed time of the most recent runs
+"""
+
+import json
+import logging
+import os
+import pathlib
+import socket
+import sqlite3
+import statistics
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from yea import perf
+
+logger = logging.getLogger(__name__)
+
+DB_FNAME = "results.db"
+SCHEMA_VERSION = 1
+# writers of other yea processes hold the lock for one short transaction
+LOCK_TIMEOUT = 30.0
+DEFAULT_RUNS = 20
+DEFAULT_LIMIT = 20
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    host TEXT,
+    pid INTEGER,
+    platform TEXT,
+    argv TEXT,
+    wall REAL,
+    tests INTEGER,
+    failed INTEGER
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    test_id TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    elapsed REAL,
+    cpu REAL,
+    maxrss INTEGER,
+    failures TEXT,
+    PRIMARY KEY (run_id, test_id)
+);
+CREATE INDEX IF NOT EXISTS results_test ON results (test_id, run_id);
+CREATE TABLE IF NOT EXISTS phases (
+    run_id INTEGER NOT NULL,
+    test_id TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    elapsed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS phases_test ON phases (test_id, run_id);
+CREATE TABLE IF NOT EXISTS profiles (
+    run_id INTEGER NOT NULL,
+    test_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    stat TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS profiles_test ON profiles (test_id, metric, stat);
+"""
+
+
+class RunInfo(NamedTuple):
+    ts: float
+    platform: str
+    argv: List[str]
+    wall: float
+
+
+class TestRecord(NamedTuple):
+    test_id: str
+    ok: bool
+    elapsed: float
+    failures: List[str]
+    phases: Dict[str, float]
+    profile: Dict[str, Any]
+    cpu: Optional[float] = None
+    # bytes
+    maxrss: Optional[int] = None
+
+
+class ResultsDB:
+    def __init__(self, path: pathlib.Path) -> None:
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(str(self._path), timeout=LOCK_TIMEOUT)
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                conn.executescript(SCHEMA)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def record_run(self, info: RunInfo, records: List[TestRecord]) -> int:
+        """Insert a run and the results of its tests, return the run id."""
+        failed = sum(1 for r in records if not r.ok)
+        with self.conn as conn:
+            cur = conn.execute(
+                "INSERT INTO runs (ts, host, pid, platform, argv, wall, tests, failed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    info.ts,
+                    socket.gethostname(),
+                    os.getpid(),
+                    info.platform,
+                    json.dumps(info.argv),
+                    info.wall,
+                    len(records),
+                    failed,
+                ),
+            )
+            run_id = int(cur.lastrowid or 0)
+            conn.executemany(
+                "INSERT OR REPLACE INTO results"
+                " (run_id, test_id, ok, elapsed, cpu, maxrss, failures)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        r.test_id,
+                        int(r.ok),
+                        r.elapsed,
+                        r.cpu,
+                        r.maxrss,
+                        json.dumps(r.failures) if r.failures else None,
+                    )
+                    for r in records
+                ],
+            )
+            conn.executemany(
+                "INSERT INTO phases (run_id, test_id, phase, elapsed)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (run_id, r.test_id, phase, elapsed)
+                    for r in records
+                    for phase, elapsed in r.phases.items()
+                ],
+            )
+            conn.executemany(
+                "INSERT INTO profiles (run_id, test_id, metric, stat, value)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (run_id, r.test_id, metric, stat, value)
+                    for r in records
+                    for metric, stat, value in perf.profile_values(r.profile)
+                ],
+            )
+        return run_id
+
+    def _recent_runs(self, runs: int) -> int:
+        """Return the lowest id of the most recent runs."""
+        row = self.conn.execute(
+            "SELECT id FROM runs ORDER BY id DESC LIMIT 1 OFFSET ?", (runs - 1,)
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    def slowest(
+        self,
+        runs: int = DEFAULT_RUNS,
+        limit: int = DEFAULT_LIMIT,
+        prefixes: Optional[List[str]] = None,
+    ) -> List[Tuple[str, int, float, float]]:
+        """Return test id, samples, median and max elapsed of the slowest tests."""
+        rows = self.conn.execute(
+            "SELECT test_id, elapsed FROM results WHERE run_id >= ? AND ok",
+            (self._recent_runs(runs),),
+        ).fetchall()
+        by_test: Dict[str, List[float]] = {}
+        for test_id, elapsed in _matching(rows, prefixes):
+            by_test.setdefault(test_id, []).append(elapsed)
+        stats = [
+            (test_id, len(v), statistics.median(v), max(v))
+            for test_id, v in by_test.items()
+        ]
+        stats.sort(key=lambda s: (-s[2], s[0]))
+        return stats[:limit]
+
+    def flaky(
+        self,
+        runs: int = DEFAULT_RUNS,
+        limit: int = DEFAULT_LIMIT,
+        prefixes: Optional[List[str]] = None,
+    ) -> List[Tuple[str, int, int, int]]:
+        """Return test id, samples, failures and outcome flips of flaky tests."""
+        rows = self.conn.execute(
+            "SELECT test_id, ok FROM results"
+            " WHERE run_id >= ?"
+            " ORDER BY test_id, run_id",
+            (self._recent_runs(runs),),
+        ).fetchall()
+        by_test: Dict[str, List[int]] = {}
+        for test_id, ok in _matching(rows, prefixes):
+            by_test.setdefault(test_id, []).append(ok)
+        stats = []
+        for test_id, oks in by_test.items():
+            fails = oks.count(0)
+            if not fails or fails == len(oks):
+                continue
+            flips = sum(1 for a, b in zip(oks, oks[1:]) if a != b)
+            stats.append((test_id, len(oks), fails, flips))
+        stats.sort(key=lambda s: (-s[3], -s[2], s[0]))
+        return stats[:limit]
+
+    def trend(
+        self,
+        runs: int = DEFAULT_RUNS,
+        limit: int = DEFAULT_LIMIT,
+        prefixes: Optional[List[str]] = None,
+        metric: str = "elapsed",
+    ) -> List[Tuple[str, List[float]]]:
+        """Return test ids with their metric values, oldest run first.
+
+        metric is elapsed, cpu, maxrss, phase::<name> or a profile
+        ``<metric>::<stat>``.
+        """
+        args: Tuple[Any, ...]
+        if metric in ("elapsed", "cpu", "maxrss"):
+            query = (
+                f"SELECT test_id, {metric} FROM results"
+                f" WHERE run_id >= ? AND {metric} IS NOT NULL"
+            )
+            args = ()
+        elif metric.startswith("phase::"):
+            query = (
+                "SELECT test_id, elapsed FROM phases WHERE run_id >= ? AND phase = ?"
+            )
+            args = (metric[len("phase::") :],)
+        else:
+            name, _, stat = metric.rpartition("::")
+            query = (
+                "SELECT test_id, value FROM profiles"
+                " WHERE run_id >= ? AND metric = ? AND stat = ?"
+            )
+            args = (name, stat)
+        rows = self.conn.execute(
+            query + " ORDER BY test_id, run_id",
+            (self._recent_runs(runs),) + args,
+        ).fetchall()
+        by_test: Dict[str, List[float]] = {}
+        for test_id, value in _matching(rows, prefixes):
+            by_test.setdefault(test_id, []).append(value)
+        return sorted(by_test.items())[:limit]
+
+
+def _matching(rows: List[Any], prefixes: Optional[List[str]]) -> List[Any]:
+    """Return the rows whose first column starts with one of prefixes."""
+    if not prefixes:
+        return rows
+    return [r for r in rows if any(r[0].startswith(p) for p in prefixes)]
+
+
+def sparkline(values: List[float]) -> str:
+    if sys.platform.startswith("win"):
+        chars = "_.-~^"
+    else:
+        chars = SPARK_CHARS
+    lo, hi = min(values), max(values)
+    span = hi - lo
+    if not span:
+        return chars[0] * len(values)
+    return "".join(chars[int((v - lo) / span * (len(chars) - 1))] for v in values)
@@ -1,19 +1,46 @@
 """test runner."""
 
+import hashlib
 import json
 import logging
 import os
 import pathlib
 import re
 import shutil
+import sqlite3
 import sys
-from typing import Any, Generator, List, Optional, Union
-
-from yea import context, util, ytest
+import tempfile
+import time
+from typing import Any, Dict, Generator, Iterator, List, Optional, Tuple, Union
+
+from yea import (
+    benchmark,
+    context,
+    durations,
+    perf,
+    progress,
+    resultsdb,
+    split,
+    timing,
+    util,
+    workqueue,
+    ytest,
+)
 
 logger = logging.getLogger(__name__)
 junit_xml = util.vendor_import("wandb_junit_xml")
 
+# materialized yeadoc snippets not used for this long are removed
+YEADOC_GC_AGE = 7 * 24 * 60 * 60
+# per run working copies of snippets, next to the shared entries
+YEADOC_RUN_PREFIX = "run-"
+
+
+def _remove_readonly(func: Any, path: str, _: Any) -> None:
+    # read-only files can not be removed on windows
+    os.chmod(path, 0o755)
+    func(path)
+
 
 def convert(text: str) -> Union[int, str]:
     return int(text) if text.isdigit() else text.lower()
@@ -30,24 +57,51 @@ class TestRunner:
         if self._cfg.test_root is None:
             raise TypeError("test_root is not set")
         self._tmpdir = pathlib.Path(self._cfg.test_root, ".yeadoc")
+        self._yeadoc_run_dir: Optional[pathlib.Path] = None
         self.prepare()
         self._args = yc._args
         self._test_files: List[str] = []
         # self._results: List[junit_xml.TestCase] = []
         self._results: List = []
         self._test_list: List[ytest.YeaTest] = []
+        self._queue: Optional[workqueue.WorkQueue] = None
+        # results are streamed to the results file as tests finish
+        self._junit: Optional[Any] = None
+        self._perf: Optional[perf.PerfHistory] = None
+        # rows for the results database, written once at the end of the run
+        self._records: List[resultsdb.TestRecord] = []
+        self._started = time.time()
+        self._progress: Optional[progress.Progress] = None
+        if self._args.queue_dir:
+            self._queue = workqueue.WorkQueue(pathlib.Path(self._args.queue_dir))
 
     def prepare(self) -> None:
         if self._yc._cfg._coverage_run_in_process:
             os.environ["YEA_RUN_COVERAGE"] = str(self._yc._cfg._coverage_run_in_process)
-        if self._tmpdir.exists():
-            shutil.rmtree(self._tmpdir)
-        self._tmpdir.mkdir()
+        self._tmpdir.mkdir(exist_ok=True)
+        self._yeadoc_gc()
 
     def clean(self) -> None:
         os.environ.pop("YEA_RUN_COVERAGE", None)
-        if self._tmpdir.exists():
-            shutil.rmtree(self._tmpdir)
+        if self._yeadoc_run_dir:
+            shutil.rmtree(self._yeadoc_run_dir, ignore_errors=True)
+            self._yeadoc_run_dir = None
+
+    def _yeadoc_gc(self) -> None:
+        # snippet dirs are shared with other yea processes, only reap old ones
+        expire = time.time() - YEADOC_GC_AGE
+        for p in self._tmpdir.iterdir():
+            try:
+                if p.stat().st_mtime >= expire:
+                    continue
+                if p.is_dir():
+                    # shared entries are read-only
+                    p.chmod(0o755)
+                    shutil.rmtree(p, onerror=_remove_readonly)
+                else:
+                    p.unlink()
+            except OSError as e:
+                logger.info(f"Unable to remove yeadoc entry {p}: {e}")
 
     def _get_args_list(self) -> Optional[List[str]]:
         # TODO: clean up args parsing
@@ -80,12 +134,69 @@ class TestRunner:
                     path_dir = pathlib.Path(self._cfg.test_root, root, d)
                     yield path_dir
 
+    def _iter_tests(self) -> Iterator["ytest.YeaTest"]:
+        if not self._queue:
+            yield from self._test_list
+            return
+        # other workers pull from the same queue, run whatever is next
+        by_id = {t.test_id: t for t in self._test_list}
+        for test_id in self._queue.claims():
+            yield by_id[test_id]
+
     def _runall(self) -> None:
-        for t in self._test_list:
-            self._yc.monitors_reset()
+        for t in self._iter_tests():
+            if self._progress and t.test_id:
+                self._progress.test_start(t.test_id)
+            bench = benchmark.config_for(t._test_cfg)
+            if bench and not self._args.dryrun:
+                self._run_benchmark(t, bench)
+            else:
+                self._run_test(t)
+                self._capture_result(t)
+            self._yc._timer.update(t._phases)
+
+    def _run_test(
+        self, t: "ytest.YeaTest", depend: bool = True, cpus: Optional[List[int]] = None
+    ) -> None:
+        with t._phases.phase("monitors"):
+            self._yc.monitors_reset(t)
             self._yc.monitors_start_test(t)
-            t.run()
-            self._capture_result(t)
+        t.run(depend=depend, cpus=cpus)
+
+    def _run_benchmark(
+        self, t: "ytest.YeaTest", bench: benchmark.BenchmarkConfig
+    ) -> None:
+        cpus = bench.pin_cpus()
+        for num in range(bench.warmup):
+            print(f"INFO: BENCHMARK warmup {num + 1}/{bench.warmup}")
+            self._run_test(t, depend=not num, cpus=cpus)
+
+        usages: List[benchmark.Usage] = []
+        profiles = []
+        failures: List[str] = []
+        while not bench.done(usages):
+            print(f"INFO: BENCHMARK run {len(usages) + 1}")
+            self._run_test(t, depend=not (usages or bench.warmup), cpus=cpus)
+            if t._usage is None:
+                raise RuntimeError("Test not run")
+            usages.append(t._usage)
+            run_failures, state = self._check(t)
+            # every distinct failure of any repetition fails the benchmark
+            failures.extend(f for f in run_failures if f not in failures)
+            if state.get(":yea:profile"):
+                profiles.append(state[":yea:profile"])
+
+        usage = benchmark.aggregate_usage(usages)
+        profile = benchmark.aggregate_profiles(profiles)
+        props = benchmark.properties(usage, profile, runs=len(usages))
+        self._record_result(
+            t,
+            failures,
+            benchmark.median_profile(profile),
+            elapsed=usage["wall"]["median"],
+            properties=props,
+            usage=benchmark.median_usage(usages),
+        )
 
     def _check_dict(
         self,
@@ -105,11 +216,11 @@ class TestRunner:
             if v != act:
                 result.append(f"BAD_{s}({k}:{v}!={act})")
 
-    def _capture_result(self, t: "ytest.YeaTest") -> None:
-        test_cfg = t._test_cfg
-        if not test_cfg:
-            return
-        result_list = self._yc.test_check(t)
+    def _check(self, t: "ytest.YeaTest") -> Tuple[List[str], Dict[str, Any]]:
+        """Return failures and state reported by the plugins for a test run."""
+        self._yc.emit("check_start", test_id=t.test_id)
+        with t._phases.phase("check"):
+            result_list = self._yc.test_check(t)
 
         failures = []
         state = {}
@@ -118,14 +229,36 @@ class TestRunner:
                 failures.extend(result.failures)
             if result._state:
                 state.update(result._state)
+        self._yc.emit("check_end", test_id=t.test_id, failures=failures)
+        return failures, state
 
-        # print("GOTRES", result)
-        result_str = ",".join(failures)
-        profile_dict = state.get(":yea:profile")
+    def _capture_result(self, t: "ytest.YeaTest") -> None:
+        test_cfg = t._test_cfg
+        if not test_cfg:
+            return
+        failures, state = self._check(t)
         # self._results[t._tname] = result_str
         if t._time_end is None or t._time_start is None:
             raise RuntimeError("Test not run")
         elapsed = t._time_end - t._time_start
+        self._record_result(t, failures, state.get(":yea:profile"), elapsed)
+
+    def _record_result(
+        self,
+        t: "ytest.YeaTest",
+        failures: List[str],
+        profile_dict: Optional[Dict[str, Any]],
+        elapsed: float,
+        properties: Optional[List[Dict[str, str]]] = None,
+        usage: Optional[benchmark.Usage] = None,
+    ) -> None:
+        # print("GOTRES", result)
+        failures = list(failures)
+        usage = usage or t._usage
+        if profile_dict and t.test_id:
+            failures.extend(self._perf_check(t, profile_dict))
+            self._perf_history().record(t.test_id, profile_dict, ok=not failures)
+        result_str = ",".join(failures)
         tc = junit_xml.TestCase(t.test_id, classname="yea_func", elapsed_sec=elapsed)
         if result_str:
             tc.add_failure_info(message=result_str)
@@ -133,38 +266,229 @@ class TestRunner:
             for metric, stats in profile_dict.items():
                 for stat, value in stats.items():
                     tc.add_property(name=f"{metric}::{stat}", value=value)
+        for phase, phase_elapsed in t._phases.phases.items():
+            name = f"{timing.PROPERTY_PREFIX}{phase}"
+            tc.add_property(name=name, value=f"{phase_elapsed:.3f}")
+        for name, hook_elapsed in t._plugin_times.phases.items():
+            tc.add_property(name=f"yea::{name}", value=f"{hook_elapsed:.3f}")
+        for prop in properties or []:
+            tc.add_property(name=prop["name"], value=prop["value"])
         self._results.append(tc)
+        if self._junit:
+            self._junit.add(tc)
+        if self._progress and t.test_id:
+            self._progress.test_done(t.test_id, ok=not failures)
+        if t.test_id:
+            self._records.append(
+                resultsdb.TestRecord(
+                    test_id=t.test_id,
+                    ok=not failures,
+                    elapsed=elapsed,
+                    failures=failures,
+                    phases={**t._phases.phases, **t._plugin_times.phases},
+                    profile=profile_dict or {},
+                    cpu=usage.cpu if usage else None,
+                    maxrss=benchmark.maxrss_bytes(usage.maxrss)
+                    if usage and usage.maxrss is not None
+                    else None,
+                )
+            )
+        self._yc.emit(
+            "result",
+            test_id=t.test_id,
+            status="failed" if result_str else "passed",
+            elapsed=elapsed,
+        )
+
+    def _perf_history(self) -> perf.PerfHistory:
+        if self._perf is None:
+            path = self._yc._cachedir / perf.HISTORY_DIRNAME
+            self._perf = perf.PerfHistory(path).load()
+        return self._perf
+
+    def _perf_check(self, t: "ytest.YeaTest", profile: Dict[str, Any]) -> List[str]:
+        """Return failures for profile metrics regressed beyond the spec."""
+        spec = t._test_cfg.get("perf")
+        if spec is None or not t.test_id:
+            return []
+        config = perf.PerfConfig.from_spec(spec)
+        failures = []
+        checked = self._perf_history().check(t.test_id, profile, config)
+        for (_, metric, stat), cmp in checked.items():
+            if cmp.regressed:
+                failures.append(
+                    f"PERF_{metric}::{stat}({cmp.value:.4g}:"
+                    f"{cmp.change:+.1%}>{cmp.threshold:.0%},p={cmp.p_value:.3f})"
+                )
+        return failures
 
     def run(self, tests: List["ytest.YeaTest"]) -> None:
         self._test_list = tests
+        self._started = time.time()
+        self._yc.emit("run_start", time=time.time(), pid=os.getpid(), tests=len(tests))
         try:
             # inform so we only start monitors needed
             self._yc.monitors_inform(tests)
             self._yc.monitors_init()
             self._yc.monitors_start()
-            self._runall()
-            self.finish()
+            if self._queue:
+                self._queue_register()
+            self._open_results()
+            self._start_progress()
+            with self._yc._profiler.phase("run"):
+                self._runall()
+            if self._progress:
+                self._progress.stop()
+            with self._yc._profiler.phase("finish"):
+                self.finish()
         finally:
+            if self._progress:
+                self._progress.stop()
+            if self._junit:
+                self._junit.close()
             self._yc.monitors_stop()
 
-    def _save_results(self) -> None:
+    def _junit_writer(self, p: pathlib.Path) -> Any:
+        # create testfile dir if it doesnt exist
+        testdir = p.parent  # get the directory portion of path
+        testdir.mkdir(parents=True, exist_ok=True)
+        return junit_xml.IncrementalReportWriter(p, "yea-func", encoding="utf-8")
+
+    def _write_junit(self, p: pathlib.Path, results: List) -> None:
+        writer = self._junit_writer(p)
+        try:
+            for tc in results:
+                writer.add(tc)
+        finally:
+            writer.close()
+
+    def _results_path(self) -> Optional[pathlib.Path]:
         res_fname = self._yc._cfg._results_file
         if not res_fname:
-            return
+            return None
         if self._yc._cfg._cfroot is None:
             raise RuntimeError("No cfroot set")
-        p = self._yc._cfg._cfroot.joinpath(res_fname)
-        ts = junit_xml.TestSuite("yea-func", self._results)
-        # create testfile dir if it doesnt exist
-        testdir = p.parent  # get the directory portion of path
-        testdir.mkdir(parents=True, exist_ok=True)
-        with open(p, "w") as f:
-            junit_xml.to_xml_report_file(f, [ts], prettyprint=False, encoding="utf-8")
+        return self._yc._cfg._cfroot.joinpath(res_fname)
+
+    def _open_results(self) -> None:
+        p = self._results_path()
+        if p:
+            self._junit = self._junit_writer(p)
+
+    def _save_results(self) -> None:
+        if self._junit:
+            # everything was written as tests finished
+            self._junit.close()
+            return
+        p = self._results_path()
+        if p:
+            self._write_junit(p, self._results)
+
+    def _estimated_durations(self) -> Tuple[Dict[str, float], Dict[str, str]]:
+        """Return duration estimates of all tests to run and the imputed ones."""
+        durations_path = self._cfg.durations_path
+        timing_dict = durations.load_durations(
+            durations_path,
+            self._yc._cachedir / durations.HISTORY_DIRNAME,
+            estimator=self._args.duration_estimator,
+        )
+        return split.impute_durations(self._test_list, timing_dict)
+
+    def _start_progress(self) -> None:
+        mode = self._args.progress
+        if mode == "off":
+            return
+        test_ids = [t.test_id for t in self._test_list if t.test_id]
+        history = self._yc._cachedir / durations.HISTORY_DIRNAME
+        estimates: Dict[str, float] = {}
+        imputed: Dict[str, str] = {}
+        # without any history imputed durations are made up, better show no ETA
+        if history.is_dir() or (
+            self._cfg.durations_path and self._cfg.durations_path.exists()
+        ):
+            estimates, imputed = self._estimated_durations()
+        self._progress = progress.Progress(
+            test_ids, estimates, mode=mode, imputed=imputed
+        )
+        self._progress.start()
+
+    def _queue_register(self) -> None:
+        assert self._queue
+        timing_dict, _ = self._estimated_durations()
+        test_ids = [t.test_id for t in self._test_list if t.test_id]
+        self._queue.register(test_ids, timing_dict)
+
+    def _queue_finish(self) -> None:
+        if not self._queue:
+            return
+        results: List[Dict[str, Any]] = [
+            dict(
+                name=tc.name,
+                elapsed=tc.elapsed_sec,
+                failures=tc.failures,
+                properties=tc.properties,
+            )
+            for tc in self._results
+        ]
+        if not self._queue.finish(results):
+            return
+        # last worker out merges everyones results
+        merged = []
+        for r in self._queue.load_results():
+            tc = junit_xml.TestCase(
+                r["name"], classname="yea_func", elapsed_sec=r["elapsed"]
+            )
+            tc.failures = r["failures"]
+            tc.properties = r["properties"]
+            merged.append(tc)
+        p = self._queue.path / "junit-yea.xml"
+        self._write_junit(p, merged)
+        print(f"INFO: merged results of {len(merged)} tests into {p}")
+
+    def _save_durations(self, durations_path: pathlib.Path) -> None:
+        history_path = self._yc._cachedir / durations.HISTORY_DIRNAME
+        history = durations.DurationHistory(history_path).load()
+        history.append(
+            [(tc.name, tc.elapsed_sec, not tc.failures) for tc in self._results]
+        )
+        history.compact()
+        # keep .yea_durations as the merged, estimated view of the history
+        timing_dict = durations.load_durations(
+            durations_path, history_path, estimator=self._args.duration_estimator
+        )
+        with open(durations_path, "w") as f:
+            json.dump(timing_dict, f, indent=0, sort_keys=True)
+
+    def _save_history(self) -> None:
+        if not self._records:
+            return
+        timer = self._yc._timer
+        info = resultsdb.RunInfo(
+            ts=self._started,
+            platform=self._yc._platform,
+            argv=sys.argv,
+            wall=time.monotonic() - timer.created,
+        )
+        db = resultsdb.ResultsDB(self._yc._cachedir / resultsdb.DB_FNAME)
+        try:
+            db.record_run(info, self._records)
+        except sqlite3.Error as e:
+            # the run itself is fine, only its history is lost
+            print(f"WARNING: unable to record results in {resultsdb.DB_FNAME}: {e}")
+        finally:
+            db.close()
 
     def finish(self) -> None:
         self.clean()
-        self._save_results()
+        with self._yc._timer.phase("results"):
+            self._save_results()
+            self._queue_finish()
+            if self._perf:
+                self._perf.save()
+            self._save_history()
         exit_code = 0
+        failed = sum(1 for tc in self._results if tc.failures)
+        self._yc.emit("run_end", tests=len(self._results), failed=failed)
         print("\nResults:")
         print("--------")
         if not self._results:
@@ -193,35 +517,86 @@ class TestRunner:
         for tc in timing_info:
             print(f"  {tc[1]:<{tlen}s}: {tc[0]:.1f}")
 
+        timer = self._yc._timer
+        print("\nPhase durations (sec):")
+        print("----------------------")
+        for line in timing.format_table(timer, time.monotonic() - timer.created):
+            print(line)
+
+        hook_lines = self._yc._plugs.hook_report()
+        if hook_lines:
+            print("\nPlugin hooks (sec):")
+            print("-------------------")
+            for line in hook_lines:
+                print(line)
+
         # if we are recalibrating split tests. save them here
         durations_path = self._cfg.durations_path
         store_durations = self._yc._args.store_durations
         if durations_path and store_durations:
-            timing_dict = {tc.name: tc.elapsed_sec for tc in self._results}
-            with open(durations_path, "w") as f:
-                json.dump(timing_dict, f)
+            self._save_durations(durations_path)
 
         sys.exit(exit_code)
 
     def get_tests(self) -> List["ytest.YeaTest"]:
         return self._test_list
 
+    def _yeadoc_materialize(self, tpath: pathlib.Path, code: str) -> pathlib.Path:
+        """Write spec and snippet to a read-only directory named by their hash."""
+        spec = tpath.read_bytes()
+        h = hashlib.sha256()
+        for part in (tpath.name.encode("utf8"), spec, code.encode("utf8")):
+            h.update(len(part).to_bytes(8, "little"))
+            h.update(part)
+        entry = self._tmpdir / h.hexdigest()[:20]
+
+        if not entry.exists():
+            tmp = pathlib.Path(tempfile.mkdtemp(prefix=".tmp-", dir=self._tmpdir))
+            tmp.joinpath(tpath.name).write_bytes(spec)
+            tmp.joinpath(tpath.stem + ".py").write_text(code)
+            for p in tmp.iterdir():
+                p.chmod(0o444)
+            tmp.chmod(0o555)
+            try:
+                os.rename(tmp, entry)
+            except OSError:
+                # another yea process won the race
+                tmp.chmod(0o755)
+                shutil.rmtree(tmp, onerror=_remove_readonly)
+                if not entry.exists():
+                    raise
+        else:
+            # mark as recently used so it is not garbage collected
+            os.utime(entry)
+        return entry / (tpath.stem + ".py")
+
+    def _yeadoc_workdir(self, py_fname: pathlib.Path) -> pathlib.Path:
+        """Copy a shared entry to this run's working dir, the test writes there."""
+        if self._yeadoc_run_dir is None:
+            prefix = f"{YEADOC_RUN_PREFIX}{os.getpid()}-"
+            self._yeadoc_run_dir = pathlib.Path(
+                tempfile.mkdtemp(prefix=prefix, dir=self._tmpdir)
+            )
+        work = self._yeadoc_run_dir / py_fname.parent.name
+        if not work.exists():
+            work.mkdir()
+            for p in py_fname.parent.iterdir():
+                shutil.copyfile(p, work / p.name)
+        return work / py_fname.name
+
     def yeadoc_prepare(self, tests: List["ytest.YeaTest"]) -> None:
-        """If we have yeadoc tests, copy snippets to actual files."""
+        """If we have yeadoc tests, materialize snippets to actual files."""
         for tst in tests:
             if not tst.is_yeadoc:
                 continue
             tpath = tst._tname
 
-            # write test and spec to tempfiles
-            shutil.copy(tpath, self._tmpdir)
-            t_fname = self._tmpdir / tpath.name
-            py_fname = str(t_fname)[:-4] + ".py"
-
             assert tst._registry
             snippet = tst._registry._yeadoc_dict[tst.yeadoc_id]
 
-            with open(py_fname, "w") as f:
-                f.write(snippet.code)
-
-            tst._change_yeadoc_path(pathlib.Path(py_fname))
+            py_fname = self._yeadoc_workdir(
+                self._yeadoc_materialize(tpath, snippet.code)
+            )
+            # keep naming the test as if it was written directly to the tmpdir
+            id_path = self._tmpdir / py_fname.name
+            tst._change_yeadoc_path(py_fname, id_path=id_path)
@@ -0,0 +1,43 @@
+"""Test process side of yea.
+
+Tests import this module (through ``import yea``) in every test process, so
+it only imports the standard library modules it needs right away. The
+trigger client, and with it ``http.client``, is loaded on the first trigger.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from ._setup import _setup_profile, _setup_trigger, get_params, get_plugin_vars, setup
+
+__all__ = [
+    "flush",
+    "get_params",
+    "get_plugin_vars",
+    "get_profile",
+    "get_triggers",
+    "setup",
+    "trigger",
+]
+
+
+def get_profile() -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Return the profile file and vars of this test, None if not profiled."""
+    return _setup_profile()
+
+
+def get_triggers() -> List[str]:
+    """Return the names of the triggers this test is expected to fire."""
+    return _setup_trigger() or []
+
+
+def trigger(name: str, wait: bool = True) -> None:
+    from . import _trigger
+
+    _trigger.trigger(name, wait=wait)
+
+
+def flush() -> None:
+    """Wait until triggers fired with ``wait=False`` were sent."""
+    from . import _trigger
+
+    _trigger.flush()
@@ -0,0 +1,278 @@
+"""Test selection expressions.
+
+Expressions combine terms with ``and``, ``or``, ``not`` and parentheses:
+
+    wandb and not slow and id~0.sample.*
+
+A term is one of:
+    key~regex   regex search against the values of key
+    key=value   exact match against the values of key
+    word        exact match against any tag, plugin, platform or parameter
+                value, or a substring of the test id
+
+Keys are ``id``, ``suite``, ``shard``, ``plugin``, ``platform``, ``param`` and
+the names of permute groups (for example ``:yea:start_method=spawn``).
+
+Parts of a term in single or double quotes may contain spaces, parentheses
+and operators, for example ``id~"sample(02|03)"``.
+"""
+
+import json
+import os
+import pathlib
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from yea import context, permute, util, ytest
+
+SELECT_INDEX_VERSION = 2
+
+Attrs = Dict[str, List[str]]
+Matcher = Callable[[Attrs], bool]
+
+RE_TOKEN = re.compile(r"""\s*(\(|\)|(?:[^\s()'"]+|'[^']*'|"[^"]*")+)""")
+RE_QUOTED = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+KEYWORDS = ("and", "or", "not")
+WORD_KEYS = ("suite", "shard", "plugin", "platform", "param")
+
+
+class SelectionError(ValueError):
+    pass
+
+
+def _tokenize(expr: str) -> List[str]:
+    tokens = []
+    pos = 0
+    expr = expr.rstrip()
+    while pos < len(expr):
+        m = RE_TOKEN.match(expr, pos)
+        if not m:
+            raise SelectionError(f"Invalid selection expression: {expr}")
+        tokens.append(m.group(1))
+        pos = m.end()
+    return tokens
+
+
+def _unquote(text: str) -> str:
+    return RE_QUOTED.sub(lambda m: m.group(1) or m.group(2) or "", text)
+
+
+def _split_term(term: str) -> Tuple[str, str, str]:
+    """Split term at its first ~ or = outside of quotes."""
+    quote = ""
+    for i, c in enumerate(term):
+        if quote:
+            if c == quote:
+                quote = ""
+        elif c in "'\"":
+            quote = c
+        elif c in "~=":
+            return _unquote(term[:i]), c, _unquote(term[i + 1 :])
+    return _unquote(term), "", ""
+
+
+def _compile_term(term: str) -> Matcher:
+    key, op, value = _split_term(term)
+    if op:
+        if not key or not value:
+            raise SelectionError(f"Invalid selection term: {term}")
+        if op == "=":
+            return lambda attrs: value in attrs.get(key, [])
+        try:
+            regex = re.compile(value)
+        except re.error as e:
+            raise SelectionError(f"Invalid selection regex {value}: {e}")
+        return lambda attrs: any(regex.search(v) for v in attrs.get(key, []))
+
+    word = key
+
+    def match_word(attrs: Attrs) -> bool:
+        if any(word in attrs.get(k, []) for k in WORD_KEYS):
+            return True
+        return any(word in v for v in attrs.get("id", []))
+
+    return match_word
+
+
+class _Parser:
+    def __init__(self, expr: str) -> None:
+        self._expr = expr
+        self._tokens = _tokenize(expr)
+        self._pos = 0
+
+    def _peek(self) -> Optional[str]:
+        if self._pos < len(self._tokens):
+            return self._tokens[self._pos]
+        return None
+
+    def _next(self) -> str:
+        tok = self._peek()
+        if tok is None:
+            raise SelectionError(f"Unexpected end of expression: {self._expr}")
+        self._pos += 1
+        return tok
+
+    def parse(self) -> Matcher:
+        matcher = self._parse_or()
+        if self._peek() is not None:
+            raise SelectionError(f"Unexpected '{self._peek()}' in: {self._expr}")
+        return matcher
+
+    def _parse_or(self) -> Matcher:
+        parts = [self._parse_and()]
+        while self._peek() == "or":
+            self._next()
+            parts.append(self._parse_and())
+        if len(parts) == 1:
+            return parts[0]
+        return lambda attrs: any(p(attrs) for p in parts)
+
+    def _parse_and(self) -> Matcher:
+        parts = [self._parse_not()]
+        while self._peek() == "and":
+            self._next()
+            parts.append(self._parse_not())
+        if len(parts) == 1:
+            return parts[0]
+        return lambda attrs: all(p(attrs) for p in parts)
+
+    def _parse_not(self) -> Matcher:
+        if self._peek() == "not":
+            self._next()
+            inner = self._parse_not()
+            return lambda attrs: not inner(attrs)
+        return self._parse_atom()
+
+    def _parse_atom(self) -> Matcher:
+        tok = self._next()
+        if tok == "(":
+            matcher = self._parse_or()
+            if self._next() != ")":
+                raise SelectionError(f"Missing ')' in: {self._expr}")
+            return matcher
+        if tok == ")" or tok in KEYWORDS:
+            raise SelectionError(f"Unexpected '{tok}' in: {self._expr}")
+        return _compile_term(tok)
+
+
+def compile_expression(expr: str) -> Matcher:
+    """Compile a selection expression into a function of test attributes."""
+    if not expr.strip():
+        raise SelectionError("Empty selection expression")
+    return _Parser(expr).parse()
+
+
+def _stamp(path: pathlib.Path) -> Optional[List[int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class TestIndex:
+    """Selection attributes of each test file, cached across runs."""
+
+    _yc: "context.YeaContext"
+    _path: pathlib.Path
+    _entries: Dict[str, Dict[str, Any]]
+    _dirty: bool
+
+    def __init__(self, yc: "context.YeaContext") -> None:
+        self._yc = yc
+        self._path = yc._cachedir / "select-index.json"
+        self._entries = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self._path, encoding="utf8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != SELECT_INDEX_VERSION:
+            return
+        self._entries = data.get("tests", {})
+
+    def _stamps(self, tname: pathlib.Path) -> List[Optional[List[int]]]:
+        # the spec and every yearc up to and including the root can change the entry
+        paths = [tname, tname.with_suffix(".yea")]
+        root = self._yc._cfg._cfroot
+        for p in tname.parents:
+            paths.append(p / ".yearc")
+            if p == root:
+                break
+        return [_stamp(p) for p in paths]
+
+    def _build(self, tname: pathlib.Path) -> Dict[str, Any]:
+        t = ytest.YeaTest(tname=tname, yc=self._yc)
+        t._load()
+        spec = t._test_cfg
+        tag = spec.get("tag", {})
+        shards = list(tag.get("shards", []))
+        shards.append(tag.get("shard", "default"))
+        params = spec.get("parametrize", {})
+        permute = []
+        for g in params.get("permute", []):
+            k = next(iter(g))
+            permute.append([k, [str(v) for v in g[k]]])
+        return dict(
+            id=t.test_id,
+            suite=[str(tag.get("suite", "main"))],
+            shard=[str(v) for v in shards],
+            plugin=[str(v) for v in spec.get("plugin", [])],
+            platform=[str(v) for v in tag.get("platforms", [])],
+            permute=permute,
+            strategy=params.get("strategy"),
+        )
+
+    def get(self, tname: pathlib.Path) -> Dict[str, Any]:
+        key = str(tname)
+        stamps = self._stamps(tname)
+        entry = self._entries.get(key)
+        if entry is None or entry.get("stamps") != stamps:
+            entry = self._build(tname)
+            entry["stamps"] = stamps
+            self._entries[key] = entry
+            self._dirty = True
+        return entry
+
+    def select(self, tname: pathlib.Path, matcher: Matcher) -> List[int]:
+        """Return the indexes of the permutations of tname that match.
+
+        Tests without permutations match with index 0.
+        """
+        entry = self.get(tname)
+        attrs: Attrs = {k: entry[k] for k in ("suite", "shard", "plugin", "platform")}
+        base_id = entry["id"]
+        groups = entry["permute"]
+        if not groups:
+            attrs["id"] = [base_id]
+            return [0] if matcher(attrs) else []
+
+        names = [name for name, _ in groups]
+        glist = [values for _, values in groups]
+        sizes = [len(values) for values in glist]
+        selected = []
+        # same permutations as YeaTest.get_permutations
+        for tnum in permute.select(sizes, entry["strategy"]):
+            row = permute.decode(sizes, tnum)
+            it = tuple(values[i] for values, i in zip(glist, row))
+            pattrs = dict(attrs)
+            pattrs["id"] = [f"{base_id}.{tnum}-{'-'.join(it)}"]
+            pattrs["param"] = list(it)
+            for name, value in zip(names, it):
+                pattrs[name] = [value]
+            if matcher(pattrs):
+                selected.append(tnum)
+        return selected
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        entries = {k: v for k, v in self._entries.items() if os.path.exists(k)}
+        util.write_json_atomic(
+            self._path, dict(version=SELECT_INDEX_VERSION, tests=entries)
+        )
+        self._dirty = False
@@ -2,21 +2,47 @@
 # specifically this file:
 # https://github.com/jerry-git/pytest-split/blob/master/src/pytest_split/algorithms.py
 
+import bisect
+import hashlib
 import heapq
-from typing import TYPE_CHECKING, Dict, List, NamedTuple, Tuple
+from array import array
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
 
 if TYPE_CHECKING:
     from yea.ytest import YeaTest
 
 
+# default number of candidate moves evaluated when refining the greedy split
+REFINE_STEPS = 200000
+# refining stops once no change gains this much of the mean group duration
+REFINE_TOLERANCE = 0.001
+
+STRATEGIES = ("duration", "hash")
+
+
 class TestGroup(NamedTuple):
     selected: "List[YeaTest]"
     deselected: "List[YeaTest]"
     duration: float
 
 
+def imbalance(groups: "List[TestGroup]") -> float:
+    """Return how much longer the slowest group is than the mean (0.1 is 10%)."""
+    return load_imbalance([g.duration for g in groups])
+
+
+def load_imbalance(loads: List[float]) -> float:
+    total = sum(loads)
+    if not loads or not total:
+        return 0.0
+    return max(loads) / (total / len(loads)) - 1
+
+
 def least_duration(
-    splits: int, items: "List[YeaTest]", durations: "Dict[str, float]"
+    splits: int,
+    items: "List[YeaTest]",
+    durations: "Dict[str, float]",
+    refine_steps: Optional[int] = None,
 ) -> "List[TestGroup]":
     """Split tests into groups by runtime.
     It walks the test items, starting with the test with largest duration.
@@ -27,69 +53,290 @@ def least_duration(
     :param splits: How many groups we're splitting in.
     :param items: Test items passed down by Pytest.
     :param durations: Our cached test runtimes. Assumes contains timings only of relevant tests
+    :param refine_steps: Budget of candidate moves for improving the greedy split
+        with local search, see _refine(). Counted in moves rather than time so
+        every node computes the same split.
     :return:
         List of groups.
     """
-    items_with_durations = _get_items_with_durations(items, durations)
+    assign, loads = plan(splits, items, durations, refine_steps=refine_steps)
+    groups = []
+    for i in range(splits):
+        group, _ = _build_group(items, assign, loads, i)
+        groups.append(group)
+    return groups
+
+
+def select_group(
+    splits: int,
+    group: int,
+    items: "List[YeaTest]",
+    durations: "Dict[str, float]",
+    refine_steps: Optional[int] = None,
+    strategy: str = "duration",
+) -> "Tuple[TestGroup, List[float]]":
+    """Return only the group with (0 based) index group, like least_duration().
+
+    Building every group with its deselected items is O(items * splits), this
+    only builds the one a split worker needs.
+    :param strategy: "duration" balances the split by durations, "hash" assigns
+        tests by consistent hashing of their ids, see plan_hash().
+    :return:
+        The group and the predicted durations of all groups.
+    """
+    if strategy == "hash":
+        assign, loads = plan_hash(splits, items, durations)
+    elif strategy == "duration":
+        assign, loads = plan(splits, items, durations, refine_steps=refine_steps)
+    else:
+        raise ValueError(f"Unknown split strategy: {strategy}")
+    return _build_group(items, assign, loads, group)
+
 
-    # add index of item in list
-    items_with_durations_indexed = [
-        (*tup, i) for i, tup in enumerate(items_with_durations)
-    ]
+def _build_group(
+    items: "List[YeaTest]", assign: "array[int]", loads: List[float], group: int
+) -> "Tuple[TestGroup, List[float]]":
+    # items keep their original relative ordering
+    selected = []
+    deselected = []
+    for item, group_idx in zip(items, assign):
+        if group_idx == group:
+            selected.append(item)
+        else:
+            deselected.append(item)
+    tg = TestGroup(selected=selected, deselected=deselected, duration=loads[group])
+    return tg, loads
 
-    # Sort by name to ensure it's always the same order
-    items_with_durations_indexed = sorted(
-        items_with_durations_indexed, key=lambda tup: str(tup[0])
-    )
 
-    # sort in ascending order
-    sorted_items_with_durations = sorted(
-        items_with_durations_indexed, key=lambda tup: tup[1], reverse=True
-    )
+def plan(
+    splits: int,
+    items: "List[YeaTest]",
+    durations: "Dict[str, float]",
+    refine_steps: Optional[int] = None,
+) -> "Tuple[array[int], List[float]]":
+    """Assign every item to a group.
 
-    selected: List[List[Tuple[YeaTest, int]]] = [[] for _ in range(splits)]
-    deselected: List[List[YeaTest]] = [[] for _ in range(splits)]
-    duration: List[float] = [0 for _ in range(splits)]
+    :return:
+        The group index of each item and the summed duration of each group.
+    """
+    nodeids = [item.nodeid for item in items]
+    completed, _ = _impute(items, nodeids, durations)
+    durs = array("d", [completed[nodeid] for nodeid in nodeids])
 
+    # Sort by duration, then name and original index to ensure it's always the same order
+    names = [str(item) for item in items]
+    order = sorted(zip([-d for d in durs], names, range(len(durs))))
+
+    assign = array("i", [0]) * len(durs)
+    loads: List[float] = [0.0] * splits
     # create a heap of the form (summed_durations, group_index)
-    heap: List[Tuple[float, int]] = [(0, i) for i in range(splits)]
+    heap: List[Tuple[float, int]] = [(0.0, i) for i in range(splits)]
     heapq.heapify(heap)
-    for item, item_duration, original_index in sorted_items_with_durations:
+    for neg_duration, _, idx in order:
         # get group with smallest sum
         summed_durations, group_idx = heapq.heappop(heap)
-        new_group_durations = summed_durations + item_duration
+        summed_durations -= neg_duration
+        assign[idx] = group_idx
+        loads[group_idx] = summed_durations
+        # store new duration - in case of ties it sorts by the group_idx
+        heapq.heappush(heap, (summed_durations, group_idx))
 
-        # store assignment
-        selected[group_idx].append((item, original_index))
-        duration[group_idx] = new_group_durations
-        for i in range(splits):
-            if i != group_idx:
-                deselected[i].append(item)
+    if refine_steps is None:
+        refine_steps = REFINE_STEPS
+    if refine_steps > 0:
+        loads = _refine(durs, assign, loads, refine_steps)
+    return assign, loads
 
-        # store new duration - in case of ties it sorts by the group_idx
-        heapq.heappush(heap, (new_group_durations, group_idx))
 
-    groups = []
-    for i in range(splits):
-        # sort the items by their original index to maintain relative ordering
-        # we don't care about the order of deselected items
-        s = [
-            item for item, original_index in sorted(selected[i], key=lambda tup: tup[1])
-        ]
-        group = TestGroup(selected=s, deselected=deselected[i], duration=duration[i])
-        groups.append(group)
-    return groups
+def jump_hash(key: int, buckets: int) -> int:
+    """Map a 64 bit key to a bucket in [0, buckets) with jump consistent hashing.
+
+    When the number of buckets grows from n to n + 1 only about 1 / (n + 1) of
+    the keys move, all of them to the new bucket (Lamping and Veach, 2014).
+    """
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
 
 
-def _get_items_with_durations(
+def hash_group(nodeid: str, splits: int) -> int:
+    digest = hashlib.blake2b(nodeid.encode("utf8"), digest_size=8).digest()
+    return jump_hash(int.from_bytes(digest, "little"), splits)
+
+
+def plan_hash(
+    splits: int, items: "List[YeaTest]", durations: "Dict[str, float]"
+) -> "Tuple[array[int], List[float]]":
+    """Assign every item to a group by hashing its node id.
+
+    Needs no durations and is stable: changing the number of splits only
+    moves about 1/splits of the tests, so per group caches stay warm. The
+    durations are only used to predict the duration of each group.
+    """
+    nodeids = [item.nodeid for item in items]
+    completed, _ = _impute(items, nodeids, durations)
+    assign = array("i", [hash_group(nodeid, splits) for nodeid in nodeids])
+    loads = [0.0] * splits
+    for nodeid, group_idx in zip(nodeids, assign):
+        loads[group_idx] += completed[nodeid]
+    return assign, loads
+
+
+def _refine(
+    durs: "array[float]", assign: "array[int]", duration: List[float], max_steps: int
+) -> List[float]:
+    """Improve a split with pairwise move/swap local search.
+
+    Repeatedly take the slowest group and apply the move of one of its items,
+    or swap of one of its items with a shorter one, that most reduces the
+    larger of the two group durations, trying the shortest other groups
+    first and settling for the first one that can be improved. Every
+    accepted change lowers the sum of squared group durations so the search
+    terminates; it also stops after evaluating max_steps candidates, once the
+    slowest group is within REFINE_TOLERANCE of the mean or when no change
+    gains more than that. Updates assign in place and returns the new group
+    durations.
+    """
+    loads = list(duration)
+    mean = sum(loads) / len(loads)
+    tolerance = REFINE_TOLERANCE * mean
+    if max(loads) - mean <= tolerance:
+        return loads
+    groups: List[List[Tuple[float, int]]] = [[] for _ in duration]
+    for idx, group_idx in enumerate(assign):
+        groups[group_idx].append((durs[idx], idx))
+    for g in groups:
+        g.sort()
+    # sorted durations of each group, kept in step with groups
+    group_durs = [[d for d, _ in g] for g in groups]
+    steps = 0
+    while steps < max_steps:
+        src = max(range(len(loads)), key=lambda i: (loads[i], -i))
+        if loads[src] - mean <= tolerance:
+            break
+        best: Optional[Tuple[float, int, int, Optional[int]]] = None
+        for dst in sorted(range(len(loads)), key=lambda i: (loads[i], i)):
+            if dst == src:
+                continue
+            gap = loads[src] - loads[dst]
+            # a change gains at most half the gap, other groups are closer still
+            if gap <= 2 * tolerance:
+                break
+            for i, d_src in enumerate(group_durs[src]):
+                for d_dst, swap in _partners(group_durs[dst], d_src, gap):
+                    steps += 1
+                    delta = d_src - d_dst
+                    if delta <= 0 or delta >= gap:
+                        continue
+                    new_max = max(loads[src] - delta, loads[dst] + delta)
+                    if loads[src] - new_max <= tolerance:
+                        continue
+                    if best is None or new_max < best[0]:
+                        best = (new_max, dst, i, swap)
+                if steps >= max_steps:
+                    break
+            if best is not None or steps >= max_steps:
+                break
+        if best is None:
+            break
+        _, dst, i, swap_idx = best
+        moved = _pop(groups[src], group_durs[src], i)
+        loads[src] -= moved[0]
+        loads[dst] += moved[0]
+        assign[moved[1]] = dst
+        if swap_idx is not None:
+            swapped = _pop(groups[dst], group_durs[dst], swap_idx)
+            loads[dst] -= swapped[0]
+            loads[src] += swapped[0]
+            assign[swapped[1]] = src
+            _insert(groups[src], group_durs[src], swapped)
+        _insert(groups[dst], group_durs[dst], moved)
+    return loads
+
+
+def _partners(
+    dst_durations: List[float], d_src: float, gap: float
+) -> List[Tuple[float, Optional[int]]]:
+    """Return the (duration, index) of the items worth swapping for d_src."""
+    # a move is a swap with a zero duration item
+    candidates: List[Tuple[float, Optional[int]]] = [(0.0, None)]
+    # the best partner leaves both groups even
+    pos = bisect.bisect_left(dst_durations, d_src - gap / 2)
+    for j in (pos - 1, pos):
+        if 0 <= j < len(dst_durations):
+            candidates.append((dst_durations[j], j))
+    return candidates
+
+
+def _pop(
+    group: List[Tuple[float, int]], group_durs: List[float], i: int
+) -> Tuple[float, int]:
+    del group_durs[i]
+    return group.pop(i)
+
+
+def _insert(
+    group: List[Tuple[float, int]], group_durs: List[float], item: Tuple[float, int]
+) -> None:
+    pos = bisect.bisect_left(group, item)
+    group.insert(pos, item)
+    group_durs.insert(pos, item[0])
+
+
+def impute_durations(
     items: "List[YeaTest]", durations: "Dict[str, float]"
-) -> "List[Tuple[YeaTest, float]]":
-    durations = _remove_irrelevant_durations(items, durations)
+) -> "Tuple[Dict[str, float], Dict[str, str]]":
+    """Estimate durations of items without one from their closest relatives.
+
+    Items may provide duration_relatives(), a list of (kind, key) pairs ordered
+    closest first (e.g. sibling permutations, then the same directory). An
+    unknown item gets the mean duration of the known items sharing the first
+    key for which there are any, or the average of all relevant durations.
+    :return:
+        Durations for every item and, for the imputed ones, the kind of
+        relative their estimate came from.
+    """
+    return _impute(items, [item.nodeid for item in items], durations)
+
+
+def _impute(
+    items: "List[YeaTest]", nodeids: List[str], durations: "Dict[str, float]"
+) -> "Tuple[Dict[str, float], Dict[str, str]]":
+    # Filtering down durations to relevant ones ensures the avg isn't skewed by irrelevant data
+    durations = {name: durations[name] for name in nodeids if name in durations}
+    if len(durations) == len(set(nodeids)):
+        return durations, {}
     avg_duration_per_test = _get_avg_duration_per_test(durations)
-    items_with_durations = [
-        (item, durations.get(item.nodeid, avg_duration_per_test)) for item in items
-    ]
-    return items_with_durations
+
+    relatives = {}
+    known: Dict[Tuple[str, Optional[str]], List[float]] = {}
+    for item, nodeid in zip(items, nodeids):
+        get_relatives = getattr(item, "duration_relatives", None)
+        keys = get_relatives() if get_relatives else []
+        relatives[nodeid] = keys
+        duration = durations.get(nodeid)
+        if duration is None:
+            continue
+        for key in keys:
+            known.setdefault(key, []).append(duration)
+
+    completed = dict(durations)
+    sources = {}
+    for nodeid in nodeids:
+        if nodeid in completed:
+            continue
+        completed[nodeid] = avg_duration_per_test
+        sources[nodeid] = "average"
+        for key in relatives[nodeid]:
+            values = known.get(key)
+            if values:
+                completed[nodeid] = sum(values) / len(values)
+                sources[nodeid] = key[0]
+                break
+    return completed, sources
 
 
 def _get_avg_duration_per_test(durations: "Dict[str, float]") -> float:
@@ -99,12 +346,3 @@ def _get_avg_duration_per_test(durations: "Dict[str, float]") -> float:
         # If there are no durations, give every test the same arbitrary value
         avg_duration_per_test = 1
     return avg_duration_per_test
-
-
-def _remove_irrelevant_durations(
-    items: "List[YeaTest]", durations: "Dict[str, float]"
-) -> "Dict[str, float]":
-    # Filtering down durations to relevant ones ensures the avg isn't skewed by irrelevant data
-    test_ids = [item.nodeid for item in items]
-    durations = {name: durations[name] for name in test_ids if name in durations}
-    return durations
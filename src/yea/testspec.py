@@ -1,11 +1,22 @@
 """Utilities for parsing a test specification."""
 
 import ast
+import copy
+import hashlib
+import logging
 import pathlib
 from typing import Any, Dict, Optional, Union
 
 import yaml
 
+logger = logging.getLogger(__name__)
+
+# prefer the libyaml backed loader when pyyaml was built with it
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# parsed yaml keyed by a digest of the yaml string, specs are often duplicated
+_yaml_cache: Dict[str, Dict[str, Any]] = {}
+
 
 def load_docstring(filepath: Union[str, pathlib.Path]) -> str:
     with open(filepath, encoding="utf8") as fd:
@@ -38,14 +49,31 @@ def load_yaml_from_docstring(docstring: str) -> Dict[str, Any]:
     return load_yaml_from_str(found)
 
 
-def load_yaml_from_str(yaml_string: str) -> Dict[str, Any]:
+def _parse_yaml(yaml_string: str) -> Dict[str, Any]:
     try:
-        data = dict(yaml.load(yaml_string, Loader=yaml.SafeLoader))
-    except yaml.scanner.ScannerError:
-        data = {}
+        data = yaml.load(yaml_string, Loader=SafeLoader)
+    except yaml.YAMLError as e:
+        # scanner, parser and composer errors from either loader end up here
+        logger.warning(f"Unable to parse yaml: {e}")
+        return {}
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        logger.warning(f"Expected yaml mapping, got {type(data).__name__}")
+        return {}
     return data
 
 
+def load_yaml_from_str(yaml_string: str) -> Dict[str, Any]:
+    key = hashlib.sha1(yaml_string.encode("utf8")).hexdigest()
+    data = _yaml_cache.get(key)
+    if data is None:
+        data = _parse_yaml(yaml_string)
+        _yaml_cache[key] = data
+    # callers fill in defaults in place, hand out a private copy
+    return copy.deepcopy(data)
+
+
 def load_yaml_from_file(filepath: Union[str, pathlib.Path]) -> Dict[str, Any]:
     file_contents = ""
     with open(filepath, encoding="utf8") as fd:
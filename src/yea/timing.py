@@ -0,0 +1,53 @@
+"""Time spent in each phase of a test and of the harness."""
+
+import contextlib
+import time
+from typing import Dict, Iterator, List
+
+# phases spent running the test program itself, everything else is overhead
+TEST_PHASES = ("process",)
+PROPERTY_PREFIX = "yea::phase::"
+
+
+class PhaseTimer:
+    """Accumulates time.monotonic() durations by phase name."""
+
+    phases: Dict[str, float]
+
+    def __init__(self) -> None:
+        self.phases = {}
+        self.created = time.monotonic()
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, time.monotonic() - start)
+
+    def add(self, name: str, elapsed: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def update(self, other: "PhaseTimer") -> None:
+        for name, elapsed in other.phases.items():
+            self.add(name, elapsed)
+
+
+def format_table(timer: PhaseTimer, wall: float) -> List[str]:
+    """Return summary lines of phase totals, longest first."""
+    lines: List[str] = []
+    if not timer.phases:
+        return lines
+    nlen = max(len(name) for name in timer.phases)
+    for name, elapsed in sorted(timer.phases.items(), key=lambda kv: -kv[1]):
+        share = elapsed / wall if wall else 0.0
+        lines.append(f"  {name:<{nlen}s}: {elapsed:8.2f} ({share:.1%})")
+    test_time = sum(timer.phases.get(name, 0.0) for name in TEST_PHASES)
+    overhead = max(wall - test_time, 0.0)
+    share = overhead / wall if wall else 0.0
+    lines.append(
+        f"  harness overhead: {overhead:.2f} ({share:.1%}) of {wall:.2f} total, "
+        f"tests {test_time:.2f}"
+    )
+    return lines
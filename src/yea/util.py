@@ -1,7 +1,10 @@
+import json
 import os
+import pathlib
 import sys
 from importlib import import_module
-from typing import Any, Callable
+from types import TracebackType
+from typing import Any, Callable, Optional, Type, Union
 
 
 def vendor_setup() -> Callable:
@@ -33,3 +36,68 @@ def vendor_import(name: str) -> Any:
     module = import_module(name)
     reset_path()
     return module
+
+
+def write_json_atomic(path: Union[str, pathlib.Path], data: Any) -> None:
+    """Write json to a temporary file and rename it over path."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+if sys.platform == "win32":
+    import msvcrt
+
+    def _lock_fd(fd: int) -> None:
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK gives up after about 10 seconds, keep waiting
+                continue
+
+    def _unlock_fd(fd: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _lock_fd(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock_fd(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class FileLock:
+    """Exclusive lock on a file, released by the system if its holder dies."""
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self._path = path
+        self._fd: Optional[int] = None
+
+    def __enter__(self) -> "FileLock":
+        fd = os.open(self._path, os.O_CREAT | os.O_RDWR)
+        try:
+            _lock_fd(fd)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        assert self._fd is not None
+        fd, self._fd = self._fd, None
+        try:
+            _unlock_fd(fd)
+        finally:
+            os.close(fd)
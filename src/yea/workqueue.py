@@ -0,0 +1,220 @@
+"""Work queue shared by yea workers through a directory.
+
+Instead of a static --splits/--group assignment every worker registers the
+same list of tests and then claims the next unclaimed test id, longest
+first, until the queue is drained. Workers write their results to the
+directory and the last worker to finish merges them.
+
+A test stays claimed until its worker ran it. While it runs the worker
+renews its lease in the background. Tests claimed by a worker that died, on
+this host, or that was not heard of for ``lease`` seconds, are handed out
+again once the queue is drained. A queue runs its tests
+once, registering with a finished queue is an error.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import socket
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from yea import util
+
+logger = logging.getLogger(__name__)
+
+STATE_FNAME = "queue.json"
+LOCK_FNAME = "queue.lock"
+# claims of a worker not heard of for this long are handed out again
+DEFAULT_LEASE_SEC = 3600.0
+# a running worker renews its lease this many times per lease
+LEASE_RENEWALS = 4
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _pid_gone(worker_id: str) -> bool:
+    """Return whether a default worker id names a process of this host that died."""
+    host, _, pid = worker_id.rpartition("-")
+    # os.kill() terminates the process on windows
+    if sys.platform == "win32" or host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass
+    return False
+
+
+class WorkQueue:
+    _path: pathlib.Path
+    _worker_id: str
+
+    def __init__(
+        self,
+        path: pathlib.Path,
+        worker_id: Optional[str] = None,
+        lease: float = DEFAULT_LEASE_SEC,
+    ) -> None:
+        self._path = path
+        self._worker_id = worker_id or default_worker_id()
+        self._lease = lease
+        self._path.mkdir(parents=True, exist_ok=True)
+        self._lock = util.FileLock(path / LOCK_FNAME)
+
+    @property
+    def path(self) -> pathlib.Path:
+        return self._path
+
+    @property
+    def worker_id(self) -> str:
+        return self._worker_id
+
+    def _read_state(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path / STATE_FNAME, encoding="utf8") as f:
+                data: Dict[str, Any] = json.load(f)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def _write_state(self, state: Dict[str, Any]) -> None:
+        util.write_json_atomic(self._path / STATE_FNAME, state)
+
+    def _locked_state(self) -> Dict[str, Any]:
+        state = self._read_state()
+        if state is None:
+            raise RuntimeError("Queue is not registered")
+        return state
+
+    def _seen(self, state: Dict[str, Any], status: str = "running") -> None:
+        state["workers"][self._worker_id] = dict(status=status, seen=time.time())
+
+    def _dead(self, state: Dict[str, Any], worker_id: str) -> bool:
+        worker = state["workers"].get(worker_id)
+        if worker is None or worker["status"] == "dead":
+            return True
+        if worker["status"] == "done":
+            return False
+        return time.time() - worker["seen"] > self._lease or _pid_gone(worker_id)
+
+    def _complete(self, state: Dict[str, Any]) -> bool:
+        return (
+            state["next"] >= len(state["tests"])
+            and not state["claims"]
+            and all(
+                w["status"] == "done" or self._dead(state, worker_id)
+                for worker_id, w in state["workers"].items()
+            )
+        )
+
+    def register(self, test_ids: List[str], durations: Dict[str, float]) -> None:
+        """Join the queue, creating it longest test first if we are the first."""
+        key = hashlib.sha1("\n".join(sorted(test_ids)).encode("utf8")).hexdigest()
+        avg = sum(durations.values()) / len(durations) if durations else 1
+        with self._lock:
+            state = self._read_state()
+            if state is None:
+                order = sorted(test_ids, key=lambda t: (-durations.get(t, avg), t))
+                state = dict(key=key, tests=order, next=0, workers={}, claims={})
+            elif state["key"] != key:
+                raise RuntimeError(
+                    f"Queue in {self._path} was created for a different set of tests"
+                )
+            elif self._complete(state):
+                raise RuntimeError(
+                    f"Queue in {self._path} already ran all its tests,"
+                    " use a new queue dir for a new run"
+                )
+            self._seen(state)
+            self._write_state(state)
+
+    def _orphan(self, state: Dict[str, Any]) -> Optional[str]:
+        for test_id, worker_id in state["claims"].items():
+            if worker_id != self._worker_id and self._dead(state, worker_id):
+                if worker_id in state["workers"]:
+                    state["workers"][worker_id]["status"] = "dead"
+                logger.warning(f"Reclaiming {test_id} of dead worker {worker_id}")
+                print(f"WARNING: running {test_id} again, worker {worker_id} died")
+                return str(test_id)
+        return None
+
+    def claim(self) -> Optional[str]:
+        """Return the next test id to run, None once the queue is drained."""
+        with self._lock:
+            state = self._locked_state()
+            if state["next"] < len(state["tests"]):
+                test_id: Optional[str] = state["tests"][state["next"]]
+                state["next"] += 1
+            else:
+                test_id = self._orphan(state)
+            if test_id is not None:
+                state["claims"][test_id] = self._worker_id
+            self._seen(state)
+            self._write_state(state)
+        return test_id
+
+    def complete(self, test_id: str) -> None:
+        """Release the claim on a test that was run."""
+        with self._lock:
+            state = self._locked_state()
+            state["claims"].pop(test_id, None)
+            self._seen(state)
+            self._write_state(state)
+
+    def _renew(self, stop: threading.Event) -> None:
+        # a slow test must not look like a dead worker
+        while not stop.wait(self._lease / LEASE_RENEWALS):
+            try:
+                with self._lock:
+                    state = self._locked_state()
+                    self._seen(state)
+                    self._write_state(state)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to renew queue lease: {e}")
+
+    def claims(self) -> Iterator[str]:
+        """Yield test ids to run, each is complete once the next one is asked for."""
+        stop = threading.Event()
+        threading.Thread(
+            target=self._renew, args=(stop,), name="yea-queue-lease", daemon=True
+        ).start()
+        try:
+            while True:
+                test_id = self.claim()
+                if test_id is None:
+                    return
+                yield test_id
+                self.complete(test_id)
+        finally:
+            stop.set()
+
+    def finish(self, results: List[Dict[str, Any]]) -> bool:
+        """Publish our results, return True if all workers are done."""
+        util.write_json_atomic(self._path / f"results-{self._worker_id}.json", results)
+        with self._lock:
+            state = self._locked_state()
+            self._seen(state, status="done")
+            self._write_state(state)
+            return self._complete(state)
+
+    def load_results(self) -> List[Dict[str, Any]]:
+        """Return the results of all workers, once per test."""
+        results: Dict[str, Dict[str, Any]] = {}
+        for fname in sorted(self._path.glob("results-*.json")):
+            with open(fname, encoding="utf8") as f:
+                for r in json.load(f):
+                    # a test handed out again may have finished twice
+                    if r["name"] in results:
+                        logger.warning(f"Ignoring second result of {r['name']}")
+                        continue
+                    results[r["name"]] = r
+        return list(results.values())
@@ -1,11 +1,21 @@
+import ast
 import io
+import json
 import logging
+import os
+import pathlib
 import re
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+from yea import util
 
 logger = logging.getLogger(__name__)
 
+# files not containing the marker can not have yeadoc snippets
+YEADOC_MARKER = b"yeadoc-test"
+YEADOC_CACHE_VERSION = 1
+
 
 @dataclass
 class YeadocSnippet:
@@ -78,3 +88,80 @@ def extract_from_buffer(
 
 def load_tests_from_docstring(docstring: str) -> List[YeadocSnippet]:
     return extract_from_buffer(io.StringIO(docstring))
+
+
+def load_docstrings_from_source(source: str) -> List[str]:
+    """Return docstrings of top level functions, classes and their methods."""
+    mod = ast.parse(source)
+
+    doc_strings = []
+
+    function_definitions = [
+        node for node in mod.body if isinstance(node, ast.FunctionDef)
+    ]
+    for func in function_definitions:
+        docstr = ast.get_docstring(func) or ""
+        doc_strings.append(docstr)
+
+    classes = [node for node in mod.body if isinstance(node, ast.ClassDef)]
+    for class_ in classes:
+        methods = [node for node in class_.body if isinstance(node, ast.FunctionDef)]
+        for func in methods:
+            docstr = ast.get_docstring(func) or ""
+            doc_strings.append(docstr)
+        class_docstr = ast.get_docstring(class_) or ""
+        if class_docstr is not None:
+            doc_strings.append(class_docstr)
+    return doc_strings
+
+
+class YeadocCache:
+    """Snippets found in source files, keyed by path and validated by stat."""
+
+    _path: pathlib.Path
+    _entries: Dict[str, Dict[str, Any]]
+    _dirty: bool
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self._path = path
+        self._entries = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self._path, encoding="utf8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != YEADOC_CACHE_VERSION:
+            return
+        self._entries = data.get("files", {})
+
+    @staticmethod
+    def _stamp(st: os.stat_result) -> List[int]:
+        return [st.st_mtime_ns, st.st_size]
+
+    def get(
+        self, tpath: pathlib.Path, st: os.stat_result
+    ) -> Optional[List[YeadocSnippet]]:
+        entry = self._entries.get(str(tpath))
+        if not entry or entry.get("stamp") != self._stamp(st):
+            return None
+        return [YeadocSnippet(**s) for s in entry["snippets"]]
+
+    def set(
+        self, tpath: pathlib.Path, st: os.stat_result, snippets: List[YeadocSnippet]
+    ) -> None:
+        self._entries[str(tpath)] = dict(
+            stamp=self._stamp(st), snippets=[asdict(s) for s in snippets]
+        )
+        self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        entries = {k: v for k, v in self._entries.items() if os.path.exists(k)}
+        data = dict(version=YEADOC_CACHE_VERSION, files=entries)
+        util.write_json_atomic(self._path, data)
+        self._dirty = False
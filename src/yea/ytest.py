@@ -1,23 +1,40 @@
 """Yea test class."""
 
 import configparser
+import copy
+import errno
 import functools
 import itertools
 import json
 import os
 import pathlib
 import re
+import signal
 import subprocess
 import sys
+import threading
 import time
-from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import requests
 
-from yea import context, registry, testcfg, testspec
+from yea import benchmark, context, permute, registry, testcfg, testspec, timing
 
 RE_TESTNAME = re.compile(r"t(?P<id>\d+)_(?P<name>[a-zA-z]\w+)$")
 
+# format of the per test context file read by yea.setup() in the test process
+CONTEXT_VERSION = 1
+
 
 def _shutdown_process(p: subprocess.Popen) -> None:
     p.kill()
@@ -28,26 +45,97 @@ def _shutdown_process(p: subprocess.Popen) -> None:
         sys.exit(1)
 
 
-def run_command(
+def _exit_code(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _wait_usage(p: subprocess.Popen, timeout: Optional[int]) -> Any:
+    """Wait for p and return its resource usage, killing it on timeout."""
+    expired = threading.Event()
+    lock = threading.Lock()
+    exited = False
+
+    def kill() -> None:
+        with lock:
+            # once p is reaped its pid may belong to another process
+            if exited:
+                return
+            expired.set()
+            # not p.kill(), polling there would race with wait4 reaping p
+            os.kill(p.pid, signal.SIGKILL)
+
+    timer = threading.Timer(timeout, kill) if timeout else None
+    if timer:
+        timer.start()
+    try:
+        if hasattr(os, "waitid"):
+            # wait for the exit but leave p unreaped, so kill() can not miss
+            os.waitid(os.P_PID, p.pid, os.WEXITED | os.WNOWAIT)
+    finally:
+        with lock:
+            exited = True
+        if timer:
+            timer.cancel()
+    _, status, rusage = os.wait4(p.pid, 0)
+    p.returncode = _exit_code(status)
+    if expired.is_set():
+        raise subprocess.TimeoutExpired(p.args, timeout or 0)
+    return rusage
+
+
+def _pin_cpus(p: subprocess.Popen, cpus: List[int]) -> None:
+    # set from the parent, a preexec_fn is not safe with threads running
+    try:
+        os.sched_setaffinity(p.pid, cpus)  # type: ignore[attr-defined,unused-ignore]
+    except ProcessLookupError:
+        # already gone, nothing left to pin
+        pass
+
+
+def run_measured(
     cmd_list: List[str],
-    timeout: int = 300,
+    timeout: Optional[int] = 300,
     env: Mapping = os.environ,
-) -> int:
+    cpus: Optional[List[int]] = None,
+) -> Tuple[int, benchmark.Usage]:
+    """Run a command and return its exit code and resource usage."""
     print("INFO: RUNNING=", cmd_list)
 
     # start the test process as its own process group in case it matters
     kwargs: Dict[str, Any] = dict(close_fds=True, start_new_session=True)
+    rusage = None
+    start_time = time.monotonic()
     p = subprocess.Popen(cmd_list, env=env, **kwargs)
+    if cpus:
+        _pin_cpus(p, cpus)
     try:
-        p.communicate(timeout=timeout)
+        if hasattr(os, "wait4"):
+            rusage = _wait_usage(p, timeout)
+        else:
+            p.communicate(timeout=timeout)
     except KeyboardInterrupt:
         print("ERROR: KEYBOARD INTERRUPT")
         _shutdown_process(p)
     except subprocess.TimeoutExpired:
         print("ERROR: TIMEOUT")
         _shutdown_process(p)
+    wall = time.monotonic() - start_time
     print("INFO: exit=", p.returncode)
-    return p.returncode
+    if rusage is None:
+        return p.returncode, benchmark.Usage(wall)
+    cpu = rusage.ru_utime + rusage.ru_stime
+    return p.returncode, benchmark.Usage(wall, cpu, rusage.ru_maxrss)
+
+
+def run_command(
+    cmd_list: List[str],
+    timeout: Optional[int] = 300,
+    env: Mapping = os.environ,
+) -> int:
+    exit_code, _ = run_measured(cmd_list, timeout=timeout, env=env)
+    return exit_code
 
 
 def download(url: str, fname: str) -> bool:
@@ -123,9 +211,76 @@ def get_config(config: Dict[str, Any], prefix: str) -> Dict[str, Any]:
     return functools.reduce(merge, parsed_items) if parsed_items else {}
 
 
+@functools.lru_cache(maxsize=None)
+def _dir_id_parts(tdir: pathlib.Path, root: Optional[pathlib.Path]) -> Tuple[str, ...]:
+    """Return id parts of a test directory, walking until root or base."""
+    parts: List[str] = []
+    for p in itertools.chain([tdir], tdir.parents):
+        base = False
+        part_id = ""
+        if p == root:
+            break
+
+        # find part_id from dirname
+        m = RE_TESTNAME.match(p.stem)
+        if m:
+            part_id = m["id"]
+
+        # always parse yearc
+        yearc = p / ".yearc"
+        if yearc.exists():
+            cf = configparser.ConfigParser()
+            cf.read(yearc)
+            # do not walk past the base
+            base = cf.getboolean("yea", "base", fallback=False)
+            # use part_id from yearc
+            if not part_id:
+                part_id = cf.get("yea", "id", fallback="")
+
+        if not part_id:
+            part_id = p.stem
+        parts.insert(0, part_id)
+        if base:
+            break
+    return tuple(parts)
+
+
+class _PermuteSpace(NamedTuple):
+    """Permute groups of a test, shared by all of its permutations."""
+
+    names: List[str]
+    values: List[List[Any]]
+    sizes: List[int]
+
+
 class YeaTest:
+    # large test matrices create many instances, avoid a __dict__ for each
+    __slots__ = (
+        "_tname",
+        "_id_path",
+        "_yc",
+        "_args",
+        "_retcode",
+        "_time",
+        "_test_cfg",
+        "_covrc",
+        "_time_start",
+        "_time_end",
+        "_permute_space",
+        "_permute_index",
+        "_yearc_list",
+        "_registry",
+        "_profile_file",
+        "_test_id_cache",
+        "_phases",
+        "_usage",
+        "_plugin_times",
+    )
+
     def __init__(self, *, tname: pathlib.Path, yc: "context.YeaContext") -> None:
         self._tname = tname
+        # path used for naming the test, yeadoc tests run from elsewhere
+        self._id_path: Optional[pathlib.Path] = None
         self._yc = yc
         self._args = yc._args
         self._retcode: int
@@ -134,24 +289,50 @@ class YeaTest:
         self._covrc: Optional[pathlib.Path] = None
         self._time_start: Optional[Union[int, float]] = None
         self._time_end: Optional[Union[int, float]] = None
-        self._permute_groups: Optional[List[Any]] = None
-        self._permute_items: Optional[Tuple[Any, ...]] = None
+        self._permute_space: Optional[_PermuteSpace] = None
+        self._permute_index = 0
         self._yearc_list: List[configparser.ConfigParser] = []
         self._registry: Optional[registry.Registry] = None
-        self._permute_id: str = ""
         self._profile_file: Optional[pathlib.Path] = None
+        self._test_id_cache: Optional[Tuple[Tuple[pathlib.Path, str], str]] = None
+        self._phases = timing.PhaseTimer()
+        self._usage: Optional[benchmark.Usage] = None
+        # plugin hook calls made for this test
+        self._plugin_times = timing.PhaseTimer()
 
     def __str__(self) -> str:
         return f"{self._tname}"
 
+    @property
+    def _permute_groups(self) -> Optional[List[str]]:
+        return self._permute_space.names if self._permute_space else None
+
+    @property
+    def _permute_items(self) -> Optional[Tuple[Any, ...]]:
+        space = self._permute_space
+        if not space:
+            return None
+        row = permute.decode(space.sizes, self._permute_index)
+        return tuple(v[i] for v, i in zip(space.values, row))
+
+    @property
+    def _permute_id(self) -> str:
+        items = self._permute_items
+        if items is None:
+            return ""
+        return f"{self._permute_index}-{'-'.join(map(str, items))}"
+
     def _add_yearc_list(self, yearc_list: List) -> None:
         self._yearc_list = yearc_list
 
     def _add_registry(self, r: "registry.Registry") -> None:
         self._registry = r
 
-    def _change_yeadoc_path(self, path: pathlib.Path) -> None:
+    def _change_yeadoc_path(
+        self, path: pathlib.Path, id_path: Optional[pathlib.Path] = None
+    ) -> None:
         self._tname = path
+        self._id_path = id_path
 
     @property
     def skip(self) -> bool:
@@ -159,7 +340,7 @@ class YeaTest:
         spec = self._test_cfg
         my_platform = self._yc._get_platform()
         suite = spec.get("tag", {}).get("suite", "main")
-        shards = spec.get("tag", {}).get("shards", [])
+        shards = list(spec.get("tag", {}).get("shards", []))
         shard = spec.get("tag", {}).get("shard", "default")
         platforms = spec.get("tag", {}).get("platforms", [])
         shards.append(shard)
@@ -235,12 +416,17 @@ class YeaTest:
     def _depend(self) -> bool:
         tname = self._tname
         print("INFO: DEPEND=", tname)
+        self._yc.emit("depend_start", test_id=self.test_id)
         tpath = pathlib.Path(tname)
         os.chdir(tpath.parent)
         err = False
-        err = err or self._depend_uninstall()
-        err = err or self._depend_files()
-        err = err or self._depend_install()
+        with self._phases.phase("uninstall"):
+            err = err or self._depend_uninstall()
+        with self._phases.phase("download"):
+            err = err or self._depend_files()
+        with self._phases.phase("install"):
+            err = err or self._depend_install()
+        self._yc.emit("depend_end", test_id=self.test_id, ok=not err)
 
         return err
 
@@ -266,7 +452,26 @@ class YeaTest:
         assert self.test_id
         return self.test_id
 
-    def _run(self) -> None:
+    def _spawn(
+        self,
+        cmd_list: List[str],
+        env: Dict[str, str],
+        timeout: Optional[int],
+        cpus: Optional[List[int]],
+        plugin_env: List[str],
+    ) -> Tuple[int, benchmark.Usage]:
+        try:
+            return run_measured(cmd_list, env=env, timeout=timeout, cpus=cpus)
+        except OSError as e:
+            if e.errno != errno.E2BIG or not plugin_env:
+                raise
+        # the vars are in the context file too, yea.setup() reads them there
+        print(f"WARNING: environment too large, not setting {', '.join(plugin_env)}")
+        for k in plugin_env:
+            env.pop(k, None)
+        return run_measured(cmd_list, env=env, timeout=timeout, cpus=cpus)
+
+    def _run(self, cpus: Optional[List[int]] = None) -> None:
         tname = self._tname
         print("INFO: RUN=", tname)
         program = self._test_cfg.get("command", {}).get("program")
@@ -292,11 +497,21 @@ class YeaTest:
         elist = self._test_cfg.get("env", [])
         for edict in elist:
             env.update(edict)
+        params = (
+            {k: v for (k, v) in zip(self._permute_groups, self._permute_items)}
+            if self._permute_groups and self._permute_items
+            else None
+        )
+        # everything the test process needs to know, read by yea.setup()
+        ctx: Dict[str, Any] = dict(
+            version=CONTEXT_VERSION, test_id=self.test_id, params=params or {}
+        )
+        # the env vars below are kept for plugins reading them directly
         if self._permute_groups and self._permute_items:
             env["YEA_PARAM_NAMES"] = ",".join(self._permute_groups)
             env["YEA_PARAM_VALUES"] = ",".join(map(str, self._permute_items))
 
-        # pass profile config as env vars to be loaded by yea.setup() in test
+        # pass profile config to be loaded by yea.setup() in test
         # NOTE: yea.setup() will not be required in the future (hopefully)
         profile: List[Union[str, Dict[str, Dict[str, Any]]]] = self._test_cfg.get(
             "profile", []
@@ -317,6 +532,9 @@ class YeaTest:
             prof_file = self._yc._cachedir.joinpath(prof_fname)
             env["YEA_PROFILE_FILE"] = str(prof_file)
             self._profile_file = prof_file
+            ctx["profile"] = dict(
+                file=str(prof_file), vars=dict(zip(prof_vars.split(","), prof_vals))
+            )
 
         trigger: List[Union[str, Dict[str, Dict[str, Any]]]] = self._test_cfg.get(
             "trigger", []
@@ -334,13 +552,13 @@ class YeaTest:
                 )
             )
             env["YEA_TRIGGER_VARS"] = trig_vars
+            ctx["trigger"] = sorted(trig_vars.split(",")) if trig_vars else []
 
         plugins = self._test_cfg.get("plugin", [])
-        params = (
-            {k: v for (k, v) in zip(self._permute_groups, self._permute_items)}
-            if self._permute_groups and self._permute_items
-            else None
-        )
+        ctx["plugins"] = plugins
+        ctx["plugin_vars"] = {}
+        # dropped if the system refuses an environment this large
+        plugin_env: List[str] = []
         if plugins:
             for plugin_name in plugins:
                 prefix = f":{plugin_name}:"
@@ -363,16 +581,40 @@ class YeaTest:
                             pnames.append(k[len(prefix) :])
                             pvalues.append(v)
                 if pnames and pvalues:
+                    ctx["plugin_vars"][plugin_name] = dict(zip(pnames, pvalues))
                     env[f"YEA_PLUGIN_{penv}_NAMES"] = ",".join(pnames)
                     env[f"YEA_PLUGIN_{penv}_VALUES"] = json.dumps(pvalues)
+                    plugin_env.extend(
+                        [f"YEA_PLUGIN_{penv}_NAMES", f"YEA_PLUGIN_{penv}_VALUES"]
+                    )
             env["YEA_PLUGINS"] = ",".join(plugins)
 
-        start_time = time.monotonic()
-        exit_code = run_command(cmd_list, env=env, timeout=timeout)
-        end_time = time.monotonic()
+        ctx_file = self._write_context(ctx)
+        env["YEA_CONTEXT_FILE"] = str(ctx_file)
+        self._yc.emit("process_start", test_id=self.test_id, cmd=cmd_list)
+        try:
+            exit_code, usage = self._spawn(cmd_list, env, timeout, cpus, plugin_env)
+        finally:
+            ctx_file.unlink(missing_ok=True)
+        self._yc.emit(
+            "process_exit",
+            test_id=self.test_id,
+            exit_code=exit_code,
+            elapsed=usage.wall,
+            cpu=usage.cpu,
+            maxrss=usage.maxrss,
+        )
 
         self._retcode = exit_code
-        self._time = end_time - start_time
+        self._time = usage.wall
+        self._usage = usage
+
+    def _write_context(self, ctx: Dict[str, Any]) -> pathlib.Path:
+        fname = f".context-{self._yc._pid}-{self.test_id}.json"
+        path = self._yc._cachedir.joinpath(fname)
+        with open(path, "w", encoding="utf8") as f:
+            json.dump(ctx, f, separators=(",", ":"), default=str)
+        return path
 
     def _load(self) -> None:
         spec = None
@@ -394,10 +636,14 @@ class YeaTest:
 
     def _prep(self) -> None:
         """Cleanup and/or populate wandb dir."""
-        self._yc.test_prep(self)
+        self._yc.emit("prep_start", test_id=self.test_id)
+        with self._phases.phase("plugin_prep"):
+            self._yc.test_prep(self)
         # load file and docstring eval criteria
-        self._setup_coverage_file()
-        self._setup_coverage_config()
+        with self._phases.phase("coverage"):
+            self._setup_coverage_file()
+            self._setup_coverage_config()
+        self._yc.emit("prep_end", test_id=self.test_id)
 
     def _setup_coverage_file(self) -> None:
         # dont mess with coverage_file (for now) if already set
@@ -444,24 +690,38 @@ class YeaTest:
 
     def _fin(self) -> None:
         """Reap anything in wandb dir."""
-        self._yc.test_done(self)
+        with self._phases.phase("plugin_done"):
+            self._yc.test_done(self)
 
-    def run(self) -> None:
+    def run(self, depend: bool = True, cpus: Optional[List[int]] = None) -> None:
+        # permutations share the spec of their base test until they run
+        self._test_cfg = copy.deepcopy(self._test_cfg)
         self._prep()
         if not self._args.dryrun:
-            err = self._depend()
+            # benchmark repetitions only install dependencies once
+            err = self._depend() if depend else False
             # TODO: record error instead of assert
             assert not err, "Problem getting test dependencies"
             self._time_start = time.time()
-            self._run()
+            with self._phases.phase("process"):
+                self._run(cpus=cpus)
             self._time_end = time.time()
         self._fin()
 
-    def get_permutations(self) -> List["YeaTest"]:
+    def get_permutations(self, indexes: Optional[List[int]] = None) -> List["YeaTest"]:
+        """Return a test per permutation, or only the ones at indexes if given."""
+        return list(self.iter_permutations(indexes=indexes))
+
+    def iter_permutations(
+        self, indexes: Optional[List[int]] = None
+    ) -> Iterator["YeaTest"]:
+        """Yield permutations as lightweight copies sharing this test's spec."""
         self._load()
         params = self._test_cfg.get("parametrize")
         if not params:
-            return [self]
+            if indexes is None or 0 in indexes:
+                yield self
+            return
         groups = params.get("permute", [])
         gnames = []
         glist = []
@@ -473,33 +733,47 @@ class YeaTest:
             v = g[k]
             assert isinstance(v, list)
             glist.append(v)
-        items = list(itertools.product(*glist))
-        r = []
-        for tnum, it in enumerate(items):
-            t = YeaTest(tname=self._tname, yc=self._yc)
-            t._load()
-            t._permute_groups = gnames
-            t._permute_items = it
-            tpname = f"{tnum}-{'-'.join(map(str, it))}"
-            t._permute_id = tpname
-            r.append(t)
-        return r
+        space = _PermuteSpace(gnames, glist, [len(v) for v in glist])
+        tnums = permute.select(space.sizes, params.get("strategy"))
+        if indexes is not None:
+            wanted = set(indexes)
+            tnums = [tnum for tnum in tnums if tnum in wanted]
+        for tnum in tnums:
+            yield self._permutation(space, tnum)
+
+    def _permutation(self, space: _PermuteSpace, tnum: int) -> "YeaTest":
+        t = YeaTest.__new__(YeaTest)
+        for attr in YeaTest.__slots__:
+            if hasattr(self, attr):
+                setattr(t, attr, getattr(self, attr))
+        t._permute_space = space
+        t._permute_index = tnum
+        t._test_id_cache = None
+        t._phases = timing.PhaseTimer()
+        t._usage = None
+        t._plugin_times = timing.PhaseTimer()
+        return t
 
     @property
     def name(self) -> str:
         root = self._yc._cfg._cfroot
         if root is None:
             raise TypeError("Config root not set")
-        b = self._tname.relative_to(root)
+        b = (self._id_path or self._tname).relative_to(root)
         return str(b)
 
     @property
     def test_id(self) -> Optional[str]:
+        tname = self._id_path or self._tname
+        # ids are looked up a lot while splitting large test matrices
+        key = (tname, self._permute_id)
+        if self._test_id_cache and self._test_id_cache[0] == key:
+            return self._test_id_cache[1]
         root = self._yc._cfg._cfroot
         leaf_id = ""
 
         # parse leaf id from filename
-        m = RE_TESTNAME.match(self._tname.stem)
+        m = RE_TESTNAME.match(tname.stem)
         if m:
             leaf_id = m["id"]
 
@@ -512,47 +786,39 @@ class YeaTest:
 
         # fallback use filename stem
         if not leaf_id:
-            leaf_id = self._tname.stem
-
-        parts = [leaf_id]
-
-        # walk until root or base, picking up ids
-        # TODO: use registry yearc probed cache, self._yearc_list
-        for p in self._tname.parents:
-            base = False
-            part_id = ""
-            if p == root:
-                break
-
-            # find part_id from dirname
-            m = RE_TESTNAME.match(p.stem)
-            if m:
-                part_id = m["id"]
-
-            # always parse yearc
-            yearc = p / ".yearc"
-            if yearc.exists():
-                cf = configparser.ConfigParser()
-                cf.read(yearc)
-                # do not walk past the base
-                base = cf.getboolean("yea", "base", fallback=False)
-                # use part_id from yearc
-                if not part_id:
-                    part_id = cf.get("yea", "id", fallback="")
+            leaf_id = tname.stem
 
-            if not part_id:
-                part_id = p.stem
-            parts.insert(0, part_id)
-            if base:
-                break
+        parts = list(_dir_id_parts(tname.parent, root))
+        parts.append(leaf_id)
 
         # add a part for permutations
         if self._permute_id:
             parts.append(self._permute_id)
 
         tid = ".".join(parts)
+        self._test_id_cache = (key, tid)
         return tid
 
+    @property
+    def base_id(self) -> Optional[str]:
+        """Test id shared by all permutations of this test."""
+        tid = self.test_id
+        if tid and self._permute_id:
+            tid = tid[: -len(self._permute_id) - 1]
+        return tid
+
+    def duration_relatives(self) -> List[Tuple[str, Optional[str]]]:
+        """Keys of tests likely to take as long as this one, closest first."""
+        cfg = self._test_cfg
+        plugins = ",".join(sorted(cfg.get("plugin", [])))
+        reqs = ",".join(sorted(cfg.get("depend", {}).get("requirements", [])))
+        path = self._id_path or self._tname
+        return [
+            ("sibling", self.base_id),
+            ("directory", str(path.parent)),
+            ("profile", f"{plugins};{reqs}"),
+        ]
+
     @property
     def _sort_key(self) -> str:
         tid = str(self._test_cfg.get("id", "")) if self._test_cfg else ""
@@ -1,4 +1,5 @@
 import argparse
+import os
 import sys
 from typing import Callable, List, Optional
 from unittest import mock
@@ -26,13 +27,27 @@ def default_cli_args(
     platform: Optional[str] = None,
     shard: Optional[str] = None,
     suite: Optional[str] = None,
+    select: Optional[str] = None,
     tests: Optional[List[str]] = None,
     plugin_args: Optional[list] = None,
     strict: Optional[bool] = False,
     noskip: Optional[bool] = False,
     splits: Optional[int] = None,
     group: Optional[int] = None,
+    split_budget: Optional[int] = None,
+    split_strategy: str = "duration",
     store_durations: bool = False,
+    duration_estimator: str = "median",
+    queue_dir: Optional[str] = None,
+    events: Optional[str] = None,
+    profile_harness: Optional[str] = None,
+    progress: str = "off",
+    declared_plugins_only: bool = False,
+    check_timeout: Optional[float] = 600.0,
+    history_action: str = "slowest",
+    history_runs: int = 20,
+    history_limit: int = 20,
+    history_metric: str = "elapsed",
 ) -> dict:
     return {
         "action": action,
@@ -50,13 +65,27 @@ def default_cli_args(
         "platform": platform,
         "shard": shard,
         "suite": suite,
+        "select": select,
         "tests": tests,
         "plugin_args": plugin_args,
         "strict": strict,
         "noskip": noskip,
         "splits": splits,
         "group": group,
+        "split_budget": split_budget,
+        "split_strategy": split_strategy,
         "store_durations": store_durations,
+        "duration_estimator": duration_estimator,
+        "queue_dir": queue_dir,
+        "events": events,
+        "profile_harness": profile_harness,
+        "progress": progress,
+        "declared_plugins_only": declared_plugins_only,
+        "check_timeout": check_timeout,
+        "history_action": history_action,
+        "history_runs": history_runs,
+        "history_limit": history_limit,
+        "history_metric": history_metric,
     }
 
 
@@ -72,3 +101,11 @@ def mocked_yea_context(request):
 def sys_exit():
     with mock.patch("sys.exit", lambda x: print(f"SystemExit: {x}")):
         yield
+
+
+@pytest.fixture(autouse=True)
+def restore_cwd():
+    # running a test changes into its directory
+    cwd = os.getcwd()
+    yield
+    os.chdir(cwd)
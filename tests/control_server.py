@@ -0,0 +1,76 @@
+"""Stand-in for the control endpoint of the wandb mock server."""
+
+import http.server
+import json
+import socketserver
+import threading
+import time
+
+
+class ControlHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if server.delay:
+            time.sleep(server.delay)
+        with server.lock:
+            server.requests.append(json.loads(body))
+        status = server.status
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ControlMixin:
+    daemon_threads = True
+
+    def setup_control(self, delay, status):
+        self.delay = delay
+        self.status = status
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = []
+
+    @property
+    def commands(self):
+        """Every command received, batches flattened."""
+        out = []
+        for data in self.requests:
+            out.extend(data if isinstance(data, list) else [data])
+        return out
+
+
+class TCPControlServer(_ControlMixin, http.server.ThreadingHTTPServer):
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class UnixControlServer(_ControlMixin, socketserver.ThreadingUnixStreamServer):
+    @property
+    def url(self):
+        return f"unix:{self.server_address}"
+
+
+def start(server_cls, address, delay=0.0, status=200):
+    server = server_cls(address, ControlHandler)
+    server.setup_control(delay, status)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    return server
+
+
+def stop(server):
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,75 @@
+import os
+from unittest import mock
+
+import pytest
+
+from yea import benchmark
+from yea.context import YeaContext
+from yea.registry import Registry
+from yea.runner import TestRunner as Runner  # not to confuse pytest
+
+
+def test_parse_cpu_list():
+    assert benchmark.parse_cpu_list("2-3,8\n") == [2, 3, 8]
+    assert benchmark.parse_cpu_list("\n") == []
+
+
+def test_config_done():
+    bench = benchmark.BenchmarkConfig.from_spec({"repeat": 2, "min_time": 1.0})
+    assert bench.warmup == benchmark.DEFAULT_WARMUP
+    usage = benchmark.Usage(0.4)
+    assert not bench.done([usage])
+    assert not bench.done([usage, usage])
+    assert bench.done([usage, usage, usage])
+    assert benchmark.config_for({}) is None
+
+
+def test_pin_cpus(capsys):
+    if not hasattr(os, "sched_setaffinity"):
+        pytest.skip("no cpu affinity")
+    available = sorted(os.sched_getaffinity(0))
+    bench = benchmark.BenchmarkConfig(cpus=[available[0], 100000])
+    assert bench.pin_cpus() == [available[0]]
+    assert "ignoring unavailable benchmark cpus [100000]" in capsys.readouterr().out
+    assert benchmark.BenchmarkConfig().pin_cpus() is None
+
+
+def test_aggregate():
+    usages = [benchmark.Usage(1.0, 0.5, 1024), benchmark.Usage(3.0, 0.7, 2048)]
+    with mock.patch("sys.platform", "linux"):
+        usage = benchmark.aggregate_usage(usages)
+    assert usage["wall"]["min"] == 1.0
+    assert usage["wall"]["median"] == 2.0
+    assert usage["wall"]["stddev"] == pytest.approx(2**0.5)
+    assert usage["rss"]["median"] == 1.5
+    profile = benchmark.aggregate_profiles(
+        [{":wandb:init": {"mean": 1.0, "n": "x"}}, {":wandb:init": {"mean": 2.0}}]
+    )
+    assert benchmark.median_profile(profile) == {":wandb:init": {"mean": 1.5}}
+    names = [p["name"] for p in benchmark.properties(usage, profile, runs=2)]
+    assert "yea::bench::runs" in names
+    assert "yea::bench::cpu::stddev" in names
+    assert "yea::bench:::wandb:init::mean::min" in names
+
+
+@pytest.mark.parametrize(
+    "mocked_yea_context",
+    [{"action": "run", "tests": ["tests/assets/sample05.yea"]}],
+    indirect=True,
+)
+def test_runner_benchmark(mocked_yea_context: YeaContext, capsys):
+    yc = mocked_yea_context
+    registry = Registry(yc=yc)
+    registry.probe(tests=yc._args.tests)
+    runner = Runner(yc=yc)
+    runner.run(tests=registry.get_tests())
+    out = capsys.readouterr().out
+    assert out.count("INFO: RUNNING=") == 4
+    assert "INFO: BENCHMARK run 3" in out
+    tc = runner._results[0]
+    assert not tc.failures
+    props = {p["name"]: p["value"] for p in tc.properties}
+    assert props["yea::bench::runs"] == "3"
+    assert float(props["yea::bench::wall::median"]) == pytest.approx(
+        tc.elapsed_sec, rel=1e-4
+    )
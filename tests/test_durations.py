@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from yea import durations, jsonlhistory
+
+
+def test_compute_stats():
+    samples = [
+        durations.Sample(ts=1, elapsed=10, ok=True),
+        durations.Sample(ts=2, elapsed=12, ok=True),
+        durations.Sample(ts=3, elapsed=300, ok=False),
+        durations.Sample(ts=4, elapsed=11, ok=True),
+    ]
+    st = durations.compute_stats(samples)
+    assert st.num_samples == 3
+    assert st.median == 11
+    assert st.last == 11
+    assert st.mean == 11
+    assert 10 < st.ewma < 12
+    assert 11 < st.p90 <= 12
+
+
+def test_history_merges_workers(tmp_path):
+    history_path = tmp_path / "durations"
+    worker1 = durations.DurationHistory(history_path)
+    worker1.append([("0.a", 10.0, True), ("0.b", 5.0, True)])
+    worker2 = durations.DurationHistory(history_path)
+    worker2.append([("0.c", 1.0, True)])
+    # a truncated line and records without a usable id are skipped
+    with open(history_path / "broken.jsonl", "w") as f:
+        f.write('{"ts": 1, "elapsed": 1, "ok": true}\n')
+        f.write('{"id": {"a": 1}, "ts": 1, "elapsed": 1, "ok": true}\n')
+        f.write('{"id": "0.a", "ts"')
+
+    history = durations.DurationHistory(history_path).load()
+    assert history.estimates("median") == {"0.a": 10.0, "0.b": 5.0, "0.c": 1.0}
+
+
+def test_history_compact(tmp_path, monkeypatch):
+    monkeypatch.setattr(durations, "COMPACT_FILES", 3)
+    monkeypatch.setattr(durations, "HISTORY_WINDOW", 2)
+    history_path = tmp_path / "durations"
+    for elapsed in (1.0, 2.0, 3.0):
+        history = durations.DurationHistory(history_path).load()
+        history.append([("0.a", elapsed, True)])
+        history.compact()
+    assert [p.name for p in history_path.glob("*.jsonl")] == [durations.COMPACT_FNAME]
+    history = durations.DurationHistory(history_path).load()
+    assert history.estimates("mean") == {"0.a": 2.5}
+
+
+def test_history_compact_keeps_new_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(durations, "COMPACT_FILES", 2)
+    history_path = tmp_path / "durations"
+    history = durations.DurationHistory(history_path).load()
+    history.append([("0.a", 1.0, True)])
+    history.append([("0.a", 3.0, True)])
+    # another worker appends after we loaded
+    durations.DurationHistory(history_path).append([("0.b", 5.0, True)])
+    history.compact()
+    names = [p.name for p in history_path.glob("*.jsonl")]
+    assert names == [durations.COMPACT_FNAME]
+    history = durations.DurationHistory(history_path).load()
+    assert history.estimates("mean") == {"0.a": 2.0, "0.b": 5.0}
+
+
+def test_load_durations(tmp_path):
+    durations_path = tmp_path / ".yea_durations"
+    durations_path.write_text(json.dumps({"0.a": 100.0, "0.b": 7.0}))
+    history_path = tmp_path / "durations"
+    durations.DurationHistory(history_path).append([("0.a", 10.0, True)])
+    loaded = durations.load_durations(durations_path, history_path)
+    assert loaded == {"0.a": 10.0, "0.b": 7.0}
+
+
+def test_history_abstract(tmp_path):
+    class NoFormat(jsonlhistory.JsonlHistory):
+        def _parse(self, rec):
+            return rec["id"], (rec["ts"],)
+
+    with pytest.raises(TypeError):
+        NoFormat(tmp_path, window=1, compact_files=1)
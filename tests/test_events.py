@@ -0,0 +1,81 @@
+import json
+import os
+from unittest import mock
+
+import pytest
+
+from yea import events
+from yea.context import YeaContext
+from yea.registry import Registry
+from yea.runner import TestRunner as Runner  # not to confuse pytest
+
+
+def read_events(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_event_log_path(tmp_path):
+    path = tmp_path / "events.jsonl"
+    log = events.EventLog(str(path))
+    log.emit("one", test_id="a")
+    log.emit("two", value=path)
+    log.close()
+    recs = read_events(path)
+    assert [r["event"] for r in recs] == ["one", "two"]
+    assert recs[0]["test_id"] == "a"
+    assert recs[1]["value"] == str(path)
+    assert recs[0]["ts"] <= recs[1]["ts"]
+
+
+def test_event_log_fd():
+    rfd, wfd = os.pipe()
+    log = events.EventLog(str(wfd))
+    log.emit("one")
+    log.close()
+    os.close(wfd)
+    with os.fdopen(rfd) as f:
+        assert json.loads(f.readline())["event"] == "one"
+
+
+def test_event_log_disabled():
+    log = events.EventLog(None)
+    assert not log.enabled
+    log.emit("one")
+
+
+@pytest.mark.parametrize(
+    "mocked_yea_context",
+    [{"action": "run", "tests": ["tests/assets/sample03.py"]}],
+    indirect=True,
+)
+def test_runner_events(mocked_yea_context: YeaContext, tmp_path):
+    path = tmp_path / "events.jsonl"
+    yc = mocked_yea_context
+    yc._events = events.EventLog(str(path))
+    with mock.patch("sys.platform", "darwin"):
+        registry = Registry(yc=yc)
+        registry.probe(tests=yc._args.tests)
+        runner = Runner(yc=yc)
+        runner.run(tests=registry.get_tests())
+    recs = read_events(path)
+    assert [r["event"] for r in recs] == [
+        "discovered",
+        "selected",
+        "run_start",
+        "prep_start",
+        "prep_end",
+        "depend_start",
+        "depend_end",
+        "process_start",
+        "process_exit",
+        "check_start",
+        "check_end",
+        "result",
+        "run_end",
+    ]
+    assert recs[1]["tests"] == ["assets.sample03"]
+    assert recs[-2]["status"] == "passed"
+    assert recs[8]["exit_code"] == 0
+    ts = [r["ts"] for r in recs]
+    assert ts == sorted(ts)
@@ -0,0 +1,124 @@
+import itertools
+import math
+
+import pytest
+
+from yea import jsonlhistory, perf
+
+
+def test_u_distribution():
+    # brute force over all orderings of 3 baseline and 2 current values
+    dist = [0] * 7
+    for pos in itertools.combinations(range(5), 2):
+        u = sum(1 for c in pos for b in range(5) if b not in pos and c > b)
+        dist[u] += 1
+    assert perf.u_distribution(3, 2) == dist
+    assert sum(perf.u_distribution(20, 3)) == math.comb(23, 3)
+
+
+def test_mann_whitney_p():
+    baseline = [float(v) for v in range(1, 21)]
+    assert perf.mann_whitney_p(baseline, [100.0]) == pytest.approx(1 / 21)
+    assert perf.mann_whitney_p(baseline, [0.0]) == 1.0
+    assert 0.4 < perf.mann_whitney_p(baseline, [10.5]) < 0.6
+    # large samples use the normal approximation
+    big = [float(v % 50) for v in range(200)]
+    assert perf.mann_whitney_p(big, [v + 25 for v in big[:20]]) < 0.01
+    assert perf.mann_whitney_p(big, big[:20]) > 0.1
+
+
+def test_compare():
+    baseline = [1.0 + 0.01 * (v % 5) for v in range(20)]
+    assert perf.compare(baseline[:5], [2.0]) is None
+    cmp = perf.compare(baseline, [2.0], threshold=0.1)
+    assert cmp.regressed
+    assert cmp.change == pytest.approx(2.0 / 1.02 - 1)
+    # significant but within the threshold
+    assert not perf.compare(baseline, [1.05], threshold=0.1).regressed
+    # large but not significant against a noisy baseline
+    noisy = [1.0, 3.0] * 10
+    assert not perf.compare(noisy, [2.5], threshold=0.1).regressed
+
+
+def test_perf_config():
+    config = perf.PerfConfig.from_spec(
+        {"threshold": 0.2, "metrics": {":wandb:init::mean": 0.5, ":wandb:log": 1.0}}
+    )
+    assert config.threshold_for(":wandb:init", "mean") == 0.5
+    assert config.threshold_for(":wandb:init", "max") == 0.2
+    assert config.threshold_for(":wandb:log", "mean") == 1.0
+    assert config.alpha == perf.DEFAULT_ALPHA
+
+
+def test_perf_history(tmp_path):
+    path = tmp_path / "perf"
+    for num in range(12):
+        history = perf.PerfHistory(path).load()
+        history.record("0.a", {":wandb:init": {"mean": 1.0 + num / 100}}, ok=True)
+        history.record("0.a", {":wandb:init": {"mean": 100.0}}, ok=False)
+        history.save()
+
+    history = perf.PerfHistory(path).load()
+    key = ("0.a", ":wandb:init", "mean")
+    assert history.keys() == [key]
+    assert len(history.baseline(key)) == 12
+    checked = history.check(
+        "0.a", {":wandb:init": {"mean": 3.0, "n": "x"}}, perf.DEFAULT_CONFIG
+    )
+    assert list(checked) == [key]
+    assert checked[key].regressed
+
+    lines = perf.report(history)
+    assert "metric" in lines[0]
+    assert "0.a :wandb:init::mean" in lines[1]
+    assert perf.report(history, prefixes=["0.b"]) == []
+
+
+def test_min_baseline(capsys):
+    assert perf.min_baseline(0.1) == perf.MIN_BASELINE
+    assert perf.min_baseline(0.02) == 50
+    baseline = [1.0 + 0.01 * v for v in range(20)]
+    # alpha 0.02 can not be reached against 20 values
+    assert perf.compare(baseline, [2.0], alpha=0.02) is None
+    config = perf.PerfConfig.from_spec({"alpha": 0.02})
+    assert config.baseline == perf.DEFAULT_BASELINE
+    assert "needs a baseline of 50" in capsys.readouterr().out
+    perf.PerfConfig.from_spec({"alpha": 0.02, "baseline": 50})
+    assert capsys.readouterr().out == ""
+
+
+def test_perf_accept(tmp_path):
+    key = ("0.a", ":wandb:init", "mean")
+    good = [perf.PerfSample(ts, 1.0, True) for ts in range(12)]
+    slow = [perf.PerfSample(ts, 2.0, False) for ts in range(12, 16)]
+    assert perf.baseline_values(good + slow, accept=5) == [1.0] * 12
+    # one more regression accepts the new level
+    slow.append(perf.PerfSample(16, 2.0, False))
+    assert perf.baseline_values(good + slow, accept=5) == [2.0] * 5
+    assert perf.baseline_values(good + slow, accept=0) == [1.0] * 12
+    # and good runs at the new level add to it
+    new = [perf.PerfSample(ts, 2.1, True) for ts in range(17, 20)]
+    assert perf.baseline_values(good + slow + new, accept=5) == [2.0] * 5 + [2.1] * 3
+    assert perf.baseline_values(good + slow + new, size=4) == [2.0] + [2.1] * 3
+
+    history = perf.PerfHistory(tmp_path)
+    history._samples[key] = good + slow
+    config = perf.PerfConfig.from_spec({})
+    # too few values at the new level to compare against
+    assert history.check("0.a", {":wandb:init": {"mean": 2.0}}, config) == {}
+
+
+def test_perf_history_compact(tmp_path, monkeypatch):
+    monkeypatch.setattr(perf, "COMPACT_FILES", 3)
+    monkeypatch.setattr(perf, "HISTORY_WINDOW", 2)
+    path = tmp_path / "perf"
+    for num in range(3):
+        history = perf.PerfHistory(path).load()
+        history.record("0.a", {":wandb:init": {"mean": float(num)}}, ok=True)
+        history.save()
+    assert [p.name for p in path.glob("*.jsonl")] == [jsonlhistory.COMPACT_FNAME]
+    history = perf.PerfHistory(path).load()
+    assert [s.value for s in history.samples(("0.a", ":wandb:init", "mean"))] == [
+        1.0,
+        2.0,
+    ]
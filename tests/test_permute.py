@@ -0,0 +1,118 @@
+import itertools
+
+import pytest
+
+from yea import permute
+from yea.context import YeaContext
+from yea.registry import Registry
+
+
+def covered(sizes, tnums, strength):
+    rows = [permute.decode(sizes, tnum) for tnum in tnums]
+    for cols in itertools.combinations(range(len(sizes)), strength):
+        seen = {tuple(row[c] for c in cols) for row in rows}
+        if len(seen) != len([*itertools.product(*[range(sizes[c]) for c in cols])]):
+            return False
+    return True
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        (None, permute.Strategy("full")),
+        ("full", permute.Strategy("full")),
+        ("pairwise", permute.Strategy("nwise", strength=2)),
+        ("nwise(3)", permute.Strategy("nwise", strength=3)),
+        ("sample(10)", permute.Strategy("sample", size=10)),
+        ("sample(10, 7)", permute.Strategy("sample", size=10, seed=7)),
+    ],
+)
+def test_parse_strategy(text, expected):
+    assert permute.parse_strategy(text) == expected
+
+
+@pytest.mark.parametrize("text", ["random", "nwise(0)", "sample()", "nwise(2"])
+def test_parse_strategy_error(text):
+    with pytest.raises(ValueError):
+        permute.parse_strategy(text)
+
+
+def test_encode_matches_product():
+    sizes = [2, 3, 4]
+    rows = itertools.product(*[range(s) for s in sizes])
+    for tnum, row in enumerate(rows):
+        assert permute.encode(sizes, row) == tnum
+        assert permute.decode(sizes, tnum) == row
+
+
+@pytest.mark.parametrize(
+    "sizes, strength, max_rows",
+    [([5] * 5, 2, 40), ([2] * 10, 2, 15), ([3, 4, 2, 3], 3, 60), ([4, 4], 2, 16)],
+)
+def test_select_nwise(sizes, strength, max_rows):
+    tnums = permute.select(sizes, f"nwise({strength})")
+    assert covered(sizes, tnums, strength)
+    assert len(tnums) <= max_rows
+    assert tnums == sorted(set(tnums))
+    assert tnums == permute.select(sizes, f"nwise({strength})")
+
+
+def test_select_sample():
+    tnums = permute.select([5] * 5, "sample(20, 3)")
+    assert len(tnums) == 20
+    assert tnums == permute.select([5] * 5, "sample(20, 3)")
+    assert tnums != permute.select([5] * 5, "sample(20, 4)")
+    assert len(permute.select([2, 2], "sample(20)")) == 4
+
+
+@pytest.mark.parametrize(
+    "mocked_yea_context",
+    [{"action": "list", "tests": ["tests/assets/sample04.yea"]}],
+    indirect=True,
+)
+def test_registry_pairwise(mocked_yea_context: YeaContext):
+    registry = Registry(yc=mocked_yea_context)
+    registry.probe(tests=mocked_yea_context._args.tests)
+    tests = registry.get_tests()
+    assert 9 <= len(tests) < 3**4
+    tnums = sorted(int(t._permute_id.split("-")[0]) for t in tests)
+    assert tnums == permute.select([3, 3, 3, 3], "pairwise")
+    for t in tests:
+        tnum = int(t._permute_id.split("-")[0])
+        row = permute.decode([3, 3, 3, 3], tnum)
+        assert t._permute_items[3] == row[3] + 1
+
+
+@pytest.mark.parametrize(
+    "mocked_yea_context",
+    [
+        {
+            "action": "list",
+            "tests": ["tests/assets/sample04.yea"],
+            "select": ":yea:mode=offline and :yea:level=2",
+        }
+    ],
+    indirect=True,
+)
+def test_registry_pairwise_select(mocked_yea_context: YeaContext):
+    registry = Registry(yc=mocked_yea_context)
+    registry.probe(tests=mocked_yea_context._args.tests)
+    tests = registry.get_tests()
+    assert tests
+    for t in tests:
+        assert t._permute_items[2:] == ("offline", 2)
+
+
+@pytest.mark.parametrize(
+    "mocked_yea_context",
+    [{"action": "list", "tests": ["tests/assets/sample04.yea"]}],
+    indirect=True,
+)
+def test_permutations_share_spec(mocked_yea_context: YeaContext):
+    registry = Registry(yc=mocked_yea_context)
+    registry.probe(tests=mocked_yea_context._args.tests)
+    first, second = registry.get_tests()[:2]
+    assert not hasattr(first, "__dict__")
+    assert first.config is second.config
+    assert first._yearc_list is second._yearc_list
+    assert first.test_id != second.test_id
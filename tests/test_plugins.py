@@ -0,0 +1,174 @@
+import subprocess
+import sys
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from yea import timing
+from yea.context import YeaContext
+from yea.registry import Registry
+from yea.result import ResultData
+from yea.runner import TestRunner as Runner  # not to confuse pytest
+
+
+class FakePlugin:
+    def __init__(self, name):
+        self.name = self._name = name
+        self.calls = []
+
+    def __getattr__(self, hook):
+        def call(*args, **kwargs):
+            self.calls.append(hook)
+
+        return call
+
+
+def run_with_plugins(yc, plugins):
+    yc._plugs._plugin_list = plugins
+    with mock.patch("sys.platform", "darwin"):
+        registry = Registry(yc=yc)
+        registry.probe(tests=yc._args.tests)
+        tests = registry.get_tests()
+        for t in tests:
+            t._test_cfg["plugin"] = ["used"]
+        runner = Runner(yc=yc)
+        runner.run(tests=tests)
+    return runner
+
+
+@pytest.mark.parametrize(
+    "mocked_yea_context",
+    [{"action": "run", "tests": ["tests/assets/sample03.py"]}],
+    indirect=True,
+)
+def test_plugin_hook_times(mocked_yea_context: YeaContext, capsys):
+    used, unused = FakePlugin("used"), FakePlugin("unused")
+    runner = run_with_plugins(mocked_yea_context, [used, unused])
+    assert used.calls == [
+        "monitors_init",
+        "monitors_start",
+        "monitors_reset",
+        "monitors_start_test",
+        "test_prep",
+        "test_done",
+        "test_check",
+        "monitors_stop",
+    ]
+    assert unused.calls == ["test_prep", "test_done"]
+    props = {p["name"] for p in runner._results[0].properties}
+    assert "yea::plugin::used::test_check" in props
+    assert "yea::plugin::unused::test_prep" in props
+    out = capsys.readouterr().out
+    assert "Plugin hooks (sec):" in out
+    assert "used::monitors_init" in out
+
+
+@pytest.mark.parametrize(
+    "mocked_yea_context",
+    [
+        {
+            "action": "run",
+            "tests": ["tests/assets/sample03.py"],
+            "declared_plugins_only": True,
+        }
+    ],
+    indirect=True,
+)
+def test_declared_plugins_only(mocked_yea_context: YeaContext):
+    used, unused = FakePlugin("used"), FakePlugin("unused")
+    run_with_plugins(mocked_yea_context, [used, unused])
+    assert "test_prep" in used.calls
+    assert unused.calls == []
+
+
+class CheckPlugin(FakePlugin):
+    def __init__(self, name, delay, thread_safe=True):
+        super().__init__(name)
+        self.delay = delay
+        self.thread_safe = thread_safe
+        self.thread = None
+
+    def test_check(self, yt, debug=False):
+        self.thread = threading.current_thread()
+        time.sleep(self.delay)
+        res = ResultData()
+        res.failures.append(self.name)
+        return res
+
+
+@pytest.mark.parametrize(
+    "mocked_yea_context",
+    [{"action": "run", "check_timeout": 0.5}],
+    indirect=True,
+)
+def test_concurrent_check(mocked_yea_context: YeaContext, capsys):
+    plugs = mocked_yea_context._plugs
+    checks = [
+        CheckPlugin("a", 0.2),
+        # longer than the timeout since the start, but not since its wait
+        CheckPlugin("b", 0.7),
+        CheckPlugin("c", 0.4, thread_safe=False),
+        CheckPlugin("d", 3.0),
+        CheckPlugin("e", 3.0),
+    ]
+    plugs._plugin_list = checks
+    plugs._plugs_needed = {"a", "b", "c", "d", "e"}
+    yt = mock.Mock(config={"plugin": ["a", "b", "c", "d", "e"]}, test_id="t0")
+    yt._plugin_times = timing.PhaseTimer()
+    start = time.monotonic()
+    results = plugs.test_check(yt)
+    # hung checks share one deadline
+    assert time.monotonic() - start < 1.4
+    assert [r.failures for r in results] == [
+        ["a"],
+        ["b"],
+        ["c"],
+        ["CHECK_TIMEOUT(d:0.5s)"],
+        ["CHECK_TIMEOUT(e:0.5s)"],
+    ]
+    assert checks[2].thread is threading.current_thread()
+    assert checks[0].thread is not threading.current_thread()
+    assert "WARNING: plugin d still checking t0" in capsys.readouterr().out
+    assert [plugs._hook_stats[f"{p}::test_check"].calls for p in "abc"] == [1, 1, 1]
+
+    # d is not used again while its check of t0 runs
+    yt1 = mock.Mock(config={"plugin": ["a", "d"]}, test_id="t1")
+    yt1._plugin_times = timing.PhaseTimer()
+    plugs.monitors_reset(yt1)
+    assert "WARNING: skipping d::monitors_reset" in capsys.readouterr().out
+    assert [r.failures for r in plugs.test_check(yt1)] == [["a"], ["CHECK_BUSY(d)"]]
+
+
+HANGING_CHECK = """\
+import threading, time
+from types import SimpleNamespace
+from yea import plugins, timing
+
+class Hang:
+    name = _name = "hang"
+    def test_check(self, yt, debug=False):
+        time.sleep(30)
+
+args = SimpleNamespace(check_timeout=0.2, debug=False)
+plugs = plugins.Plugins(SimpleNamespace(_args=args))
+plugs._plugin_list = [Hang()]
+plugs._plugs_needed = {"hang"}
+yt = SimpleNamespace(config={"plugin": ["hang"]}, test_id="t0")
+yt._plugin_times = timing.PhaseTimer()
+print(plugs.test_check(yt)[0].failures)
+"""
+
+
+def test_hanging_check_exits():
+    start = time.monotonic()
+    p = subprocess.run(
+        [sys.executable, "-c", HANGING_CHECK],
+        stdout=subprocess.PIPE,
+        text=True,
+        timeout=20,
+        check=True,
+    )
+    assert "CHECK_TIMEOUT(hang:0.2s)" in p.stdout
+    assert time.monotonic() - start < 10
@@ -0,0 +1,50 @@
+import pstats
+
+from yea import profiler
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+def outer():
+    return busy(20000) + busy(20000)
+
+
+def test_harness_profiler(tmp_path, capsys):
+    prof = profiler.HarnessProfiler("cpu")
+    with prof.phase("run"):
+        outer()
+        with prof.phase("finish"):
+            busy(1000)
+    prof.report(tmp_path)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "finish.pstats",
+        "harness.collapsed",
+        "run.pstats",
+    ]
+    funcs = {f[2] for f in pstats.Stats(str(tmp_path / "run.pstats")).stats}
+    assert "outer" in funcs
+    # the nested phase is not counted in the enclosing one
+    funcs = {f[2] for f in pstats.Stats(str(tmp_path / "finish.pstats")).stats}
+    assert "outer" not in funcs
+
+    lines = (tmp_path / "harness.collapsed").read_text().splitlines()
+    stacks = [line.rsplit(" ", 1) for line in lines]
+    assert all(int(count) > 0 for _, count in stacks)
+    assert any(
+        stack.startswith("phase:run;") and "outer (" in stack and "busy (" in stack
+        for stack, _ in stacks
+    )
+    out = capsys.readouterr().out
+    assert "Harness profile" in out
+    assert "Top 15 functions" in out
+
+
+def test_harness_profiler_disabled(tmp_path):
+    prof = profiler.HarnessProfiler(None)
+    with prof.phase("run"):
+        busy(10)
+    prof.report(tmp_path / "out")
+    assert not (tmp_path / "out").exists()
@@ -0,0 +1,71 @@
+import io
+import time
+from unittest import mock
+
+from yea import progress
+
+
+class TtyStream(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def test_format_seconds():
+    assert progress.format_seconds(12.4) == "12s"
+    assert progress.format_seconds(200) == "3m20s"
+    assert progress.format_seconds(3 * 3600 + 120) == "3h02m"
+
+
+def test_eta():
+    p = progress.Progress(["a", "b", "c"], mode="off")
+    assert p.eta() is None
+    assert p.status().endswith("ETA ?")
+
+    p = progress.Progress(["a", "b", "c"], {"a": 10.0, "b": 20.0}, mode="off")
+    # c has no history, it is assumed to take the average
+    assert p.eta() == 45.0
+    with mock.patch("time.monotonic", return_value=100.0):
+        p.test_start("a")
+    assert p.eta(now=104.0) == 41.0
+    # c has no history, so the ETA is approximate
+    assert p.status(now=104.0) == "[0/3] 0 passed | a 4s/~10s | ETA ~41s"
+    with mock.patch("time.monotonic", return_value=130.0):
+        p.test_done("a", ok=False)
+    # c is now assumed to take as long as the completed tests
+    assert p.eta() == 50.0
+    assert p.status().startswith("[1/3] 0 passed, 1 failed | ETA")
+
+
+def test_render_modes():
+    stream = io.StringIO()
+    p = progress.Progress(["a"], mode="auto", stream=stream)
+    assert p._mode == "line"
+    with mock.patch.object(p, "_interval", 0.01):
+        p.start()
+        time.sleep(0.1)
+        p.stop()
+    assert stream.getvalue().startswith("PROGRESS: [0/1] 0 passed | ETA ?\n")
+
+    # tests write to the terminal too, periodic lines unless asked for more
+    p = progress.Progress(["a"], mode="auto", stream=TtyStream())
+    assert p.enabled and p._mode == "line"
+
+    stream = TtyStream()
+    p = progress.Progress(["a"], mode="tty", stream=stream)
+    p.start()
+    p.test_start("a")
+    p.stop()
+    out = stream.getvalue()
+    assert out.startswith("\r\x1b[K[0/1] 0 passed | a 0s")
+    assert out.endswith("\r\x1b[K")
+
+
+def test_eta_approximate():
+    estimates = {"a": 10.0, "b": 20.0}
+    p = progress.Progress(["a", "b"], estimates, mode="off")
+    assert p.status() == "[0/2] 0 passed | ETA 30s"
+    p = progress.Progress(["a", "b"], estimates, mode="off", imputed={"b": "dir"})
+    assert p.status() == "[0/2] 0 passed | ETA ~30s"
+    p.test_start("b")
+    p.test_done("b", ok=True)
+    assert not p.approximate()
@@ -0,0 +1,68 @@
+from unittest import mock
+
+import pytest
+
+from yea import resultsdb
+from yea.context import YeaContext
+from yea.registry import Registry
+from yea.runner import TestRunner as Runner  # not to confuse pytest
+
+
+def record(test_id, ok=True, elapsed=1.0, profile=None):
+    return resultsdb.TestRecord(
+        test_id=test_id,
+        ok=ok,
+        elapsed=elapsed,
+        failures=[] if ok else ["BAD"],
+        phases={"process": elapsed},
+        profile=profile or {},
+        cpu=elapsed / 2,
+        maxrss=2**20,
+    )
+
+
+def test_results_db(tmp_path):
+    db = resultsdb.ResultsDB(tmp_path / resultsdb.DB_FNAME)
+    for num in range(4):
+        info = resultsdb.RunInfo(ts=num, platform="linux", argv=["yea"], wall=5.0)
+        db.record_run(
+            info,
+            [
+                record("0.a", elapsed=1.0 + num, profile={":m": {"mean": num}}),
+                record("0.b", ok=bool(num % 2), elapsed=3.0),
+                record("1.c", elapsed=0.5),
+            ],
+        )
+
+    assert [s[0] for s in db.slowest()] == ["0.b", "0.a", "1.c"]
+    assert db.slowest(runs=2, prefixes=["0.a"]) == [("0.a", 2, 3.5, 4.0)]
+    assert db.flaky() == [("0.b", 4, 2, 3)]
+    assert db.trend(prefixes=["0.a"]) == [("0.a", [1.0, 2.0, 3.0, 4.0])]
+    assert db.trend(metric="phase::process", prefixes=["1."]) == [("1.c", [0.5] * 4)]
+    assert db.trend(metric=":m::mean") == [("0.a", [0.0, 1.0, 2.0, 3.0])]
+    db.close()
+
+
+def test_sparkline():
+    assert resultsdb.sparkline([1.0, 1.0]) == "▁▁"
+    assert resultsdb.sparkline([0.0, 1.0, 2.0]) == "▁▄█"
+
+
+@pytest.mark.parametrize(
+    "mocked_yea_context",
+    [{"action": "run", "tests": ["tests/assets/sample03.py"]}],
+    indirect=True,
+)
+def test_runner_results_db(mocked_yea_context: YeaContext, tmp_path):
+    yc = mocked_yea_context
+    yc._cachedir = tmp_path
+    with mock.patch("sys.platform", "darwin"):
+        registry = Registry(yc=yc)
+        registry.probe(tests=yc._args.tests)
+        runner = Runner(yc=yc)
+        runner.run(tests=registry.get_tests())
+    db = resultsdb.ResultsDB(yc._cachedir / resultsdb.DB_FNAME)
+    elapsed = runner._results[0].elapsed_sec
+    assert db.trend() == [("assets.sample03", [elapsed])]
+    assert db.trend(metric="cpu")
+    db.close()
@@ -1,10 +1,14 @@
+import os
 import pathlib
+import time
+import xml.etree.ElementTree as ET
 from unittest import mock
 
 import pytest
 
 from yea.context import YeaContext
 from yea.registry import Registry
+from yea.runner import YEADOC_GC_AGE, junit_xml
 from yea.runner import TestRunner as Runner  # not to confuse pytest
 
 
@@ -85,3 +89,99 @@ def test_runner_run(mocked_yea_context: YeaContext, capsys):
         assert "😃" in captured
         assert "Test durations (sec):" in captured
         assert "SystemExit: 0" in captured
+
+
+@pytest.mark.parametrize(
+    "mocked_yea_context",
+    [{"action": "run"}],
+    indirect=True,
+)
+def test_runner_yeadoc_materialize(mocked_yea_context: YeaContext, tmp_path):
+    runner = Runner(yc=mocked_yea_context)
+    runner._tmpdir = tmp_path / ".yeadoc"
+    runner._tmpdir.mkdir()
+    spec = tmp_path / "t1_doc.yea"
+    spec.write_text("id: doc\n")
+
+    py_fname = runner._yeadoc_materialize(spec, "print('yea')\n")
+    assert py_fname.name == "t1_doc.py"
+    assert py_fname.read_text() == "print('yea')\n"
+    assert py_fname.with_suffix(".yea").read_text() == "id: doc\n"
+
+    # same content is shared, new content gets a new entry
+    assert runner._yeadoc_materialize(spec, "print('yea')\n") == py_fname
+    other = runner._yeadoc_materialize(spec, "print('nope')\n")
+    assert other.parent != py_fname.parent
+    assert sorted(p.name for p in runner._tmpdir.iterdir()) == sorted(
+        [py_fname.parent.name, other.parent.name]
+    )
+    # shared entries are read-only, tests run from a copy owned by the run
+    assert py_fname.parent.stat().st_mode & 0o777 == 0o555
+    assert py_fname.stat().st_mode & 0o777 == 0o444
+    work = runner._yeadoc_workdir(py_fname)
+    assert work.read_text() == "print('yea')\n"
+    assert work.parent.parent.parent == runner._tmpdir
+    work.with_name("wandb").mkdir()
+    assert runner._yeadoc_workdir(py_fname) == work
+    runner.clean()
+    assert not work.parent.parent.exists()
+    assert py_fname.exists()
+
+    # old entries are still collected
+    old = time.time() - YEADOC_GC_AGE - 1
+    os.utime(other.parent, (old, old))
+    runner._yeadoc_gc()
+    assert not other.parent.exists()
+
+
+def test_incremental_report_writer(tmp_path):
+    p = tmp_path / "junit.xml"
+    writer = junit_xml.IncrementalReportWriter(p, "yea-func")
+    assert ET.parse(p).getroot().get("tests") == "0"
+    cases = []
+    for num in range(3):
+        tc = junit_xml.TestCase(f"t{num}", classname="yea_func", elapsed_sec=1.0)
+        if num == 1:
+            tc.add_failure_info(message="BAD_thing")
+        tc.add_property(name="m::mean", value=0.5)
+        writer.add(tc)
+        cases.append(tc)
+        # the report is complete after every test
+        root = ET.parse(p).getroot()
+        assert root.get("tests") == str(num + 1)
+        assert len(root[0]) == num + 1
+    writer.close()
+
+    root = ET.parse(p).getroot()
+    expected = ET.fromstring(
+        junit_xml.to_xml_report_string(
+            [junit_xml.TestSuite("yea-func", cases)], prettyprint=False
+        )
+    )
+    assert root.attrib == expected.attrib
+    assert root[0].attrib == expected[0].attrib
+    for case, expected_case in zip(root[0], expected[0]):
+        case.tail = None
+        assert ET.tostring(case) == ET.tostring(expected_case)
+
+
+def test_incremental_report_writer_steps(tmp_path):
+    p = tmp_path / "junit.xml"
+    writer = junit_xml.IncrementalReportWriter(p, "yea-func")
+    write_at = writer._write_at
+    steps = []
+
+    def checked_write_at(offset, data):
+        write_at(offset, data)
+        # the run may be killed after any write
+        steps.append(len(ET.parse(p).getroot()[0]))
+
+    writer._write_at = checked_write_at
+    for num in range(3):
+        tc = junit_xml.TestCase(f"t{num}", classname="yea_func", elapsed_sec=1.0)
+        # larger than any write buffer
+        tc.stdout = "x" * 2**20
+        writer.add(tc)
+    writer.close()
+    assert steps == [1, 1, 2, 2, 3, 3]
+    assert ET.parse(p).getroot().get("tests") == "3"
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+
+import yea
+from yea import runtime
+
+# modules a test process must not pay for unless it asks for them
+HEAVY_MODULES = ("requests", "urllib3", "http.client", "ssl", "multiprocessing")
+# generous, only catches an import of something heavy sneaking back
+IMPORT_BUDGET_US = 200_000
+
+CHILD = """\
+import sys
+import yea
+yea.setup()
+yea.get_params()
+yea.get_profile()
+print(",".join(m for m in {heavy} if m in sys.modules))
+"""
+
+
+def _child_env():
+    return {k: v for k, v in os.environ.items() if not k.startswith("YEA_")}
+
+
+def _import_times(stderr):
+    """Return the cumulative -X importtime microseconds by module."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_child_imports():
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(heavy=HEAVY_MODULES)],
+        env=_child_env(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    assert p.stdout.strip() == ""
+    assert _import_times(p.stderr)["yea"] < IMPORT_BUDGET_US
+
+
+def test_trigger_loads_client():
+    p = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, yea; yea.trigger('t0'); yea.flush();"
+            " print('yea._trigger' in sys.modules)",
+        ],
+        env=_child_env(),
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    assert p.stdout.strip() == "True"
+
+
+def test_exports():
+    assert set(yea.__all__) == set(runtime.__all__)
+    for name in runtime.__all__:
+        assert getattr(yea, name) is getattr(runtime, name)
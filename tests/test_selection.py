@@ -0,0 +1,87 @@
+import pytest
+
+from yea import selection
+from yea.context import YeaContext
+from yea.registry import Registry
+
+ATTRS = {
+    "id": ["tests.0.sample.2-spawn"],
+    "suite": ["main"],
+    "shard": ["default"],
+    "plugin": ["wandb"],
+    "platform": [],
+    "param": ["spawn"],
+    ":yea:start_method": ["spawn"],
+}
+
+
+@pytest.mark.parametrize(
+    "expr, expected",
+    [
+        ("wandb", True),
+        ("slow", False),
+        ("wandb and not slow and id~0.sample.*", True),
+        ("not (wandb or slow)", False),
+        ("slow or plugin=wandb", True),
+        (":yea:start_method=fork", False),
+        ("param=spawn and shard=default", True),
+        ("sample", True),
+        ("id~^0", False),
+        ("id~'sample\\.(1|2)' and (wandb)", True),
+        ('id~"(x|y)"', False),
+        ('":yea:start_method"="spawn"', True),
+        ("'wandb' or 'and'", True),
+        ("param='a b'", False),
+    ],
+)
+def test_compile_expression(expr, expected):
+    matcher = selection.compile_expression(expr)
+    assert matcher(ATTRS) == expected
+
+
+@pytest.mark.parametrize(
+    "expr", ["", "wandb and", "(wandb", "wandb)", "id~(", "id~'(", "id=''"]
+)
+def test_compile_expression_error(expr):
+    with pytest.raises(selection.SelectionError):
+        selection.compile_expression(expr)
+
+
+@pytest.mark.parametrize(
+    "mocked_yea_context",
+    [
+        {
+            "action": "run",
+            "tests": ["tests/assets/sample02.yea", "tests/assets/sample03.py"],
+            "select": "sample03",
+        }
+    ],
+    indirect=True,
+)
+def test_registry_select(mocked_yea_context: YeaContext, tmp_path):
+    mocked_yea_context._cachedir = tmp_path
+    registry = Registry(yc=mocked_yea_context)
+    registry.probe(tests=mocked_yea_context._args.tests)
+    assert [t.test_id for t in registry.get_tests()] == ["assets.sample03"]
+    assert (tmp_path / "select-index.json").exists()
+
+
+@pytest.mark.parametrize("mocked_yea_context", [{"action": "run"}], indirect=True)
+def test_index_root_yearc(mocked_yea_context: YeaContext, tmp_path, monkeypatch):
+    root = tmp_path / "root"
+    tname = root / "tests" / "t_sample.py"
+    tname.parent.mkdir(parents=True)
+    tname.write_text("")
+    (root / ".yearc").write_text("[yea]\nroot = true\n")
+    mocked_yea_context._cachedir = tmp_path
+    monkeypatch.setattr(mocked_yea_context._cfg, "_cfroot", root)
+    index = selection.TestIndex(yc=mocked_yea_context)
+    built = []
+    monkeypatch.setattr(index, "_build", lambda t: built.append(t) or {"id": "x"})
+    index.get(tname)
+    index.get(tname)
+    assert len(built) == 1
+    # ids and paths come from the root config
+    (root / ".yearc").write_text("[yea]\nroot = true\ntest_paths = tests/\n")
+    index.get(tname)
+    assert len(built) == 2
@@ -0,0 +1,104 @@
+import errno
+import json
+from unittest import mock
+
+import pytest
+
+from yea import _setup
+from yea.context import YeaContext
+from yea.registry import Registry
+
+
+@pytest.fixture
+def context_file(tmp_path, monkeypatch):
+    path = tmp_path / "context.json"
+    monkeypatch.setenv("YEA_CONTEXT_FILE", str(path))
+    _setup._load_context.cache_clear()
+    yield path
+    _setup._load_context.cache_clear()
+
+
+def test_context_file(context_file):
+    ctx = dict(
+        version=1,
+        params={":yea:start_method": "spawn", ":yea:tags": "a,b", ":yea:level": 2},
+        profile=dict(file="/tmp/prof", vars={":wandb:init": {"count": 2}}),
+        trigger=[":wandb:crash"],
+        plugins=[],
+        plugin_vars={"wandb": {"runs": 3}},
+    )
+    context_file.write_text(json.dumps(ctx))
+    # commas in values no longer split parameters
+    assert _setup._setup_params()[":yea:tags"] == "a,b"
+    assert _setup._setup_params()[":yea:level"] == "2"
+    assert _setup.get_params()[":yea:level"] == 2
+    assert _setup._setup_profile() == ("/tmp/prof", {":wandb:init": {"count": 2}})
+    assert _setup._setup_trigger() == [":wandb:crash"]
+    assert _setup.get_plugin_vars("wandb") == {"runs": 3}
+    assert _setup.get_plugin_vars("other") == {}
+
+
+def test_env_fallback(context_file, monkeypatch):
+    # no file was written, the env vars are used
+    monkeypatch.setenv("YEA_PARAM_NAMES", ":yea:a,:yea:b")
+    monkeypatch.setenv("YEA_PARAM_VALUES", "1,2")
+    monkeypatch.setenv("YEA_PLUGIN_WANDB_NAMES", "runs")
+    monkeypatch.setenv("YEA_PLUGIN_WANDB_VALUES", "[3]")
+    assert _setup.get_params() == {":yea:a": "1", ":yea:b": "2"}
+    assert _setup.get_plugin_vars("wandb") == {"runs": 3}
+
+
+@pytest.mark.parametrize(
+    "mocked_yea_context",
+    [{"action": "run", "tests": ["tests/assets/sample04.yea"]}],
+    indirect=True,
+)
+def test_write_context(mocked_yea_context: YeaContext):
+    yc = mocked_yea_context
+    registry = Registry(yc=yc)
+    registry.probe(tests=yc._args.tests)
+    t = registry.get_tests()[0]
+    written = {}
+
+    def run_measured(cmd_list, env, **kwargs):
+        with open(env["YEA_CONTEXT_FILE"]) as f:
+            written.update(json.load(f))
+        return 0, mock.Mock(wall=0.0, cpu=None, maxrss=None)
+
+    with mock.patch("yea.ytest.run_measured", run_measured):
+        t._run()
+    assert written["test_id"] == t.test_id
+    assert written["params"] == {
+        ":yea:start_method": "fork",
+        ":yea:backend": "a",
+        ":yea:mode": "online",
+        ":yea:level": 1,
+    }
+    assert written["plugins"] == []
+    assert not list(yc._cachedir.glob(".context-*"))
+
+
+@pytest.mark.parametrize(
+    "mocked_yea_context",
+    [{"action": "run", "tests": ["tests/assets/sample06.yea"]}],
+    indirect=True,
+)
+def test_plugin_env_too_large(mocked_yea_context: YeaContext, capsys):
+    yc = mocked_yea_context
+    registry = Registry(yc=yc)
+    registry.probe(tests=yc._args.tests)
+    t = registry.get_tests()[0]
+    envs = []
+
+    def run_measured(cmd_list, env, **kwargs):
+        envs.append(dict(env))
+        if len(envs) == 1:
+            raise OSError(errno.E2BIG, "Argument list too long")
+        return 0, mock.Mock(wall=0.0, cpu=None, maxrss=None)
+
+    with mock.patch("yea.ytest.run_measured", run_measured):
+        t._run()
+    assert envs[0]["YEA_PLUGIN_FAKE_VALUES"] == "[3]"
+    assert "YEA_PLUGIN_FAKE_VALUES" not in envs[1]
+    assert "YEA_CONTEXT_FILE" in envs[1]
+    assert "WARNING: environment too large" in capsys.readouterr().out
@@ -0,0 +1,97 @@
+from array import array
+from typing import NamedTuple
+
+from yea import split
+
+
+class Item(NamedTuple):
+    nodeid: str
+
+
+def make_items(durations):
+    items = [Item(nodeid=f"t{i}") for i in range(len(durations))]
+    return items, {item.nodeid: d for item, d in zip(items, durations)}
+
+
+def test_least_duration_greedy():
+    items, durations = make_items([8, 7, 6, 5, 4])
+    groups = split.least_duration(2, items, durations, refine_steps=0)
+    assert [g.duration for g in groups] == [17, 13]
+    assert [len(g.selected) + len(g.deselected) for g in groups] == [5, 5]
+
+
+def test_least_duration_refined():
+    items, durations = make_items([8, 7, 6, 5, 4])
+    groups = split.least_duration(2, items, durations)
+    assert sorted(g.duration for g in groups) == [15, 15]
+    assert split.imbalance(groups) == 0
+    # selected items keep their original order
+    for g in groups:
+        assert g.selected == sorted(g.selected, key=items.index)
+        assert set(g.selected).isdisjoint(g.deselected)
+    assert groups == split.least_duration(2, items, durations)
+
+
+def test_refine_budget():
+    # many more candidates per scan than the budget, moves still get applied
+    n, splits = 4000, 8
+    durs = array("d", [1.0 + (num * 7919 % 1000) / 100 for num in range(n)])
+    assign = array("i", [0] * (n // 2) + [num % splits for num in range(n // 2)])
+    loads = [0.0] * splits
+    for d, g in zip(durs, assign):
+        loads[g] += d
+    greedy = array("i", assign)
+    refined = split._refine(durs, assign, loads, max_steps=20 * n)
+    assert max(refined) < max(loads)
+    assert sum(1 for a, b in zip(greedy, assign) if a != b) >= 5
+
+
+class RelatedItem(NamedTuple):
+    nodeid: str
+    base_id: str
+    directory: str
+
+    def duration_relatives(self):
+        return [("sibling", self.base_id), ("directory", self.directory)]
+
+
+def test_impute_durations():
+    items = [
+        RelatedItem("0.a.0-fork", "0.a", "a"),
+        RelatedItem("0.a.1-spawn", "0.a", "a"),
+        RelatedItem("0.b", "0.b", "a"),
+        RelatedItem("1.c", "1.c", "c"),
+        RelatedItem("2.d", "2.d", "d"),
+        RelatedItem("2.e", "2.e", "d"),
+    ]
+    durations = {"0.a.0-fork": 180.0, "1.c": 2.0, "2.d": 10.0}
+    completed, imputed = split.impute_durations(items, durations)
+    assert completed["0.a.1-spawn"] == 180.0
+    assert completed["0.b"] == 180.0
+    assert completed["2.e"] == 10.0
+    assert imputed == {
+        "0.a.1-spawn": "sibling",
+        "0.b": "directory",
+        "2.e": "directory",
+    }
+
+    completed, imputed = split.impute_durations(items[3:], {"1.c": 2.0})
+    assert completed["2.d"] == 2.0
+    assert imputed == {"2.d": "average", "2.e": "average"}
+
+
+def test_select_group_hash():
+    items, durations = make_items([1.0] * 2000)
+    groups8 = [split.hash_group(item.nodeid, 8) for item in items]
+    groups9 = [split.hash_group(item.nodeid, 9) for item in items]
+    # balanced without any durations
+    counts = [groups8.count(g) for g in range(8)]
+    assert min(counts) > 200 and max(counts) < 300
+    # only tests moving to the new group change
+    moved = [(a, b) for a, b in zip(groups8, groups9) if a != b]
+    assert all(b == 8 for _, b in moved)
+    assert len(moved) < 2000 / 9 * 1.25
+
+    group, loads = split.select_group(8, 3, items, {}, strategy="hash")
+    assert len(group.selected) == counts[3]
+    assert loads == [float(c) for c in counts]
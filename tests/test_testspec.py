@@ -0,0 +1,35 @@
+import pytest
+import yaml
+
+from yea import testspec
+
+
+@pytest.fixture(autouse=True)
+def clear_yaml_cache():
+    testspec._yaml_cache.clear()
+    yield
+    testspec._yaml_cache.clear()
+
+
+def test_load_yaml_cached_copy():
+    spec = "id: 0.0.1\ntag:\n  shard: default\n"
+    first = testspec.load_yaml_from_str(spec)
+    first["tag"]["suite"] = "nightly"
+    second = testspec.load_yaml_from_str(spec)
+    assert second == {"id": "0.0.1", "tag": {"shard": "default"}}
+    assert len(testspec._yaml_cache) == 1
+
+
+@pytest.mark.parametrize("loader", [yaml.SafeLoader, testspec.SafeLoader])
+@pytest.mark.parametrize(
+    "spec",
+    [
+        "id: [0.0.1",  # parser error
+        "id: 'unterminated\n",  # scanner error
+        "- just\n- a list\n",  # not a mapping
+        "",  # empty
+    ],
+)
+def test_load_yaml_errors(spec, loader, monkeypatch):
+    monkeypatch.setattr(testspec, "SafeLoader", loader)
+    assert testspec.load_yaml_from_str(spec) == {}
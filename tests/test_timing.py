@@ -0,0 +1,52 @@
+from unittest import mock
+
+import pytest
+
+from yea import timing
+from yea.context import YeaContext
+from yea.registry import Registry
+from yea.runner import TestRunner as Runner  # not to confuse pytest
+
+
+def test_phase_timer():
+    timer = timing.PhaseTimer()
+    with mock.patch("time.monotonic", side_effect=[1.0, 3.0, 4.0, 4.5]):
+        with timer.phase("install"):
+            pass
+        with timer.phase("install"):
+            pass
+    timer.add("process", 10.0)
+    assert timer.phases == {"install": 2.5, "process": 10.0}
+
+    total = timing.PhaseTimer()
+    total.update(timer)
+    total.update(timer)
+    assert total.phases == {"install": 5.0, "process": 20.0}
+
+
+def test_format_table():
+    timer = timing.PhaseTimer()
+    timer.add("install", 5.0)
+    timer.add("process", 15.0)
+    lines = timing.format_table(timer, 25.0)
+    assert lines[0].startswith("  process:    15.00 (60.0%)")
+    assert lines[1].startswith("  install:     5.00 (20.0%)")
+    assert "harness overhead: 10.00 (40.0%) of 25.00 total" in lines[2]
+
+
+@pytest.mark.parametrize(
+    "mocked_yea_context",
+    [{"action": "run", "tests": ["tests/assets/sample03.py"]}],
+    indirect=True,
+)
+def test_runner_phases(mocked_yea_context: YeaContext, capsys):
+    yc = mocked_yea_context
+    with mock.patch("sys.platform", "darwin"):
+        registry = Registry(yc=yc)
+        registry.probe(tests=yc._args.tests)
+        runner = Runner(yc=yc)
+        runner.run(tests=registry.get_tests())
+    props = {p["name"] for p in runner._results[0].properties}
+    for phase in ("monitors", "plugin_prep", "coverage", "process", "check"):
+        assert f"yea::phase::{phase}" in props
+    assert "harness overhead" in capsys.readouterr().out
@@ -0,0 +1,178 @@
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+import control_server
+import pytest
+import requests
+
+from yea import _trigger
+
+
+@pytest.fixture
+def server(request):
+    kind, delay, status = getattr(request, "param", ("tcp", 0.0, 200))
+    if kind == "unix":
+        # unix socket paths are short, keep them out of the pytest tmp dirs
+        tmpdir = tempfile.mkdtemp(prefix="yea-")
+        srv = control_server.start(
+            control_server.UnixControlServer, f"{tmpdir}/control.sock", delay, status
+        )
+    else:
+        tmpdir = None
+        srv = control_server.start(
+            control_server.TCPControlServer, ("127.0.0.1", 0), delay, status
+        )
+    yield srv
+    control_server.stop(srv)
+    if tmpdir:
+        shutil.rmtree(tmpdir)
+
+
+@pytest.fixture
+def no_default_client(monkeypatch):
+    monkeypatch.setattr(_trigger, "_client", None)
+
+
+def _names(srv):
+    return [c["service"] for c in srv.commands]
+
+
+@pytest.mark.parametrize(
+    "server", [("tcp", 0.0, 200), ("unix", 0.0, 200)], indirect=True
+)
+def test_persistent_connection(server):
+    client = _trigger.TriggerClient(server.url)
+    for num in range(20):
+        client.trigger(f"t{num}")
+    client.close()
+    assert _names(server) == [f"t{num}" for num in range(20)]
+    assert server.commands[0]["command"] == "trigger"
+    assert server.connections == 1
+
+
+@pytest.mark.parametrize("server", [("tcp", 0.1, 200)], indirect=True)
+def test_fire_and_forget(server):
+    client = _trigger.TriggerClient(server.url)
+    start = time.monotonic()
+    for num in range(5):
+        client.trigger(f"t{num}", wait=False)
+    # queuing does not wait for the server
+    assert time.monotonic() - start < 0.1
+    client.flush()
+    assert _names(server) == [f"t{num}" for num in range(5)]
+    # a waiting trigger goes after the queued ones
+    client.trigger("t5", wait=False)
+    client.trigger("t6")
+    assert _names(server)[-2:] == ["t5", "t6"]
+
+
+@pytest.mark.parametrize("server", [("tcp", 0.1, 200)], indirect=True)
+def test_batch(server):
+    client = _trigger.TriggerClient(server.url, batch=True)
+    for num in range(10):
+        client.trigger(f"t{num}", wait=False)
+    client.flush()
+    assert _names(server) == [f"t{num}" for num in range(10)]
+    # the first one went alone, the rest queued up meanwhile
+    assert len(server.requests) < 10
+    assert any(isinstance(r, list) for r in server.requests)
+
+
+@pytest.mark.parametrize("server", [("tcp", 0.0, 500)], indirect=True)
+def test_error(server):
+    client = _trigger.TriggerClient(server.url)
+    with pytest.raises(_trigger.TriggerError, match="500"):
+        client.trigger("t0")
+    client.trigger("t1", wait=False)
+    with pytest.raises(_trigger.TriggerError, match="500"):
+        client.flush()
+    # the error is reported once
+    client.flush()
+
+
+def test_bad_url():
+    with pytest.raises(_trigger.TriggerError):
+        _trigger.TriggerClient("ftp://localhost")
+
+
+def test_trigger_env(server, monkeypatch, no_default_client):
+    monkeypatch.setenv("YEA_WANDB_MITM", server.url)
+    _trigger.trigger("t0")
+    _trigger.trigger("t1", wait=False)
+    _trigger.flush()
+    assert _names(server) == ["t0", "t1"]
+
+
+def test_trigger_without_mitm(monkeypatch, no_default_client):
+    monkeypatch.delenv("YEA_WANDB_MITM", raising=False)
+    _trigger.trigger("t0")
+    _trigger.flush()
+    assert _trigger._client is None
+
+
+def test_error_is_requests_error():
+    assert issubclass(_trigger.TriggerError, requests.HTTPError)
+
+
+def test_sender_error(server, monkeypatch):
+    client = _trigger.TriggerClient(server.url)
+    post = client._post
+
+    def fail_once(data):
+        monkeypatch.setattr(client, "_post", post)
+        raise ValueError("boom")
+
+    monkeypatch.setattr(client, "_post", fail_once)
+    client.trigger("t0", wait=False)
+    with pytest.raises(_trigger.TriggerError, match="boom"):
+        client.flush(timeout=5)
+    # the sender survives and keeps sending
+    client.trigger("t1", wait=False)
+    client.flush(timeout=5)
+    assert _names(server) == ["t1"]
+
+
+def _reset_server(sock, requests_seen):
+    """Answer the first request, reset the connection on the second."""
+    conn, _ = sock.accept()
+    conn.settimeout(5)
+    for num in range(2):
+        data = b""
+        while b"\r\n\r\n" not in data:
+            data += conn.recv(4096)
+        requests_seen.append(num)
+        if num == 0:
+            conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n")
+    conn.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+    conn.close()
+    # a resent trigger would arrive on a new connection
+    sock.settimeout(0.5)
+    try:
+        conn, _ = sock.accept()
+    except OSError:
+        return
+    if conn.recv(4096):
+        requests_seen.append(2)
+    conn.close()
+
+
+def test_reset_not_resent():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen()
+    requests_seen = []
+    thread = threading.Thread(target=_reset_server, args=(sock, requests_seen))
+    thread.start()
+    host, port = sock.getsockname()
+    client = _trigger.TriggerClient(f"http://{host}:{port}")
+    client.trigger("t0")
+    # the server may have acted on it before the reset, do not send it again
+    with pytest.raises(_trigger.TriggerError):
+        client.trigger("t1")
+    thread.join()
+    sock.close()
+    assert requests_seen == [0, 1]
@@ -0,0 +1,138 @@
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from yea import util, workqueue
+
+
+def test_workqueue_longest_first(tmp_path):
+    worker1 = workqueue.WorkQueue(tmp_path, worker_id="w1")
+    worker2 = workqueue.WorkQueue(tmp_path, worker_id="w2")
+    tests = ["0.a", "0.b", "0.c", "0.d"]
+    durations = {"0.a": 1.0, "0.b": 30.0, "0.c": 5.0}
+    worker1.register(tests, durations)
+    worker2.register(list(reversed(tests)), durations)
+
+    # unknown tests are priced at the average
+    assert worker1.claim() == "0.b"
+    assert worker2.claim() == "0.d"
+    assert worker2.claim() == "0.c"
+    assert worker1.claim() == "0.a"
+    assert worker1.claim() is None
+    for test_id in tests:
+        worker1.complete(test_id)
+
+    assert not worker1.finish([{"name": "0.b"}, {"name": "0.a"}])
+    assert worker2.finish([{"name": "0.c"}, {"name": "0.d"}])
+    names = sorted(r["name"] for r in worker1.load_results())
+    assert names == tests
+
+
+def test_workqueue_done(tmp_path):
+    worker1 = workqueue.WorkQueue(tmp_path, worker_id="w1")
+    worker1.register(["0.a"], {})
+    assert list(worker1.claims()) == ["0.a"]
+    assert worker1.finish([{"name": "0.a"}])
+    # a new run in the same dir would find nothing left to do
+    with pytest.raises(RuntimeError, match="already ran"):
+        workqueue.WorkQueue(tmp_path, worker_id="w2").register(["0.a"], {})
+
+
+def test_workqueue_dead_worker(tmp_path):
+    dead = workqueue.WorkQueue(tmp_path, worker_id="w1")
+    alive = workqueue.WorkQueue(tmp_path, worker_id="w2", lease=0.5)
+    dead.register(["0.a", "0.b"], {})
+    alive.register(["0.a", "0.b"], {})
+    assert dead.claim() == "0.a"
+    assert alive.claim() == "0.b"
+    alive.complete("0.b")
+    # w1 still has its lease
+    assert alive.claim() is None
+    time.sleep(0.6)
+    assert alive.claim() == "0.a"
+    alive.complete("0.a")
+    assert alive.claim() is None
+    assert alive.finish([{"name": "0.a"}, {"name": "0.b"}])
+
+
+def test_workqueue_slow_worker(tmp_path):
+    slow = workqueue.WorkQueue(tmp_path, worker_id="w1", lease=0.2)
+    other = workqueue.WorkQueue(tmp_path, worker_id="w2", lease=0.2)
+    slow.register(["0.a", "0.b"], {})
+    other.register(["0.a", "0.b"], {})
+    claims = slow.claims()
+    assert next(claims) == "0.a"
+    assert other.claim() == "0.b"
+    other.complete("0.b")
+    # the lease is renewed while 0.a runs
+    time.sleep(0.6)
+    assert other.claim() is None
+    assert list(claims) == []
+    assert not other.finish([{"name": "0.b"}])
+    assert slow.finish([{"name": "0.a"}])
+
+
+def test_workqueue_duplicate_results(tmp_path):
+    worker1 = workqueue.WorkQueue(tmp_path, worker_id="w1")
+    worker2 = workqueue.WorkQueue(tmp_path, worker_id="w2")
+    worker1.register(["0.a", "0.b"], {})
+    worker2.register(["0.a", "0.b"], {})
+    # 0.a ran twice, once after its first worker was given up on
+    worker1.finish([{"name": "0.a"}])
+    worker2.finish([{"name": "0.a"}, {"name": "0.b"}])
+    assert sorted(r["name"] for r in worker1.load_results()) == ["0.a", "0.b"]
+
+
+def test_workqueue_lock_released_on_exit(tmp_path):
+    lock_path = tmp_path / workqueue.LOCK_FNAME
+    code = (
+        "import pathlib, os, sys; from yea import util;"
+        f" util.FileLock(pathlib.Path({str(lock_path)!r})).__enter__();"
+        " os._exit(0)"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+    # the lock of a process that died does not need to be broken
+    with util.FileLock(lock_path):
+        pass
+
+
+def test_workqueue_mismatch(tmp_path):
+    workqueue.WorkQueue(tmp_path, worker_id="w1").register(["0.a"], {})
+    with pytest.raises(RuntimeError):
+        workqueue.WorkQueue(tmp_path, worker_id="w2").register(["0.b"], {})
+
+
+def test_workqueue_concurrent_claims(tmp_path):
+    tests = [f"0.{num}" for num in range(200)]
+    workers = [workqueue.WorkQueue(tmp_path, worker_id=f"w{i}") for i in range(4)]
+    for w in workers:
+        w.register(tests, {})
+    claimed = {w.worker_id: [] for w in workers}
+
+    def work(w):
+        claimed[w.worker_id].extend(w.claims())
+
+    threads = [threading.Thread(target=work, args=(w,)) for w in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    all_claimed = [tid for ids in claimed.values() for tid in ids]
+    assert sorted(all_claimed) == sorted(tests)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="no pid probing on windows")
+def test_workqueue_dead_pid(tmp_path):
+    p = subprocess.Popen([sys.executable, "-c", "pass"])
+    p.wait()
+    gone = workqueue.WorkQueue(tmp_path, worker_id=f"{socket.gethostname()}-{p.pid}")
+    me = workqueue.WorkQueue(tmp_path)
+    gone.register(["0.a"], {})
+    me.register(["0.a"], {})
+    assert gone.claim() == "0.a"
+    # no need to wait for the lease of a process known to be gone
+    assert me.claim() == "0.a"
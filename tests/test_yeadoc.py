@@ -0,0 +1,39 @@
+from yea import yeadoc
+
+SOURCE = '''
+def func():
+    """Do a thing.
+
+    <!--- yeadoc-test:func-test -->
+    ```python
+    import yea
+    ```
+    """
+'''
+
+
+def test_load_docstrings_from_source():
+    snippets = []
+    for docstr in yeadoc.load_docstrings_from_source(SOURCE):
+        snippets.extend(yeadoc.load_tests_from_docstring(docstr))
+    assert [s.id for s in snippets] == ["func-test"]
+    assert snippets[0].code == "import yea\n"
+
+
+def test_yeadoc_cache(tmp_path):
+    src = tmp_path / "mod.py"
+    src.write_text(SOURCE)
+    st = src.stat()
+    snippet = yeadoc.YeadocSnippet("import yea\n", 4, "func-test", "python")
+
+    cache = yeadoc.YeadocCache(tmp_path / "cache.json")
+    assert cache.get(src, st) is None
+    cache.set(src, st, [snippet])
+    cache.save()
+
+    cache = yeadoc.YeadocCache(tmp_path / "cache.json")
+    assert cache.get(src, st) == [snippet]
+
+    # an edited file is scanned again
+    src.write_text(SOURCE + "\n")
+    assert cache.get(src, src.stat()) is None
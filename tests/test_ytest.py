@@ -1,4 +1,7 @@
 import os
+import sys
+
+import pytest
 
 import yea.ytest
 
@@ -57,3 +60,22 @@ def test_download_error(tmp_path, capsys):
     out, err = capsys.readouterr()
     assert "ERROR: url download error" in out
     assert err == ""
+
+
+def test_run_measured_timeout(capsys):
+    status_code, usage = yea.ytest.run_measured(["sleep", "5"], timeout=1)
+    assert status_code != 0
+    assert usage.wall < 5
+    assert "ERROR: TIMEOUT" in capsys.readouterr().out
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="linux only")
+def test_run_measured_pinned(tmp_path):
+    cpu = min(os.sched_getaffinity(0))
+    out = tmp_path / "cpus"
+    code = f"import os; open({str(out)!r}, 'w').write(repr(os.sched_getaffinity(0)))"
+    status_code, _ = yea.ytest.run_measured(
+        [sys.executable, "-c", code], timeout=30, cpus=[cpu]
+    )
+    assert status_code == 0
+    assert out.read_text() == repr({cpu})
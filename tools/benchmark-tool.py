@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+"""Micro benchmarks for yea internals.
+
+Usage:
+    python tools/benchmark-tool.py yaml --files 3000
+    python tools/benchmark-tool.py split --items 100000 --splits 64
+    python tools/benchmark-tool.py list --groups 6 --values 6
+    python tools/benchmark-tool.py trigger --triggers 1000
+"""
+
+import argparse
+import pathlib
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import NamedTuple
+
+import requests
+import yaml
+
+from yea import _trigger, split, testspec
+
+# the stand-in control server of the test suite
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "tests"))
+import control_server  # noqa: E402
+
+SPEC_TEMPLATE = """\
+id: {tid}
+tag:
+  shard: standalone-cpu
+plugin:
+  - wandb
+depend:
+  requirements:
+    - pandas
+assert:
+  - :wandb:runs_len: 1
+  - :wandb:runs[0][config]: {{id: 0}}
+  - :wandb:runs[0][summary]:
+      m1: 1
+      m2: 2
+  - :wandb:runs[0][exitcode]: 0
+parametrize:
+  permute:
+    - :yea:start_method:
+        - fork
+        - spawn
+        - forkserver
+"""
+
+
+def _timeit(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def bench_yaml(args):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = pathlib.Path(tmpdir)
+        paths = []
+        for num in range(args.files):
+            # specs are mostly copies of each other, vary a few of them
+            tid = f"0.bench.{num % args.unique}"
+            p = root / f"t{num}_bench.yea"
+            p.write_text(SPEC_TEMPLATE.format(tid=tid))
+            paths.append(p)
+
+        def load_pure():
+            for p in paths:
+                with open(p, encoding="utf8") as f:
+                    dict(yaml.load(f.read(), Loader=yaml.SafeLoader))
+
+        def load_testspec():
+            for p in paths:
+                testspec.load_yaml_from_file(p)
+
+        pure = _timeit(load_pure)
+        testspec._yaml_cache.clear()
+        cold = _timeit(load_testspec)
+        warm = _timeit(load_testspec)
+
+    print(f"loader: {testspec.SafeLoader.__name__}")
+    print(f"files: {args.files} (unique specs: {args.unique})")
+    print(f"  SafeLoader:            {pure:.3f}s")
+    print(f"  testspec (cold cache): {cold:.3f}s ({pure / cold:.1f}x)")
+    print(f"  testspec (warm cache): {warm:.3f}s ({pure / warm:.1f}x)")
+
+
+class SplitItem(NamedTuple):
+    nodeid: str
+
+
+def bench_split(args):
+    rnd = random.Random(args.seed)
+    items = [SplitItem(nodeid=f"0.bench.{num}") for num in range(args.items)]
+    # mostly short tests with a long tail
+    durations = {t.nodeid: rnd.lognormvariate(1.0, 1.2) for t in items}
+    optimum = sum(durations.values()) / args.splits
+
+    print(f"items: {args.items}, splits: {args.splits}")
+    for name, steps in (("greedy", 0), ("refined", args.budget)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        group, loads = split.select_group(
+            args.splits, 0, items, durations, refine_steps=steps
+        )
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            f"  {name:<8s}: makespan {max(loads):.1f}s (lower bound {optimum:.1f}s), "
+            f"imbalance {split.load_imbalance(loads):.2%}, "
+            f"planned in {elapsed:.3f}s, peak {peak / 2**20:.1f}MiB"
+        )
+
+    if args.all_groups:
+        tracemalloc.start()
+        start = time.perf_counter()
+        split.least_duration(args.splits, items, durations, refine_steps=0)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            f"  all groups (least_duration): {elapsed:.3f}s, peak {peak / 2**20:.1f}MiB"
+        )
+
+
+def bench_list(args):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = pathlib.Path(tmpdir)
+        (root / ".yearc").write_text("[yea]\nroot = true\n")
+        lines = ["id: 0.bench.matrix", "parametrize:"]
+        if args.strategy:
+            lines.append(f"  strategy: {args.strategy}")
+        lines.append("  permute:")
+        for g in range(args.groups):
+            lines.append(f"    - :yea:group{g}:")
+            lines.extend(f"        - v{v}" for v in range(args.values))
+        (root / "t0_matrix.yea").write_text("\n".join(lines) + "\n")
+        (root / "t0_matrix.py").write_text("")
+
+        cmd = [sys.executable, "-m", "yea.cli", "list", "t0_matrix.yea"]
+        start = time.perf_counter()
+        p = subprocess.run(cmd, cwd=root, stdout=subprocess.PIPE, check=True)
+        elapsed = time.perf_counter() - start
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # skip the "Tests:" header
+    tests = len(p.stdout.splitlines()) - 1
+    print(f"permutations: {args.values}^{args.groups}, strategy: {args.strategy}")
+    print(f"  yea list: {tests} tests in {elapsed:.2f}s")
+    print(f"  max rss: {usage.ru_maxrss / 2**10:.1f}MiB")
+
+
+def bench_trigger(args):
+    tmpdir = tempfile.mkdtemp(prefix="yea-")
+    tcp = control_server.start(control_server.TCPControlServer, ("127.0.0.1", 0))
+    unix = control_server.start(
+        control_server.UnixControlServer, f"{tmpdir}/control.sock"
+    )
+    names = [f"t{num}" for num in range(args.triggers)]
+
+    def per_request():
+        # what every trigger used to cost: a new connection per request
+        for name in names:
+            r = requests.post(
+                f"{tcp.url}/_control", json={"service": name, "command": "trigger"}
+            )
+            r.raise_for_status()
+
+    def blocking(client):
+        for name in names:
+            client.trigger(name)
+
+    def queued(client):
+        for name in names:
+            client.trigger(name, wait=False)
+        client.flush()
+
+    clients = [
+        ("tcp", lambda: _trigger.TriggerClient(tcp.url)),
+        ("unix", lambda: _trigger.TriggerClient(unix.url)),
+        ("unix batch", lambda: _trigger.TriggerClient(unix.url, batch=True)),
+    ]
+    try:
+        print(f"triggers: {args.triggers}, latency per trigger")
+        elapsed = _timeit(per_request)
+        print(f"  {'requests.post':<28s} {elapsed / args.triggers * 1e6:8.1f}us")
+        for name, make_client in clients:
+            client = make_client()
+            elapsed = _timeit(blocking, client)
+            print(f"  {name + ' wait':<28s} {elapsed / args.triggers * 1e6:8.1f}us")
+            elapsed = _timeit(queued, client)
+            print(
+                f"  {name + ' fire-and-forget':<28s} "
+                f"{elapsed / args.triggers * 1e6:8.1f}us"
+            )
+            client.close()
+    finally:
+        control_server.stop(tcp)
+        control_server.stop(unix)
+        shutil.rmtree(tmpdir)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="bench")
+    parse_yaml = subparsers.add_parser("yaml", help="spec loading")
+    parse_yaml.add_argument("--files", type=int, default=3000)
+    parse_yaml.add_argument("--unique", type=int, default=100)
+    parse_yaml.set_defaults(func=bench_yaml)
+
+    parse_split = subparsers.add_parser("split", help="split planning")
+    parse_split.add_argument("--items", type=int, default=100000)
+    parse_split.add_argument("--splits", type=int, default=64)
+    parse_split.add_argument("--budget", type=int, default=split.REFINE_STEPS)
+    parse_split.add_argument("--seed", type=int, default=0)
+    parse_split.add_argument(
+        "--all-groups", action="store_true", help="also build every group"
+    )
+    parse_split.set_defaults(func=bench_split)
+
+    parse_list = subparsers.add_parser("list", help="yea list of a large matrix")
+    parse_list.add_argument("--groups", type=int, default=6)
+    parse_list.add_argument("--values", type=int, default=6)
+    parse_list.add_argument("--strategy", default=None)
+    parse_list.set_defaults(func=bench_list)
+
+    parse_trigger = subparsers.add_parser("trigger", help="trigger latency")
+    parse_trigger.add_argument("--triggers", type=int, default=1000)
+    parse_trigger.set_defaults(func=bench_trigger)
+
+    args = parser.parse_args()
+    if not args.bench:
+        parser.print_help()
+        return
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()